@@ -0,0 +1,79 @@
+import os
+import re
+import gzip
+import mimetypes
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from .middleware import brotli, parse_accept_encoding
+
+# ==================== STATIC ASSETS ====================
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+
+# ManifestStaticFilesStorage inserts a 12 character md5 fragment: home.3f2a9c1b7d4e.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz (and .br, when available) next to each hashed file"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                if hashed_name.endswith(COMPRESS_EXTENSIONS):
+                    self.write_compressed(hashed_name)
+            yield name, hashed_name, processed
+
+    def write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+def serve_static(request, path):
+    """
+    Serve collected static files from STATIC_ROOT, preferring precompressed
+    variants. Content-hashed files are cached by clients forever.
+    """
+    try:
+        full_path = safe_join(str(settings.STATIC_ROOT), path)
+    except ValueError:
+        raise Http404("Invalid path")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    encoding = None
+    serve_path = full_path
+
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted.get(candidate, accepted.get('*', 0.0)) > 0 and os.path.isfile(full_path + suffix):
+            encoding, serve_path = candidate, full_path + suffix
+            break
+
+    response = FileResponse(open(serve_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = 'public, max-age=300'
+    return response
@@ -0,0 +1,355 @@
+import os
+import math
+import time
+import pickle
+import random
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # the Redis L2 backend is optional
+    redis = None
+
+# ==================== TWO-TIER UPSTREAM CACHE ====================
+#
+# Geocode, Nearby Search, Place Details and Gemini responses go through a
+# small in-process LRU (L1) in front of a store shared by every worker (L2):
+# SQLite in WAL mode by default, Redis when configured. A miss in one worker
+# is served from L2 when a sibling already fetched the value. Invalidations
+# are written to a log in L2 that every worker replays into its own L1.
+# Coordinates are snapped to grid cells so nearby users share entries.
+
+DEFAULT_TTLS = {
+    'geocode': 7 * 24 * 3600,
+    'nearby': 6 * 3600,
+    'details': 3 * 24 * 3600,  # open/closed is computed locally, so details stay valid for days
+    'gemini': 15 * 60,
+    'travel': 30 * 60,
+    'summary': 24 * 3600,
+    'narration': 10 * 60,
+    'route': 24 * 3600,
+}
+
+DEFAULT_CONFIG = {
+    'L1_MAX_BYTES': 32 * 1024 * 1024,
+    'L2_BACKEND': 'sqlite',  # 'sqlite', 'redis' or 'none'
+    'L2_PATH': '.cache/geoguide-cache.sqlite3',
+    'REDIS_URL': 'redis://localhost:6379/0',
+    'INVALIDATION_POLL_SECONDS': 2,
+}
+
+
+def get_config(name):
+    config = getattr(settings, 'GEOGUIDE_CACHE', {})
+    return config.get(name, DEFAULT_CONFIG[name])
+
+
+def get_ttl(namespace):
+    ttls = getattr(settings, 'CACHE_TTLS', DEFAULT_TTLS)
+    return ttls.get(namespace, DEFAULT_TTLS.get(namespace, 3600))
+
+
+def cell_precision():
+    """Decimal places used to snap coordinates (2 -> ~1.1 km cells)"""
+    return getattr(settings, 'CACHE_CELL_PRECISION', 2)
+
+
+def snap_to_cell(lat, lng):
+    precision = cell_precision()
+    return round(float(lat), precision), round(float(lng), precision)
+
+
+def cell_reach_m(lat, lng):
+    """
+    Metres from (lat, lng) to the farthest corner of its cell: widening a search by this much
+    covers the same area around any other point in the cell (half the cell diagonal at the centre)
+    """
+    cell_lat, cell_lng = snap_to_cell(lat, lng)
+    half = 0.5 * 10 ** -cell_precision()
+    dy = (abs(float(lat) - cell_lat) + half) * 111320
+    dx = (abs(float(lng) - cell_lng) + half) * 111320 * math.cos(math.radians(float(lat)))
+    return math.ceil(math.hypot(dx, dy))
+
+
+def cell_id(lat, lng):
+    cell_lat, cell_lng = snap_to_cell(lat, lng)
+    return f"{cell_lat},{cell_lng}"
+
+
+def make_key(namespace, *parts):
+    raw = '|'.join(str(part) for part in parts)
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f"geoguide:{namespace}:{digest}"
+
+
+# ---------- L1: in-process LRU ----------
+
+class LRUCache:
+    """Byte-bounded LRU holding (expires_at, value, size) per key"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, size, expires_at):
+        if size > self.max_bytes // 4:
+            return  # a single huge value would flush everything else
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (expires_at, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self.entries:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+
+# ---------- L2: shared stores ----------
+
+class SQLiteStore:
+    """Cross-process store in one SQLite file (WAL mode, one connection per thread)"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS invalidations (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, ts REAL)")
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self.connection().execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key, blob, expires_at):
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, blob, expires_at))
+            if random.random() < 0.001:
+                conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+                conn.execute("DELETE FROM invalidations WHERE ts < ?", (time.time() - 3600,))
+
+    def delete(self, key):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("INSERT INTO invalidations (key, ts) VALUES (?, ?)", (key, time.time()))
+
+    def invalidations_since(self, cursor):
+        """Keys invalidated after cursor, and the new cursor (None -> start at the end of the log)"""
+        conn = self.connection()
+        if cursor is None:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations").fetchone()[0], []
+        rows = conn.execute("SELECT id, key FROM invalidations WHERE id > ? ORDER BY id", (cursor,)).fetchall()
+        return (rows[-1][0] if rows else cursor), [key for _, key in rows]
+
+
+class RedisStore:
+    """Cross-host store; invalidations go through a capped Redis stream"""
+
+    STREAM = 'geoguide:invalidations'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        blob, pttl = pipe.execute()
+        if blob is None:
+            return None
+        return blob, time.time() + max(pttl, 0) / 1000
+
+    def set(self, key, blob, expires_at):
+        self.client.set(key, blob, px=max(int((expires_at - time.time()) * 1000), 1))
+
+    def delete(self, key):
+        self.client.delete(key)
+        self.client.xadd(self.STREAM, {'key': key}, maxlen=10000, approximate=True)
+
+    def invalidations_since(self, cursor):
+        if cursor is None:
+            last = self.client.xrevrange(self.STREAM, count=1)
+            return (last[0][0].decode() if last else '0-0'), []
+        entries = self.client.xrange(self.STREAM, min=f'({cursor}', count=1000)
+        if not entries:
+            return cursor, []
+        return entries[-1][0].decode(), [fields[b'key'].decode() for _, fields in entries]
+
+
+# ---------- tiered cache ----------
+
+class TieredCache:
+
+    def __init__(self):
+        self.l1 = LRUCache(get_config('L1_MAX_BYTES'))
+        self.l2 = self._make_l2()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.cursor = None
+        self.next_poll = 0
+        self.poll_lock = threading.Lock()
+
+    def _make_l2(self):
+        backend = get_config('L2_BACKEND')
+        try:
+            if backend == 'redis':
+                if redis is None:
+                    print("DEBUG: redis package not installed, falling back to SQLite L2 cache")
+                else:
+                    return RedisStore(get_config('REDIS_URL'))
+            if backend in ('sqlite', 'redis'):
+                path = get_config('L2_PATH')
+                if not os.path.isabs(str(path)):
+                    path = os.path.join(settings.BASE_DIR, str(path))
+                return SQLiteStore(path)
+        except Exception as e:
+            print(f"DEBUG: L2 cache unavailable ({e}), using L1 only")
+        return None
+
+    def _record(self, namespace, outcome):
+        with self.stats_lock:
+            stats = self.stats.setdefault(namespace, {'l1_hits': 0, 'l2_hits': 0, 'misses': 0})
+            stats[outcome] += 1
+
+    def _poll_invalidations(self):
+        """Replay invalidations made by other workers into our L1"""
+        if self.l2 is None or time.time() < self.next_poll:
+            return
+        if not self.poll_lock.acquire(blocking=False):
+            return
+        try:
+            self.next_poll = time.time() + get_config('INVALIDATION_POLL_SECONDS')
+            self.cursor, keys = self.l2.invalidations_since(self.cursor)
+            for key in keys:
+                self.l1.delete(key)
+        except Exception as e:
+            print(f"DEBUG: Cache invalidation poll failed: {e}")
+        finally:
+            self.poll_lock.release()
+
+    def get(self, namespace, key):
+        self._poll_invalidations()
+        entry = self.l1.get(key)
+        if entry is not None:
+            self._record(namespace, 'l1_hits')
+            return entry[1]
+
+        if self.l2 is not None:
+            try:
+                found = self.l2.get(key)
+            except Exception as e:
+                print(f"DEBUG: L2 cache read failed ({namespace}): {e}")
+                found = None
+            if found is not None:
+                blob, expires_at = found
+                value = pickle.loads(blob)
+                self.l1.set(key, value, len(blob), expires_at)
+                self._record(namespace, 'l2_hits')
+                return value
+
+        self._record(namespace, 'misses')
+        return None
+
+    def set(self, namespace, key, value, ttl):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires_at = time.time() + ttl
+        self.l1.set(key, value, len(blob), expires_at)
+        if self.l2 is not None:
+            try:
+                self.l2.set(key, blob, expires_at)
+            except Exception as e:
+                print(f"DEBUG: L2 cache write failed ({namespace}): {e}")
+
+    def delete(self, key):
+        self.l1.delete(key)
+        if self.l2 is not None:
+            try:
+                self.l2.delete(key)
+            except Exception as e:
+                print(f"DEBUG: L2 cache delete failed: {e}")
+
+    def get_stats(self):
+        with self.stats_lock:
+            summary = {}
+            for namespace, stats in self.stats.items():
+                total = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+                summary[namespace] = dict(
+                    stats,
+                    hits=stats['l1_hits'] + stats['l2_hits'],
+                    l1_hit_rate=round(stats['l1_hits'] / total, 3) if total else None,
+                    l2_hit_rate=round(stats['l2_hits'] / total, 3) if total else None,
+                    hit_rate=round((stats['l1_hits'] + stats['l2_hits']) / total, 3) if total else None,
+                )
+        summary['_memory'] = {
+            'l1_entries': len(self.l1.entries),
+            'l1_bytes': self.l1.bytes,
+            'l1_max_bytes': self.l1.max_bytes,
+            'l2_backend': type(self.l2).__name__ if self.l2 is not None else None,
+        }
+        return summary
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TieredCache()
+    return _cache
+
+
+def cache_get(namespace, *parts):
+    """Return the cached value or None, counting hits per tier and misses per namespace"""
+    return get_cache().get(namespace, make_key(namespace, *parts))
+
+
+def cache_set(namespace, value, *parts, ttl=None):
+    get_cache().set(namespace, make_key(namespace, *parts), value, ttl or get_ttl(namespace))
+
+
+def cache_invalidate(namespace, *parts):
+    """Remove an entry everywhere; other workers drop it from their L1 on their next poll"""
+    get_cache().delete(make_key(namespace, *parts))
+
+
+def get_cache_stats():
+    return get_cache().get_stats()
@@ -0,0 +1,216 @@
+import re
+import hashlib
+
+# ==================== QUERY CANONICALIZATION ====================
+#
+# "coffee near me", "Coffee nearby please" and "find coffee" should be one
+# query as far as intent analysis and the caches are concerned. The canonical
+# form is case folded, free of punctuation, filler and proximity words, has
+# spelling variants and synonyms folded to one token, and its tokens sorted.
+# Intent analysis is memoized on it and search/response cache keys derive
+# from it. How close the traveler wants results is a separate search
+# parameter (proximity()), so it never splits the canonical key; a bare
+# "near" before a landmark ("coffee near the station") is not a preference.
+
+# Filler words that never change what we search for
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'the', 'to', 'for', 'of', 'in', 'at', 'on', 'is', 'are',
+    'i', 'me', 'my', 'we', 'us', 'you', 'your', 'it', 'there', 'here', 'some', 'any', 'from',
+    'find', 'search', 'look', 'looking', 'show', 'tell', 'get', 'give', 'go', 'going',
+    'want', 'wanna', 'need', 'like', 'would', 'could', 'can', 'please', 'pls', 'plz',
+    'help', 'where', 'what', 'which', 'know', 'suggest', 'hi', 'hey', 'hello', 'thanks',
+}
+
+# Radius preferences; matched on the raw message, first preference wins
+PROXIMITY_PHRASES = {
+    'nearby': ['near me', 'near here', 'nearby', 'close by', 'close to me', 'around me', 'around here',
+               'walking distance', 'within walking', 'walkable', 'closest', 'nearest'],
+    'far': ['far', 'distant', 'drive', 'driving distance'],
+}
+
+# Words that only ever say how far to search, dropped from the canonical form
+PROXIMITY_WORDS = {
+    'near', 'nearby', 'around', 'close', 'closest', 'nearest', 'walking', 'walkable', 'distance',
+    'within', 'far', 'distant', 'drive', 'driving',
+}
+
+# Nouns that make "near/at/by the ..." a location anchor rather than part of the request
+PLACE_NOUNS = [
+    'station', 'stop', 'terminal', 'airport', 'metro', 'mall', 'hotel', 'market', 'park', 'square',
+    'street', 'road', 'junction', 'circle', 'bridge', 'gate', 'beach', 'temple', 'church', 'mosque',
+    'museum', 'university', 'college', 'school', 'hospital', 'office', 'tower', 'stadium', 'center',
+    'centre', 'harbour', 'port', 'lake', 'fort', 'palace', 'place', 'plaza', 'building', 'home',
+]
+
+# A location anchor ("near the bus station"): a place preposition, up to a few words, a place
+# noun. "at a cheap price" or "pizza by the slice" stay part of the request.
+ANCHOR_RE = re.compile(
+    r'\b(?:near|at|by|around|opposite|beside|behind|next to|close to|in front of)\s+'
+    r'(?:\w+\s+){0,3}?(?:' + '|'.join(PLACE_NOUNS) + r')s?\b'
+)
+
+# Hard separators between the requests of a compound message ("coffee, an atm; a pharmacy")
+CLAUSE_SPLIT_RE = re.compile(r'[,;]')
+
+# Conjunctions only separate requests when both sides name a place type ("coffee and an atm",
+# not "bed and breakfast")
+CONJUNCTION_RE = re.compile(r'(&|\b(?:and|plus|also|as well as)\b)')
+
+# Price preferences, matched on canonical tokens of the whole message
+PRICE_WORDS = {
+    'budget': {'cheap', 'budget', 'affordable', 'under'},
+    'expensive': {'expensive', 'luxury', 'premium'},
+}
+
+# Multi-word phrases folded before tokenizing, so sorting can't split them up
+PHRASE_SYNONYMS = {
+    'low price': 'budget',
+    'less than': 'under',
+    'high end': 'premium',
+    'gas station': 'gas',
+    'petrol pump': 'gas',
+    'petrol station': 'gas',
+    'coffee shop': 'coffee',
+    'shopping mall': 'mall',
+    'movie theater': 'cinema',
+    'bus stop': 'bus',
+    'bus station': 'bus',
+}
+
+# Spelling variants and synonyms -> the token INTENT_KEYWORDS knows
+TOKEN_SYNONYMS = {
+    'biriyani': 'biryani',
+    'briyani': 'biryani',
+    'biriani': 'biryani',
+    'petrol': 'gas',
+    'fuel': 'gas',
+    'diesel': 'gas',
+    'cafe': 'coffee',
+    'caffe': 'coffee',
+    'movies': 'movie',
+    'theatre': 'theater',
+    'cheapest': 'cheap',
+    'inexpensive': 'cheap',
+    'pizzas': 'pizza',
+    'chemist': 'pharmacy',
+    'medical': 'pharmacy',
+    'cash': 'atm',
+}
+
+_vocabulary = set()
+_place_keywords = set()
+
+
+def load_vocabulary(intent_keywords):
+    """
+    Known keywords, so plurals like 'hotels' or 'atms' fold to them. Keywords mapped to
+    an intent with a place type are what lets a conjunction split a compound request.
+    """
+    for keyword in intent_keywords:
+        _vocabulary.add(keyword)
+        if isinstance(intent_keywords, dict) and intent_keywords[keyword].get('type'):
+            _place_keywords.add(keyword)
+    _vocabulary.update(TOKEN_SYNONYMS.values())
+
+
+def _fold_token(token):
+    token = TOKEN_SYNONYMS.get(token, token)
+    if token not in _vocabulary and len(token) > 3:
+        for suffix in ('es', 's'):
+            stem = token[:-len(suffix)]
+            if token.endswith(suffix) and stem in _vocabulary:
+                return stem
+    return token
+
+
+def _clean(text):
+    text = re.sub(r"[^\w\s]", ' ', (text or '').casefold())
+    return ' '.join(text.split())
+
+
+def proximity(text):
+    """'nearby', 'far' or None: the radius preference a message states, kept out of the canonical form"""
+    text = _clean(text)
+    for preference, phrases in PROXIMITY_PHRASES.items():
+        if any(re.search(rf'\b{phrase}\b', text) for phrase in phrases):
+            return preference
+    return None
+
+
+def price_preference(text):
+    """'budget', 'expensive' or None, from the whole message"""
+    tokens = set(canonical_tokens(text))
+    for preference, words in PRICE_WORDS.items():
+        if tokens & words:
+            return preference
+    return None
+
+
+def _strip_anchor(text):
+    return ' '.join(ANCHOR_RE.sub(' ', _clean(text)).split())
+
+
+def _names_place(text):
+    return any(token in _place_keywords for token in ordered_tokens(text))
+
+
+def intent_clauses(text):
+    """The separate requests in a message, each with its location anchors removed"""
+    clauses = []
+    for part in CLAUSE_SPLIT_RE.split((text or '').casefold()):
+        pieces = CONJUNCTION_RE.split(part)
+        current = _strip_anchor(pieces[0])
+        for conjunction, piece in zip(pieces[1::2], pieces[2::2]):
+            piece = _strip_anchor(piece)
+            if not piece:
+                continue
+            if _names_place(current) and _names_place(piece):
+                clauses.append(current)
+                current = piece
+            else:
+                word = 'and' if conjunction == '&' else conjunction
+                current = ' '.join(filter(None, (current, word, piece)))
+        if current:
+            clauses.append(current)
+    return [clause for clause in clauses if clause]
+
+
+def ordered_tokens(text):
+    """Folded tokens in the order the message uses them, each once"""
+    text = _clean(text)
+    for phrase, replacement in PHRASE_SYNONYMS.items():
+        if phrase in text:
+            text = re.sub(rf'\b{phrase}\b', replacement, text)
+    tokens = (
+        _fold_token(token) for token in text.split()
+        if token not in STOPWORDS and token not in PROXIMITY_WORDS and (len(token) > 1 or token.isdigit())
+    )
+    return list(dict.fromkeys(tokens))
+
+
+def canonical_tokens(text):
+    return sorted(ordered_tokens(text))
+
+
+def keyword_query(text, max_words=3):
+    """
+    Search keyword when no intent keyword matched: the first meaningful words in message
+    order ('' if none). The sorted canonical form is only a cache key; its order is arbitrary.
+    """
+    return ' '.join([token for token in ordered_tokens(text) if len(token) > 2][:max_words])
+
+
+def canonicalize(text):
+    """Stable canonical form of a search query ('' when nothing meaningful is left)"""
+    return ' '.join(canonical_tokens(text))
+
+
+def conversation_key(history):
+    """Digest of a conversation window with the traveler's messages canonicalized"""
+    digest = hashlib.sha1()
+    for msg in history or []:
+        content = str(msg.get('content', ''))
+        if msg.get('role') == 'user':
+            content = canonicalize(content)
+        digest.update(f"{msg.get('role')}:{content}\n".encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,193 @@
+import math
+import requests
+from django.conf import settings
+from .cache import cache_get, cache_set, cell_id
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python distances are used without numpy
+    np = None
+
+# ==================== ALONG-THE-ROUTE CORRIDOR SEARCH ====================
+#
+# "Petrol pumps on the way to X": take the route polyline (given, or from the
+# Directions API), sample points along it, run one Nearby Search per sample,
+# and rank places by the detour they add - twice their distance from the route.
+# Coordinates are projected to a local flat km grid, which is accurate enough
+# for detours of a few km.
+
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+KM_PER_DEG_LAT = 110.57
+MAX_PATH_POINTS = 500
+
+
+def decode_polyline(encoded):
+    """Google encoded polyline -> [(lat, lng), ...]"""
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        for axis in range(2):
+            shift = result = 0
+            while True:
+                if index >= len(encoded):
+                    raise ValueError('Invalid polyline')  # truncated mid-coordinate
+                byte = ord(encoded[index]) - 63
+                if not 0 <= byte < 64:
+                    raise ValueError('Invalid polyline')
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lng += delta
+        points.append((lat / 1e5, lng / 1e5))
+    return points
+
+
+def fetch_route(origin, destination, api_key, timeout=10):
+    """Driving route overview as [(lat, lng), ...]; cached per origin/destination cell"""
+    key = (cell_id(*origin), cell_id(*destination))
+    cached = cache_get('route', *key)
+    if cached is not None:
+        return cached
+
+    params = {
+        'origin': f'{origin[0]},{origin[1]}',
+        'destination': f'{destination[0]},{destination[1]}',
+        'mode': 'driving',
+        'key': api_key,
+    }
+    data = requests.get(DIRECTIONS_URL, params=params, timeout=timeout).json()
+    if data.get('status') != 'OK' or not data.get('routes'):
+        raise Exception(f"Directions status {data.get('status')}")
+
+    path = decode_polyline(data['routes'][0]['overview_polyline']['points'])
+    cache_set('route', path, *key)
+    return path
+
+
+# ---------- geometry on a local km grid ----------
+
+class Projection:
+    """Equirectangular projection around the route's mean latitude"""
+
+    def __init__(self, path):
+        self.lat0 = sum(lat for lat, _ in path) / len(path)
+        self.lng0 = sum(lng for _, lng in path) / len(path)
+        self.km_per_deg_lng = 111.32 * max(math.cos(math.radians(self.lat0)), 0.01)
+
+    def to_xy(self, lat, lng):
+        return (lng - self.lng0) * self.km_per_deg_lng, (lat - self.lat0) * KM_PER_DEG_LAT
+
+    def to_latlng(self, x, y):
+        return self.lat0 + y / KM_PER_DEG_LAT, self.lng0 + x / self.km_per_deg_lng
+
+
+def simplify_path(path, max_points=MAX_PATH_POINTS):
+    """Keep every n-th vertex (and the last) so distance math stays bounded on long routes"""
+    if len(path) <= max_points:
+        return list(path)
+    step = math.ceil(len(path) / max_points)
+    simplified = list(path[::step])
+    if simplified[-1] != path[-1]:
+        simplified.append(path[-1])
+    return simplified
+
+
+def path_length_km(xy):
+    return sum(math.dist(xy[i], xy[i + 1]) for i in range(len(xy) - 1))
+
+
+def sample_along(path, spacing_km, max_samples):
+    """
+    Evenly spaced (lat, lng) samples along the path, start and end included.
+    Spacing widens when the route would need more than max_samples points.
+    Returns (samples, spacing_km).
+    """
+    projection = Projection(path)
+    xy = [projection.to_xy(lat, lng) for lat, lng in path]
+    length = path_length_km(xy)
+    if length == 0:
+        return [path[0]], spacing_km
+    spacing_km = max(spacing_km, length / max(max_samples - 1, 1))
+
+    samples = [path[0]]
+    next_at = spacing_km
+    travelled = 0.0
+    for (x1, y1), (x2, y2) in zip(xy, xy[1:]):
+        segment = math.dist((x1, y1), (x2, y2))
+        while segment > 0 and travelled + segment >= next_at:
+            t = (next_at - travelled) / segment
+            samples.append(projection.to_latlng(x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+            next_at += spacing_km
+        travelled += segment
+    if len(samples) < max_samples and math.dist(projection.to_xy(*samples[-1]), xy[-1]) > spacing_km / 4:
+        samples.append(path[-1])
+    return samples[:max_samples], spacing_km
+
+
+def distances_to_path(points, path):
+    """
+    For each (lat, lng) point: (distance to the path in km, km along the path to the
+    nearest spot). Vectorized over points x segments with numpy when it is installed.
+    """
+    if not points:
+        return []
+    projection = Projection(path)
+    path_xy = [projection.to_xy(lat, lng) for lat, lng in path]
+    points_xy = [projection.to_xy(lat, lng) for lat, lng in points]
+    if len(path_xy) == 1:
+        return [(math.dist(p, path_xy[0]), 0.0) for p in points_xy]
+    if np is not None:
+        return _distances_numpy(points_xy, path_xy)
+    return _distances_python(points_xy, path_xy)
+
+
+def _distances_numpy(points_xy, path_xy):
+    path = np.asarray(path_xy, dtype=float)
+    a, b = path[:-1], path[1:]                       # segments (S, 2)
+    ab = b - a
+    seg_len_sq = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+    offsets = np.concatenate(([0.0], np.cumsum(np.sqrt((ab ** 2).sum(axis=1)))[:-1]))
+
+    p = np.asarray(points_xy, dtype=float)[:, None, :]  # (P, 1, 2)
+    t = np.clip(((p - a) * ab).sum(axis=2) / seg_len_sq, 0.0, 1.0)  # (P, S)
+    closest = a + t[:, :, None] * ab
+    dist = np.sqrt(((p - closest) ** 2).sum(axis=2))
+    best = dist.argmin(axis=1)
+    rows = np.arange(len(points_xy))
+    along = offsets[best] + t[rows, best] * np.sqrt(seg_len_sq[best])
+    return list(zip(dist[rows, best].tolist(), along.tolist()))
+
+
+def _distances_python(points_xy, path_xy):
+    segments = []
+    offset = 0.0
+    for (ax, ay), (bx, by) in zip(path_xy, path_xy[1:]):
+        dx, dy = bx - ax, by - ay
+        length_sq = max(dx * dx + dy * dy, 1e-12)
+        segments.append((ax, ay, dx, dy, length_sq, offset))
+        offset += math.sqrt(dx * dx + dy * dy)
+
+    results = []
+    for px, py in points_xy:
+        best = (float('inf'), 0.0)
+        for ax, ay, dx, dy, length_sq, seg_offset in segments:
+            t = min(max(((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0), 1.0)
+            distance = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+            if distance < best[0]:
+                best = (distance, seg_offset + t * math.sqrt(length_sq))
+        results.append(best)
+    return results
+
+
+def corridor_settings():
+    return {
+        'radius': getattr(settings, 'CORRIDOR_SEARCH_RADIUS', 1500),
+        'max_samples': getattr(settings, 'CORRIDOR_MAX_SAMPLES', 25),
+        'max_detour_km': getattr(settings, 'CORRIDOR_MAX_DETOUR_KM', 5.0),
+    }
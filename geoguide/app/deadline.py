@@ -0,0 +1,96 @@
+import math
+import time
+import threading
+from django.conf import settings
+
+# ==================== REQUEST LATENCY BUDGET ====================
+#
+# A chat request gets one latency budget (X-GeoGuide-Budget-Ms header or the
+# CHAT_LATENCY_BUDGET default). The Budget object is passed to every helper:
+# upstream calls use only what is left of it as their timeout, and optional
+# stages (details enrichment, wider search rings, travel times, AI narration)
+# are skipped when too little is left. Skipped stages are reported back to the
+# client so degraded answers are visible.
+
+BUDGET_HEADER = 'HTTP_X_GEOGUIDE_BUDGET_MS'
+MIN_TIMEOUT = 0.05
+
+# Seconds that must remain before a stage is started
+DEFAULT_STAGE_MIN_SECONDS = {
+    'geocode': 0.5,
+    'nearby': 0.3,
+    'wider_rings': 1.0,
+    'details': 2.5,       # leaves room for the narration after it
+    'travel_times': 2.0,
+    'ai_narration': 1.0,
+}
+
+
+def stage_min_seconds(stage):
+    stages = getattr(settings, 'CHAT_STAGE_MIN_SECONDS', DEFAULT_STAGE_MIN_SECONDS)
+    return stages.get(stage, DEFAULT_STAGE_MIN_SECONDS.get(stage, 0))
+
+
+class Budget:
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.skipped = []
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap, reserve=0.0):
+        """Timeout for one upstream call: the cap, or what's left after keeping `reserve` seconds back"""
+        return max(min(cap, self.remaining() - reserve), MIN_TIMEOUT)
+
+    def allows(self, stage):
+        """True if enough budget is left to start this stage; otherwise it is recorded as skipped"""
+        if self.remaining() >= stage_min_seconds(stage):
+            return True
+        self.skip(stage)
+        return False
+
+    def skip(self, stage):
+        with self.lock:
+            if stage not in self.skipped:
+                self.skipped.append(stage)
+                print(f"DEBUG: Budget: skipped '{stage}' with {self.remaining() * 1000:.0f}ms left")
+
+    def report(self):
+        return {
+            'budget_ms': round(self.seconds * 1000),
+            'elapsed_ms': round((time.monotonic() - self.started) * 1000),
+            'skipped_stages': list(self.skipped),
+        }
+
+
+def budget_from_request(request, default=None):
+    """Budget from the X-GeoGuide-Budget-Ms header, clamped, else `default` or CHAT_LATENCY_BUDGET"""
+    seconds = default or getattr(settings, 'CHAT_LATENCY_BUDGET', 8.0)
+    header = request.META.get(BUDGET_HEADER)
+    if header:
+        try:
+            value = float(header)
+            if not math.isfinite(value):
+                raise ValueError(header)  # nan/inf slip through min/max clamping
+            seconds = value / 1000
+        except ValueError:
+            print(f"DEBUG: Ignoring invalid budget header '{header}'")
+    seconds = min(max(seconds, 0.5), getattr(settings, 'CHAT_LATENCY_BUDGET_MAX', 30.0))
+    return Budget(seconds)
+
+
+def timeout_for(budget, cap, reserve=0.0):
+    """Fixed timeout when there is no budget (management commands, other endpoints)"""
+    return budget.timeout(cap, reserve) if budget is not None else cap
+
+
+def allows(budget, stage):
+    return budget is None or budget.allows(stage)
@@ -0,0 +1,183 @@
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from django.conf import settings
+
+# ==================== GEMINI SCHEDULER ====================
+#
+# Every Gemini call goes through one bounded pool of worker threads fed from a
+# priority queue: interactive chat first, then place descriptions, then
+# greetings, then background work (prefetch, conversation summaries). Within a
+# class the earliest deadline runs first. When the queue backs up, low classes
+# are shed immediately (the caller falls back to its rule-based answer) so
+# greetings and prefetches never sit in front of the chat answers people are
+# waiting on. Jobs whose deadline passes while queued are dropped unrun.
+
+PRIORITIES = {
+    'chat': 0,
+    'diagnostic': 1,
+    'description': 1,
+    'greeting': 2,
+    'background': 3,
+}
+
+# Queued jobs at or above which a class is shed on arrival
+DEFAULT_QUEUE_LIMITS = {
+    'chat': 32,
+    'diagnostic': 8,
+    'description': 12,
+    'greeting': 4,
+    'background': 1,
+}
+
+# Seconds a caller is prepared to wait (queueing plus generation)
+DEFAULT_DEADLINES = {
+    'chat': 20,
+    'diagnostic': 20,
+    'description': 15,
+    'greeting': 8,
+    'background': 60,
+}
+
+
+class GeminiOverloaded(Exception):
+    """Raised instead of running the call; callers use their fallback"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def class_deadline(klass):
+    deadlines = _setting('GEMINI_DEADLINES', DEFAULT_DEADLINES)
+    return deadlines.get(klass, DEFAULT_DEADLINES[klass])
+
+
+class Job:
+
+    def __init__(self, klass, fn, args, deadline):
+        self.klass = klass
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class GeminiScheduler:
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.heap = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.busy = 0
+        self.service_time = 2.0  # EWMA seconds per call, used for admission
+        self.stats = {klass: {'submitted': 0, 'completed': 0, 'failed': 0, 'shed': 0, 'expired': 0,
+                              'wait_ms': 0.0} for klass in PRIORITIES}
+        for i in range(workers):
+            threading.Thread(target=self._worker, daemon=True, name=f'gemini-{i}').start()
+
+    def _queued(self, max_priority):
+        """Jobs queued that would run before a job of this priority"""
+        return sum(1 for entry in self.heap if entry[0] <= max_priority)
+
+    def submit(self, klass, fn, *args, timeout=None):
+        """Queue fn(*args) under a priority class; returns a Future, or raises GeminiOverloaded"""
+        if klass not in PRIORITIES:
+            raise ValueError(f"Unknown Gemini priority class '{klass}'")
+        priority = PRIORITIES[klass]
+        timeout = timeout if timeout is not None else class_deadline(klass)
+        limit = _setting('GEMINI_QUEUE_LIMITS', DEFAULT_QUEUE_LIMITS).get(klass, DEFAULT_QUEUE_LIMITS[klass])
+
+        with self.cond:
+            self.stats[klass]['submitted'] += 1
+            ahead = self._queued(priority)
+            # Expected wait: everything ahead of us split across the pool
+            expected_wait = (ahead + max(self.busy - self.workers + 1, 0)) * self.service_time / self.workers
+            if len(self.heap) >= limit or expected_wait > timeout:
+                self.stats[klass]['shed'] += 1
+                raise GeminiOverloaded(f"Gemini queue saturated, shedding {klass} "
+                                       f"({ahead} ahead, ~{expected_wait:.1f}s wait)")
+            job = Job(klass, fn, args, time.monotonic() + timeout)
+            heapq.heappush(self.heap, (priority, job.deadline, next(self.counter), job))
+            self.cond.notify()
+        return job.future
+
+    def run(self, klass, fn, *args, timeout=None):
+        """submit() and wait for the result within the class deadline"""
+        future = self.submit(klass, fn, *args, timeout=timeout)
+        job_timeout = timeout if timeout is not None else class_deadline(klass)
+        try:
+            return future.result(timeout=job_timeout)
+        except FutureTimeout:
+            future.cancel()  # dropped if it hasn't started yet
+            raise GeminiOverloaded(f"Gemini {klass} call missed its {job_timeout}s deadline")
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.heap:
+                    self.cond.wait()
+                _, deadline, _, job = heapq.heappop(self.heap)
+                now = time.monotonic()
+                if not job.future.set_running_or_notify_cancel() or now >= deadline:
+                    if not job.future.cancelled():
+                        job.future.set_exception(GeminiOverloaded(f"{job.klass} expired in the Gemini queue"))
+                    self.stats[job.klass]['expired'] += 1
+                    continue
+                self.busy += 1
+                self.stats[job.klass]['wait_ms'] += (now - job.enqueued_at) * 1000
+
+            started = time.monotonic()
+            try:
+                result = job.fn(*job.args)
+                job.future.set_result(result)
+                outcome = 'completed'
+            except Exception as e:
+                job.future.set_exception(e)
+                outcome = 'failed'
+
+            with self.cond:
+                self.busy -= 1
+                self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - started)
+                self.stats[job.klass][outcome] += 1
+
+    def get_stats(self):
+        with self.cond:
+            stats = {}
+            for klass, values in self.stats.items():
+                started = values['completed'] + values['failed']
+                stats[klass] = dict(values, avg_wait_ms=round(values['wait_ms'] / started, 1) if started else None)
+                del stats[klass]['wait_ms']
+            return {
+                'workers': self.workers,
+                'busy': self.busy,
+                'queued': len(self.heap),
+                'avg_service_seconds': round(self.service_time, 2),
+                'classes': stats,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = GeminiScheduler(_setting('GEMINI_MAX_CONCURRENCY', 4))
+    return _scheduler
+
+
+def generate(model, prompt, klass='chat', timeout=None):
+    """model.generate_content(prompt) through the scheduler"""
+    return get_scheduler().run(klass, model.generate_content, prompt, timeout=timeout)
+
+
+def get_queue_stats():
+    return get_scheduler().get_stats()
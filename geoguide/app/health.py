@@ -0,0 +1,123 @@
+import time
+import threading
+from collections import deque
+from django.conf import settings
+
+# ==================== HEALTH PROBES ====================
+#
+# Upstream dependencies are checked by a background thread on an interval.
+# /health and /ready only read the last results from memory, so load balancer
+# checks never touch Google or Gemini themselves.
+
+HISTORY_SIZE = 20
+
+_lock = threading.Lock()
+_probes = {}
+_monitor = None
+started_at = time.time()
+
+
+class Probe:
+
+    def __init__(self, name, check, interval, critical=True):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.critical = critical
+        self.latencies_ms = deque(maxlen=HISTORY_SIZE)
+        self.ok = None
+        self.detail = None
+        self.last_error = None
+        self.last_error_at = None
+        self.last_checked = None
+        self.next_run = 0
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            detail = self.check()
+            ok = True
+            error = None
+        except Exception as e:
+            detail = None
+            ok = False
+            error = str(e)
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        with _lock:
+            self.latencies_ms.append(latency_ms)
+            self.ok = ok
+            self.detail = detail
+            self.last_checked = time.time()
+            if error:
+                self.last_error = error
+                self.last_error_at = self.last_checked
+        self.next_run = time.time() + self.interval
+
+    def is_fresh(self):
+        return self.last_checked is not None and time.time() - self.last_checked < self.interval * 3
+
+    def snapshot(self):
+        with _lock:
+            latencies = list(self.latencies_ms)
+            return {
+                'ok': self.ok,
+                'fresh': self.is_fresh(),
+                'critical': self.critical,
+                'detail': self.detail,
+                'last_checked': self.last_checked,
+                'latency_ms': latencies[-1] if latencies else None,
+                'latency_history_ms': latencies,
+                'last_error': self.last_error,
+                'last_error_at': self.last_error_at,
+            }
+
+
+def register_probe(name, check, interval=None, critical=True):
+    """check() raises on failure; whatever it returns is reported as the probe detail"""
+    interval = interval or getattr(settings, 'HEALTH_PROBE_INTERVAL', 60)
+    with _lock:
+        _probes[name] = Probe(name, check, interval, critical)
+
+
+class HealthMonitor(threading.Thread):
+
+    def __init__(self):
+        super().__init__(daemon=True, name='health-monitor')
+
+    def run(self):
+        while True:
+            now = time.time()
+            for probe in list(_probes.values()):
+                if now >= probe.next_run:
+                    probe.run()
+            time.sleep(1)
+
+
+def ensure_started():
+    """Start the background prober once per process"""
+    global _monitor
+    if _monitor is not None or not getattr(settings, 'HEALTH_PROBES_ENABLED', True):
+        return
+    with _lock:
+        if _monitor is None:
+            _monitor = HealthMonitor()
+            _monitor.start()
+
+
+def get_status():
+    """Liveness plus per-dependency readiness, straight from memory"""
+    dependencies = {name: probe.snapshot() for name, probe in list(_probes.items())}
+    probing = getattr(settings, 'HEALTH_PROBES_ENABLED', True)
+    # With probing disabled nothing ever refreshes the results, so they cannot gate readiness
+    ready = not probing or all(
+        dep['ok'] and dep['fresh']
+        for dep in dependencies.values()
+        if dep['critical']
+    )
+    return {
+        'ready': ready,
+        'probes_enabled': probing,
+        'uptime_seconds': round(time.time() - started_at, 1),
+        'dependencies': dependencies,
+    }
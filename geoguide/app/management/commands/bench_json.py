@@ -0,0 +1,89 @@
+import gzip
+import time
+from django.core.management.base import BaseCommand
+
+from app import responses
+from app.middleware import brotli
+
+
+def sample_place(i, lat=13.0827, lng=80.2707):
+    """A place shaped like the ones search_places_smart returns"""
+    place_lat, place_lng = lat + i * 0.001, lng - i * 0.0007
+    nav_base = f"origin={lat},{lng}&destination={place_lat},{place_lng}"
+    return {
+        'name': f"Sample Restaurant {i}",
+        'address': f"{i} Anna Salai, Teynampet, Chennai",
+        'rating': 4.1 + (i % 9) / 10,
+        'total_ratings': 120 + i * 7,
+        'price_level': i % 5,
+        'price_text': 'Moderate (₹200-500)',
+        'location': {'lat': place_lat, 'lng': place_lng},
+        'place_id': f"ChIJ{i:08d}abcdefghijklmnopq",
+        'types': ['restaurant', 'food', 'point_of_interest', 'establishment'],
+        'photo_url': f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference=ref{i}{'x' * 120}&key=KEY",
+        'open_now': i % 2 == 0,
+        'phone': '044 2345 6789',
+        'website': f"https://example.com/restaurant-{i}",
+        'distance_km': round(i * 0.12, 2),
+        'distance_text': f"{round(i * 0.12, 1)}km",
+        'popularity_score': 71.5 - i,
+        'navigation_url': {
+            'google_maps_drive': f"https://www.google.com/maps/dir/?api=1&{nav_base}&travelmode=driving",
+            'google_maps_walk': f"https://www.google.com/maps/dir/?api=1&{nav_base}&travelmode=walking",
+            'apple_maps': f"http://maps.apple.com/?daddr={place_lat},{place_lng}&saddr={lat},{lng}",
+            'waze': f"https://waze.com/ul?ll={place_lat},{place_lng}&navigate=yes",
+            'openstreetmap': f"https://www.openstreetmap.org/directions?engine=graphhopper_foot&route={lat}%2C{lng}%3B{place_lat}%2C{place_lng}",
+            'embedded_map': f"https://www.google.com/maps/embed/v1/directions?key=KEY&{nav_base}&mode=driving",
+            'distance_km': round(i * 0.12, 1),
+            'estimated_time': {'driving': '3 mins', 'walking': '14 mins'},
+            'directions_text': '1.2 km away • 3 mins by car • 14 mins walking',
+        },
+    }
+
+
+def sample_response(count):
+    return {
+        'success': True,
+        'message': "Here are some great places near you! 🍽️ " * 20,
+        'places': [sample_place(i) for i in range(count)],
+        'search_params': {'query': 'restaurant', 'type': 'restaurant', 'category': 'food', 'radius': 10000},
+        'intent_analysis': {'intent_type': 'search_places', 'category': 'food'},
+        'ai_used': True,
+    }
+
+
+def time_call(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON serialization and compression of 8-place and 60-place API responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(f"orjson: {'yes' if responses.orjson else 'no (stdlib fallback)'}, "
+                          f"brotli: {'yes' if brotli else 'no'}")
+
+        for count in (8, 60):
+            payload = sample_response(count)
+            body = responses.dumps(payload)
+
+            stdlib_us = time_call(lambda: responses.dumps_stdlib(payload), iterations)
+            fast_us = time_call(lambda: responses.dumps(payload), iterations)
+            gzip_us = time_call(lambda: gzip.compress(body, compresslevel=6), max(iterations // 10, 1))
+            gzip_size = len(gzip.compress(body, compresslevel=6))
+
+            self.stdout.write(f"\n{count} places, {len(body):,} bytes")
+            self.stdout.write(f"  stdlib json   {stdlib_us:9.1f} us")
+            self.stdout.write(f"  dumps()       {fast_us:9.1f} us  ({stdlib_us / fast_us:.1f}x)")
+            self.stdout.write(f"  gzip -6       {gzip_us:9.1f} us  {gzip_size:,} bytes ({gzip_size / len(body):.0%})")
+            if brotli:
+                br_us = time_call(lambda: brotli.compress(body, quality=5), max(iterations // 10, 1))
+                br_size = len(brotli.compress(body, quality=5))
+                self.stdout.write(f"  brotli q5     {br_us:9.1f} us  {br_size:,} bytes ({br_size / len(body):.0%})")
@@ -0,0 +1,70 @@
+import gc
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+
+from app.records import record_from_search
+from app.management.commands.bench_json import sample_place
+
+TYPES = [
+    ['restaurant', 'food', 'point_of_interest', 'establishment'],
+    ['cafe', 'food', 'point_of_interest', 'establishment'],
+    ['lodging', 'point_of_interest', 'establishment'],
+    ['atm', 'finance', 'point_of_interest', 'establishment'],
+]
+
+
+def sample_search_result(i, lat=13.0827, lng=80.2707):
+    """A Nearby Search result and its Place Details, as returned by Google (fresh strings per place)"""
+    place = {
+        'place_id': f"ChIJ{i:08d}abcdefghijklmnopq",
+        'name': f"Sample Restaurant {i}",
+        'vicinity': f"{i} Anna Salai, Teynampet, Chennai",
+        'geometry': {'location': {'lat': lat + (i % 1000) * 0.001, 'lng': lng - (i // 1000) * 0.0007}},
+        'rating': 4.1 + (i % 9) / 10,
+        'user_ratings_total': 120 + i * 7,
+        'price_level': i % 5,
+        'types': [''.join(t) for t in TYPES[i % len(TYPES)]],  # new string objects, as after json parsing
+        'photos': [{'photo_reference': f"ref{i}{'x' * 120}"}],
+    }
+    details = {
+        'formatted_phone_number': '044 2345 6789',
+        'website': f"https://example.com/restaurant-{i}",
+        'utc_offset_minutes': 330,
+        'opening_hours': {'periods': [
+            {'open': {'day': d, 'time': '0900'}, 'close': {'day': d, 'time': '2230'}} for d in range(7)
+        ]},
+    }
+    return place, details
+
+
+def measure(build, count):
+    """Bytes retained by `count` objects from build(i), and the build time"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = [build(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size, elapsed
+
+
+class Command(BaseCommand):
+    help = "Memory benchmark: ranked places held as dicts vs compact PlaceRecords"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        dict_bytes, dict_seconds = measure(sample_place, count)
+        # The raw Google dicts are dropped after each build; only what the record keeps is counted
+        record_bytes, record_seconds = measure(lambda i: record_from_search(*sample_search_result(i)), count)
+
+        self.stdout.write(f"{count:,} places")
+        self.stdout.write(f"  place dicts     {dict_bytes / 2**20:8.1f} MiB  {dict_bytes / count:7.0f} B/place  "
+                          f"built in {dict_seconds:.2f}s")
+        self.stdout.write(f"  PlaceRecords    {record_bytes / 2**20:8.1f} MiB  {record_bytes / count:7.0f} B/place  "
+                          f"built in {record_seconds:.2f}s  ({dict_bytes / record_bytes:.1f}x smaller)")
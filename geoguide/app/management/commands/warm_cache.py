@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import threading
+from math import cos, radians
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import views
+from app.cache import cell_precision, snap_to_cell, get_cache_stats
+from app.ratelimit import RateLimiter
+
+DEFAULT_CATEGORIES = ['restaurant', 'coffee', 'hotel', 'atm', 'pharmacy', 'petrol']
+
+
+class Command(BaseCommand):
+    help = "Pre-warm the geocode, nearby search and place details caches for popular regions and categories"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', action='append', default=[],
+                            help="Region as 'lat,lng,radius_km' (repeatable)")
+        parser.add_argument('--regions-file',
+                            help="JSON list of {lat, lng, radius_km} objects, or a text file of 'lat,lng,radius_km' lines")
+        parser.add_argument('--categories', default=','.join(DEFAULT_CATEGORIES),
+                            help="Comma separated intent keywords from analyze_user_intent_smart")
+        parser.add_argument('--details', type=int, default=3, help="Top places per search to fetch details for")
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--qps', type=float, default=10.0, help="Upstream requests per second")
+        parser.add_argument('--max-cells', type=int, default=50, help="Cells per region, closest to the centre first")
+        parser.add_argument('--state-file', default=str(settings.BASE_DIR / '.cache' / 'warm_cache_state.json'),
+                            help="Completed tasks are recorded here so an interrupted run can resume")
+        parser.add_argument('--restart', action='store_true', help="Ignore the state file and warm everything")
+        parser.add_argument('--dry-run', action='store_true', help="Only print the plan and the worst-case cost")
+
+    def handle(self, *args, **options):
+        regions = self.load_regions(options)
+        categories = self.load_categories(options['categories'])
+
+        tasks = []
+        for region in regions:
+            for cell in region_cells(region['lat'], region['lng'], region['radius_km'], options['max_cells']):
+                for category in categories:
+                    tasks.append((cell, category))
+
+        self.state_file = options['state_file']
+        done = set() if options['restart'] else self.load_state()
+        pending = [task for task in tasks if task_key(*task) not in done]
+        self.stdout.write(f"{len(tasks)} tasks planned, {len(tasks) - len(pending)} already done, {len(pending)} to run")
+
+        if options['dry_run']:
+            cells = {cell for cell, _ in pending}
+            rings = {
+                category: len(views.get_search_radii(
+                    views.extract_search_params_from_intent(views.analyze_user_intent_smart(category))))
+                for category in categories
+            }
+            worst_case = {
+                'geocode': len(cells),
+                'nearby': sum(rings[category] for _, category in pending),
+                'details': len(pending) * options['details'],
+            }
+            self.report_cost(worst_case, "Worst-case cost")
+            return
+
+        self.done = done
+        self.state_lock = threading.Lock()
+        self.limiter = RateLimiter(options['qps'])
+        self.details_per_search = options['details']
+
+        stats_before = get_cache_stats()
+        started = time.time()
+        completed = failed = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(self.warm, cell, category): (cell, category) for cell, category in pending}
+            for future in as_completed(futures):
+                cell, category = futures[future]
+                try:
+                    summary = future.result()
+                    completed += 1
+                    self.mark_done(cell, category)
+                    self.stdout.write(f"[{completed + failed}/{len(pending)}] {cell[0]},{cell[1]} {category}: {summary}")
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"[{completed + failed}/{len(pending)}] {cell[0]},{cell[1]} {category}: FAILED ({e})")
+
+        elapsed = time.time() - started
+        upstream_calls = cache_misses_since(stats_before, get_cache_stats())
+        self.stdout.write(f"Finished in {elapsed:.1f}s: {completed} warmed, {failed} failed (re-run to resume)")
+        self.report_cost(upstream_calls, "Upstream calls made")
+
+    # ---------- warming ----------
+
+    def warm(self, cell, category):
+        lat, lng = cell
+        self.limiter.acquire()
+        views.get_location_name_google(lat, lng)
+
+        search_params = views.extract_search_params_from_intent(views.analyze_user_intent_smart(category))
+        # Warm the same rings a progressive search would request: wider ones only while short
+        min_results = getattr(settings, 'PROGRESSIVE_SEARCH_MIN_RESULTS', 8)
+        results = []
+        seen_ids = set()
+        rings = 0
+        for radius in views.get_search_radii(search_params):
+            data = self.fetch_ring(lat, lng, dict(search_params, radius=radius))
+            rings += 1
+            for place in data.get('results', []):
+                if place.get('place_id') not in seen_ids:
+                    seen_ids.add(place.get('place_id'))
+                    results.append(place)
+            if len(results) >= min_results:
+                break
+
+        place_ids = [place['place_id'] for place in results[:self.details_per_search] if place.get('place_id')]
+        for place_id in place_ids:
+            self.limiter.acquire()
+            views.get_place_details(place_id)
+
+        return f"{len(results)} results from {rings} rings, {len(place_ids)} details"
+
+    def fetch_ring(self, lat, lng, search_params):
+        data = None
+        for attempt in range(4):
+            self.limiter.acquire()
+            data = views.fetch_nearby_places(lat, lng, search_params)
+            if data.get('status') != 'OVER_QUERY_LIMIT':
+                break
+            self.limiter.slow_down()
+            time.sleep(2 ** attempt)
+        if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+            raise CommandError(f"nearby search returned {data.get('status')}")
+        return data
+
+    # ---------- inputs ----------
+
+    def load_regions(self, options):
+        specs = list(options['region'])
+        if options['regions_file']:
+            with open(options['regions_file'], encoding='utf-8') as f:
+                content = f.read()
+            try:
+                for item in json.loads(content):
+                    specs.append(f"{item['lat']},{item['lng']},{item.get('radius_km', 5)}")
+            except ValueError:
+                specs.extend(line.strip() for line in content.splitlines() if line.strip() and not line.startswith('#'))
+
+        if not specs:
+            raise CommandError("Give at least one --region or a --regions-file")
+
+        regions = []
+        for spec in specs:
+            try:
+                lat, lng, radius_km = (float(part) for part in spec.split(','))
+            except ValueError:
+                raise CommandError(f"Invalid region '{spec}', expected 'lat,lng,radius_km'")
+            regions.append({'lat': lat, 'lng': lng, 'radius_km': radius_km})
+        return regions
+
+    def load_categories(self, value):
+        categories = [c.strip().lower() for c in value.split(',') if c.strip()]
+        unknown = [c for c in categories if c not in views.INTENT_KEYWORDS]
+        if unknown:
+            raise CommandError(f"Unknown categories {unknown}; choose from {sorted(views.INTENT_KEYWORDS)}")
+        return categories
+
+    # ---------- resumability ----------
+
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return set()
+        with open(self.state_file, encoding='utf-8') as f:
+            return set(json.load(f).get('done', []))
+
+    def mark_done(self, cell, category):
+        with self.state_lock:
+            self.done.add(task_key(cell, category))
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_path = self.state_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'done': sorted(self.done), 'updated': time.time()}, f)
+            os.replace(tmp_path, self.state_file)
+
+    # ---------- reporting ----------
+
+    def report_cost(self, calls, title):
+        prices = getattr(settings, 'UPSTREAM_COST_PER_1000', {})
+        total = 0.0
+        self.stdout.write(f"{title}:")
+        for api, count in calls.items():
+            cost = count * prices.get(api, 0) / 1000
+            total += cost
+            self.stdout.write(f"  {api:<8} {count:>6} calls  ${cost:.2f}")
+        self.stdout.write(f"  total    ${total:.2f}")
+
+
+def task_key(cell, category):
+    return f"{cell[0]},{cell[1]}|{category}"
+
+
+def region_cells(lat, lng, radius_km, max_cells):
+    """Cache cells whose centres fall inside the region, closest to the centre first"""
+    step = 10 ** -cell_precision()
+    lat_span = radius_km / 111.32
+    lng_span = radius_km / (111.32 * max(cos(radians(lat)), 0.01))
+
+    cells = set()
+    steps_lat = int(lat_span / step) + 1
+    steps_lng = int(lng_span / step) + 1
+    for i in range(-steps_lat, steps_lat + 1):
+        for j in range(-steps_lng, steps_lng + 1):
+            cell = snap_to_cell(lat + i * step, lng + j * step)
+            if views.calculate_distance(lat, lng, cell[0], cell[1]) <= radius_km:
+                cells.add(cell)
+    if not cells:
+        cells.add(snap_to_cell(lat, lng))
+
+    ordered = sorted(cells, key=lambda c: views.calculate_distance(lat, lng, c[0], c[1]))
+    return ordered[:max_cells]
+
+
+def cache_misses_since(before, after):
+    """Cache misses per namespace between two stats snapshots (each miss is one upstream call)"""
+    return {
+        namespace: stats['misses'] - before.get(namespace, {}).get('misses', 0)
+        for namespace, stats in after.items()
+        if 'misses' in stats
+    }
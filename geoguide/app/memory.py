@@ -0,0 +1,151 @@
+import re
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .cache import cache_get, cache_set
+from .prompts import build_summary_prompt
+
+# ==================== ROLLING CONVERSATION MEMORY ====================
+#
+# The chat prompt carries the last few turns verbatim plus a short summary of
+# everything before them. The summary lives in the shared cache per
+# conversation_id and is folded forward in the background, one batch of aged-out
+# turns at a time, so no request ever waits on it and the prompt stays the same
+# size however long the chat runs. Until the background fold lands, the aged-out
+# turns are represented by a cheap extractive note.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_executor = ThreadPoolExecutor(max_workers=_setting('MEMORY_SUMMARY_WORKERS', 2), thread_name_prefix='memory')
+_lock = threading.Lock()
+_in_flight = set()
+
+memory_stats = {
+    'summaries_used': 0,
+    'extractive_used': 0,
+    'folds': 0,
+    'fold_errors': 0,
+    'skipped_busy': 0,
+}
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+def clean_conversation_id(value):
+    """Accept only ids we could have issued (hex, bounded length)"""
+    if isinstance(value, str) and re.fullmatch(r'[0-9a-f]{8,64}', value):
+        return value
+    return None
+
+
+def clean_conversation_length(value, history):
+    """The client's count of messages so far, or len(history) when it is missing, malformed or too small"""
+    minimum = len(history or [])
+    if isinstance(value, bool):
+        return minimum
+    try:
+        length = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return minimum
+    if isinstance(value, float) and length != value:
+        return minimum
+    return max(length, minimum)
+
+
+def extractive_summary(messages, max_chars=None):
+    """Stand-in for turns not yet summarized: what the traveler asked for, newest last"""
+    max_chars = max_chars or _setting('MEMORY_SUMMARY_MAX_CHARS', 400)
+    asks = []
+    for msg in messages:
+        if msg.get('role') != 'user':
+            continue
+        text = ' '.join(str(msg.get('content', '')).split())
+        if text:
+            asks.append(text[:80])
+    if not asks:
+        return ''
+    summary = "The traveler earlier asked: " + '; '.join(asks)
+    while len(summary) > max_chars and len(asks) > 1:
+        asks.pop(0)  # keep the most recent requests
+        summary = "The traveler earlier asked: ...; " + '; '.join(asks)
+    return summary[:max_chars]
+
+
+def get_conversation_memory(conversation_id, history, total_messages=None, router=None):
+    """
+    Split the client's history window into (summary, recent_turns).
+
+    history is the tail of the conversation the client sent; total_messages is
+    the length of the whole conversation, so we know which absolute turns the
+    window holds. Turns older than the last MEMORY_RECENT_TURNS are folded into
+    the cached summary by a background job.
+    """
+    history = [msg for msg in (history or []) if isinstance(msg, dict)]
+    recent_turns = _setting('MEMORY_RECENT_TURNS', 4)
+    recent = history[-recent_turns:] if recent_turns else []
+    if not conversation_id:
+        return None, recent
+
+    total = clean_conversation_length(total_messages, history)
+    fold_until = total - len(recent)
+    state = cache_get('summary', conversation_id) or {'summary': '', 'turns': 0}
+    if fold_until <= state['turns']:
+        if state['summary']:
+            memory_stats['summaries_used'] += 1
+        return state['summary'] or None, recent
+
+    # Aged-out turns the summary doesn't cover yet (anything that already slid
+    # out of the client's window without being folded is lost)
+    window_start = total - len(history)
+    unfolded = history[max(state['turns'] - window_start, 0):fold_until - window_start]
+    schedule_summary_fold(conversation_id, state, unfolded, fold_until, router)
+
+    note = extractive_summary(unfolded)
+    if note:
+        memory_stats['extractive_used'] += 1
+    summary = ' '.join(part for part in (state['summary'], note) if part)
+    return summary or None, recent
+
+
+def schedule_summary_fold(conversation_id, state, messages, turns, router):
+    """Fold messages into the summary in the background; one job per conversation at a time"""
+    if not router or not messages or not _setting('MEMORY_SUMMARY_ENABLED', True):
+        return False
+    with _lock:
+        if conversation_id in _in_flight or len(_in_flight) >= _setting('MEMORY_SUMMARY_MAX_PENDING', 8):
+            memory_stats['skipped_busy'] += 1
+            return False
+        _in_flight.add(conversation_id)
+    _executor.submit(_run_fold, conversation_id, state, messages, turns, router)
+    return True
+
+
+def _run_fold(conversation_id, state, messages, turns, router):
+    try:
+        prompt = build_summary_prompt(state['summary'], messages)
+        response = router.generate(prompt, 'background')
+        summary = ' '.join(response.text.split())[:_setting('MEMORY_SUMMARY_MAX_CHARS', 400)]
+
+        current = cache_get('summary', conversation_id)
+        if current and current['turns'] >= turns:
+            return  # a newer fold already landed
+        cache_set('summary', {'summary': summary, 'turns': turns}, conversation_id)
+        memory_stats['folds'] += 1
+        print(f"DEBUG: Conversation {conversation_id[:8]} summary now covers {turns} messages")
+    except Exception as e:
+        memory_stats['fold_errors'] += 1
+        print(f"DEBUG: Conversation summary failed: {e}")
+    finally:
+        with _lock:
+            _in_flight.discard(conversation_id)
+
+
+def get_memory_stats():
+    with _lock:
+        return dict(memory_stats, in_flight=len(_in_flight))
@@ -0,0 +1,334 @@
+import os
+import io
+import re
+import sys
+import gzip
+import time
+import json
+import random
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from django.conf import settings
+from django.core import signing
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# ==================== PROFILING MIDDLEWARE ====================
+
+PROFILE_HEADER = 'HTTP_X_GEOGUIDE_PROFILE'
+PROFILE_SALT = 'geoguide.profile'
+
+# Only one deterministic profile may run at a time (cProfile/tracemalloc are process-wide)
+_profile_lock = threading.Lock()
+
+
+def make_profile_token(mode='save'):
+    """Create a signed value for the X-GeoGuide-Profile header ('save' or 'inline')"""
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign(mode)
+
+
+def read_profile_token(value):
+    """Return the requested mode from a signed header value, or None if invalid/expired"""
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+    try:
+        mode = signing.TimestampSigner(salt=PROFILE_SALT).unsign(value, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    return mode if mode in ('save', 'inline') else None
+
+
+class StackSampler(threading.Thread):
+    """Low-overhead sampling profiler: periodically records the stack of one thread"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self):
+        """Stacks in the collapsed format understood by flamegraph tools"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiling.
+
+    - A request carrying a valid signed ``X-GeoGuide-Profile`` header (see
+      ``make_profile_token``) runs under cProfile with tracemalloc snapshots of
+      the ``PROFILING_TRACE_MODULES`` call tree. Mode 'inline' returns the report
+      instead of the normal response, mode 'save' writes it to PROFILING_OUTPUT_DIR.
+    - With PROFILING_ENABLED, a PROFILING_SAMPLE_RATE fraction of live traffic is
+      profiled with the stack sampler and saved as folded stacks.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', False)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.sample_interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005)
+        self.output_dir = str(getattr(settings, 'PROFILING_OUTPUT_DIR', 'profiles'))
+        self.top_n = getattr(settings, 'PROFILING_TOP_N', 30)
+        self.trace_modules = getattr(settings, 'PROFILING_TRACE_MODULES', ['app.views'])
+
+    def __call__(self, request):
+        header = request.META.get(PROFILE_HEADER)
+        if header:
+            mode = read_profile_token(header)
+            if mode:
+                return self.profile_request(request, mode)
+            print("DEBUG: Ignoring invalid profiling token")
+
+        if self.enabled and self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.sample_request(request)
+
+        return self.get_response(request)
+
+    # ---------- deterministic profile of a single request ----------
+
+    def profile_request(self, request, mode):
+        if not _profile_lock.acquire(blocking=False):
+            print("DEBUG: Profiler busy, serving request unprofiled")
+            return self.get_response(request)
+
+        try:
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start(25)
+            before = tracemalloc.take_snapshot()
+
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            after = tracemalloc.take_snapshot()
+            if not was_tracing:
+                tracemalloc.stop()
+        finally:
+            _profile_lock.release()
+
+        report = {
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'profile': self.format_stats(profiler),
+            'allocations': self.format_allocations(before, after),
+        }
+        print(f"DEBUG: Profiled {request.method} {request.path} in {elapsed_ms:.1f}ms")
+
+        if mode == 'inline':
+            return JsonResponse(report)
+
+        base = self.output_path(request)
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        response['X-GeoGuide-Profile-Saved'] = os.path.basename(base)
+        return response
+
+    def format_stats(self, profiler):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        return stream.getvalue()
+
+    def trace_filters(self):
+        """tracemalloc filters keeping allocations made anywhere below the traced modules"""
+        filters = []
+        for module_name in self.trace_modules:
+            module = sys.modules.get(module_name)
+            filename = getattr(module, '__file__', None)
+            if filename:
+                filters.append(tracemalloc.Filter(True, filename, all_frames=True))
+        return filters
+
+    def format_allocations(self, before, after):
+        filters = self.trace_filters()
+        if filters:
+            before = before.filter_traces(filters)
+            after = after.filter_traces(filters)
+
+        allocations = []
+        for stat in after.compare_to(before, 'traceback')[:self.top_n]:
+            allocations.append({
+                'size_diff_kb': round(stat.size_diff / 1024, 2),
+                'count_diff': stat.count_diff,
+                'traceback': stat.traceback.format(limit=5),
+            })
+        return allocations
+
+    # ---------- low-overhead sampling of live traffic ----------
+
+    def sample_request(self, request):
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if sampler.samples:
+            base = self.output_path(request)
+            with open(base + '.folded', 'w', encoding='utf-8') as f:
+                f.write(sampler.folded())
+            print(f"DEBUG: Sampled {request.path} ({sampler.samples} samples, {elapsed_ms:.1f}ms)")
+        return response
+
+    def output_path(self, request):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = request.path.strip('/').replace('/', '_') or 'root'
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        return os.path.join(self.output_dir, f"{stamp}-{int(time.time() * 1000) % 1000:03d}-{request.method}-{slug}")
+
+
+# ==================== RESPONSE COMPRESSION ====================
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def parse_accept_encoding(header):
+    """Map of coding -> q value from an Accept-Encoding header"""
+    codings = {}
+    for part in header.split(','):
+        pieces = part.strip().split(';')
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            match = re.match(r'\s*q=([0-9.]+)', param)
+            if match:
+                try:
+                    q = float(match.group(1))
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """Pick brotli or gzip according to the client's preferences (None if neither is acceptable)"""
+    codings = parse_accept_encoding(header or '')
+    wildcard = codings.get('*', 0.0)
+    candidates = []
+    if brotli is not None:
+        candidates.append(('br', codings.get('br', wildcard), 1))
+    candidates.append(('gzip', codings.get('gzip', wildcard), 0))
+    encoding, q, _ = max(candidates, key=lambda c: (c[1], c[2]))
+    return encoding if q > 0 else None
+
+
+def encoded_etag(etag, encoding):
+    """Strong ETag of the compressed representation, e.g. "<hash>" -> "<hash>-gzip" """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class CompressionMiddleware:
+    """
+    Content-negotiated brotli/gzip compression for responses larger than
+    COMPRESSION_MIN_SIZE bytes. Brotli is used only when the module is installed.
+    Strong ETags stay strong: each encoding gets its own ("<hash>-br", "<hash>-gzip"),
+    and If-None-Match values for the negotiated encoding are mapped back for the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        revalidated = self.map_if_none_match(request, encoding)
+        response = self.get_response(request)
+
+        if response.status_code == 304:
+            # The client holds the compressed representation it validated
+            etag = response.get('ETag')
+            if etag in revalidated:
+                response['ETag'] = encoded_etag(etag, encoding)
+            return response
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = encoded_etag(etag, encoding)
+        return response
+
+    def map_if_none_match(self, request, encoding):
+        """
+        Rewrite "<hash>-<encoding>" validators in If-None-Match to the view's "<hash>" so it can
+        answer 304. Only the encoding negotiated now counts: that is the body the client would get.
+        Returns the rewritten (view-side) ETags.
+        """
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header or encoding is None:
+            return set()
+        suffix = f'-{encoding}"'
+        tags = []
+        revalidated = set()
+        for tag in (tag.strip() for tag in header.split(',')):
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                revalidated.add(tag)
+            tags.append(tag)
+        request.META['HTTP_IF_NONE_MATCH'] = ', '.join(tags)
+        return revalidated
@@ -0,0 +1,190 @@
+import time
+import threading
+from collections import deque
+from django.conf import settings
+from . import gemini_queue
+
+# ==================== GEMINI MODEL ROUTER ====================
+#
+# Several Gemini models are configured (GEMINI_MODELS), each with a quality
+# tier and a relative cost. Every call site asks for a priority class, which
+# maps to the minimum tier it needs (GEMINI_TASK_TIERS): greetings and short
+# descriptions are fine on a flash-class model, chat recommendations want more.
+# Among the healthy models that are good enough, the one with the lowest
+# rolling latency wins (cost breaks ties). Models that keep failing are taken
+# out for a cooldown and calls fail over to the next candidate; when nothing
+# adequate is healthy, a lower tier answers rather than nobody.
+
+DEFAULT_MODELS = [
+    {'name': 'models/gemini-1.5-flash-latest', 'tier': 1, 'cost': 1, 'latency': 1.5},
+    {'name': 'models/gemini-1.5-pro-latest', 'tier': 2, 'cost': 4, 'latency': 4.0},
+    {'name': 'models/gemini-1.0-pro-latest', 'tier': 1, 'cost': 2, 'latency': 3.0},
+    {'name': 'models/gemini-pro', 'tier': 1, 'cost': 2, 'latency': 3.0},
+]
+
+# Minimum quality tier per gemini_queue priority class
+DEFAULT_TASK_TIERS = {
+    'chat': 2,
+    'diagnostic': 1,
+    'description': 1,
+    'greeting': 1,
+    'background': 1,
+}
+
+LATENCY_ALPHA = 0.3  # EWMA weight of the newest sample
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task_tier(klass):
+    tiers = _setting('GEMINI_TASK_TIERS', DEFAULT_TASK_TIERS)
+    return tiers.get(klass, DEFAULT_TASK_TIERS.get(klass, 1))
+
+
+class ModelEntry:
+    """One configured model with its rolling latency and error statistics"""
+
+    def __init__(self, spec, model):
+        self.name = spec['name']
+        self.tier = spec.get('tier', 1)
+        self.cost = spec.get('cost', 1)
+        self.prior_latency = spec.get('latency', 2.0)
+        self.model = model
+        self.latency = None          # EWMA seconds of successful generations
+        self.last_sample = 0.0
+        self.outcomes = deque(maxlen=_setting('GEMINI_MODEL_WINDOW', 20))  # True = failed
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def expected_latency(self, now):
+        # Estimates go stale for models that lost the routing; fall back to the prior so they get retried
+        if self.latency is None or now - self.last_sample > _setting('GEMINI_MODEL_STATS_TTL', 300):
+            return self.prior_latency
+        return self.latency
+
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self, now):
+        return now >= self.cooldown_until
+
+
+class ModelRouter:
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def candidates(self, klass):
+        """Models to try for this class, best first"""
+        need = task_tier(klass)
+        now = time.monotonic()
+        with self.lock:
+            def score(entry):
+                return (entry.expected_latency(now) * (1 + entry.error_rate()), entry.cost)
+
+            healthy = [e for e in self.entries if e.healthy(now)]
+            adequate = sorted((e for e in healthy if e.tier >= need), key=score)
+            weaker = sorted((e for e in healthy if e.tier < need), key=lambda e: (-e.tier,) + score(e))
+            # Everything cooling down comes last, soonest back first
+            resting = sorted((e for e in self.entries if not e.healthy(now)), key=lambda e: e.cooldown_until)
+            return adequate + weaker + resting
+
+    def pick(self, klass='chat'):
+        candidates = self.candidates(klass)
+        return candidates[0].name if candidates else None
+
+    def generate(self, prompt, klass='chat', timeout=None):
+        """
+        Generate through the Gemini scheduler on the best model for this class, failing over
+        to the next candidate on model errors within the same timeout.
+        Raises gemini_queue.GeminiOverloaded when shed or out of time, else the last model error.
+        """
+        timeout = timeout if timeout is not None else gemini_queue.class_deadline(klass)
+        expires_at = time.monotonic() + timeout
+        attempts = self.candidates(klass)[:_setting('GEMINI_MODEL_FAILOVER_ATTEMPTS', 2)]
+        if not attempts:
+            raise Exception('No Gemini model configured')
+
+        error = None
+        for entry in attempts:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return gemini_queue.get_scheduler().run(klass, self._call, entry, prompt, timeout=remaining)
+            except gemini_queue.GeminiOverloaded:
+                raise  # queue pressure, not the model's fault; another model won't help
+            except Exception as e:
+                print(f"DEBUG: Gemini {entry.name} failed for {klass}, failing over: {e}")
+                error = e
+        raise error or gemini_queue.GeminiOverloaded(f"Gemini {klass} call ran out of time")
+
+    def _call(self, entry, prompt):
+        """Runs on a scheduler worker; times the generation alone, without the queueing"""
+        started = time.monotonic()
+        try:
+            response = entry.model.generate_content(prompt)
+        except Exception:
+            self._record(entry, time.monotonic() - started, failed=True)
+            raise
+        self._record(entry, time.monotonic() - started, failed=False)
+        return response
+
+    def _record(self, entry, seconds, failed):
+        now = time.monotonic()
+        with self.lock:
+            entry.calls += 1
+            entry.outcomes.append(failed)
+            if failed:
+                entry.failures += 1
+                if (len(entry.outcomes) >= _setting('GEMINI_MODEL_MIN_SAMPLES', 3)
+                        and entry.error_rate() >= _setting('GEMINI_MODEL_MAX_ERROR_RATE', 0.5)):
+                    entry.cooldown_until = now + _setting('GEMINI_MODEL_COOLDOWN', 30)
+                    entry.outcomes.clear()  # start fresh after the cooldown
+                    print(f"DEBUG: Gemini {entry.name} degraded, cooling down")
+            else:
+                entry.latency = seconds if entry.latency is None else (
+                    LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * entry.latency)
+                entry.last_sample = now
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self.lock:
+            models = [{
+                'name': e.name,
+                'tier': e.tier,
+                'cost': e.cost,
+                'healthy': e.healthy(now),
+                'latency_seconds': round(e.latency, 2) if e.latency is not None else None,
+                'error_rate': round(e.error_rate(), 2),
+                'calls': e.calls,
+                'failures': e.failures,
+            } for e in self.entries]
+        return {
+            'models': models,
+            'routes': {klass: self.pick(klass) for klass in gemini_queue.PRIORITIES},
+        }
+
+
+def build_router(available_names, make_model):
+    """
+    Router over the configured models the API lists as available (all of them when
+    the listing failed, i.e. available_names is None); make_model(name) builds the client.
+    """
+    entries = []
+    for spec in _setting('GEMINI_MODELS', DEFAULT_MODELS):
+        if available_names is not None and not any(spec['name'] in name for name in available_names):
+            continue
+        try:
+            entries.append(ModelEntry(spec, make_model(spec['name'])))
+            print(f"DEBUG: Gemini model {spec['name']} routed at tier {spec.get('tier', 1)}")
+        except Exception as e:
+            print(f"DEBUG: Gemini model {spec['name']} could not be configured: {e}")
+    return ModelRouter(entries)
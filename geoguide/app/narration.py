@@ -0,0 +1,52 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .cache import cache_get, cache_set
+
+# ==================== DEFERRED AI NARRATION ====================
+#
+# Map widgets and kiosks want the ranked places now and the Gemini text later,
+# if at all. With ai='deferred' the search returns immediately with a narration
+# token; the narration is generated here in the background and stored in the
+# shared cache, so any worker can answer GET /api/narration/<token>/.
+# With ai=false no narration is generated at all.
+
+AI_MODES = ('inline', 'deferred', 'off')
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'NARRATION_WORKERS', 4), thread_name_prefix='narration'
+)
+
+
+def parse_ai_mode(value):
+    """'inline' (default), 'deferred' or 'off' from a request's `ai` value"""
+    if value is None or value is True:
+        return 'inline'
+    text = str(value).strip().lower()
+    if text in ('false', '0', 'no', 'off', 'none'):
+        return 'off'
+    if text in ('deferred', 'async', 'later'):
+        return 'deferred'
+    return 'inline'
+
+
+def schedule_narration(generate, *args, **kwargs):
+    """Run generate(*args, **kwargs) in the background; returns the token to fetch its text with"""
+    token = uuid.uuid4().hex
+    cache_set('narration', {'status': 'pending'}, token)
+    _executor.submit(_run, token, generate, args, kwargs)
+    return token
+
+
+def _run(token, generate, args, kwargs):
+    try:
+        message = generate(*args, **kwargs)
+        cache_set('narration', {'status': 'ready', 'message': message}, token)
+    except Exception as e:
+        print(f"DEBUG: Deferred narration failed: {e}")
+        cache_set('narration', {'status': 'failed', 'error': str(e)}, token)
+
+
+def get_narration(token):
+    """{'status': 'pending' | 'ready' | 'failed', ...}, or None for unknown/expired tokens"""
+    return cache_get('narration', token)
@@ -0,0 +1,130 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+
+# ==================== LOCAL OPEN-NOW EVALUATION ====================
+#
+# Place Details gives opening_hours.periods (Sunday = day 0, times as 'HHMM'
+# in the place's local time) and the place's UTC offset in minutes. With those
+# cached we can work out open/closed for any request time without asking
+# Google again, so details can be cached for days.
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+HINT_WINDOW_MINUTES = 60
+DAY_NAMES = ('Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+
+
+def _week_minute(point):
+    """Minutes since Sunday 00:00 for a {'day': d, 'time': 'HHMM'} period point"""
+    time_text = point.get('time', '0000')
+    return point.get('day', 0) * MINUTES_PER_DAY + int(time_text[:2]) * 60 + int(time_text[2:4])
+
+
+def _format_clock(week_minute):
+    minutes = week_minute % MINUTES_PER_DAY
+    return f"{minutes // 60:d}:{minutes % 60:02d}"
+
+
+def local_week_minute(utc_offset_minutes, now=None):
+    now = now or datetime.now(timezone.utc)
+    local = now.astimezone(timezone.utc) + timedelta(minutes=utc_offset_minutes)
+    # Python weekday(): Monday = 0; Places periods: Sunday = 0
+    day = (local.weekday() + 1) % 7
+    return day * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def get_utc_offset(place_details):
+    offset = place_details.get('utc_offset_minutes', place_details.get('utc_offset'))
+    return int(offset) if offset is not None else None
+
+
+def compact_periods(opening_hours):
+    """
+    Opening periods as a flat array('H') of [start, end, start, end, ...] week minutes,
+    about 100 bytes instead of a list of nested dicts. None when the periods are unknown
+    (including when none of them has both ends); open 24/7 is [0, MINUTES_PER_WEEK].
+    """
+    periods = (opening_hours or {}).get('periods')
+    if not periods:
+        return None
+
+    # Open 24/7 is a single period opening Sunday 00:00 with no close
+    if len(periods) == 1 and 'close' not in periods[0]:
+        return array('H', (0, MINUTES_PER_WEEK))
+
+    flat = array('H')
+    for period in periods:
+        if 'open' not in period or 'close' not in period:
+            continue
+        start = _week_minute(period['open'])
+        end = _week_minute(period['close'])
+        if end <= start:
+            end += MINUTES_PER_WEEK  # crosses Saturday night into Sunday
+        flat.extend((start, end))
+    # An empty array would read as "always closed"; periods we cannot use are unknown hours
+    return flat or None
+
+
+def evaluate_opening_hours(opening_hours, utc_offset_minutes, now=None):
+    """
+    Open/closed status at `now` (UTC, defaults to the current time):
+    {'open_now': bool or None, 'closes_in_minutes', 'opens_in_minutes', 'hint'}.
+    open_now is None when the periods or the UTC offset are unknown.
+    """
+    return evaluate_periods(compact_periods(opening_hours), utc_offset_minutes, now)
+
+
+def evaluate_periods(periods, utc_offset_minutes, now=None):
+    """evaluate_opening_hours for periods already packed by compact_periods"""
+    result = {'open_now': None, 'closes_in_minutes': None, 'opens_in_minutes': None, 'hint': None}
+    if periods is None or utc_offset_minutes is None:
+        return result
+
+    if len(periods) == 2 and periods[0] == 0 and periods[1] == MINUTES_PER_WEEK:
+        result.update(open_now=True, hint='Open 24 hours')
+        return result
+
+    current = local_week_minute(utc_offset_minutes, now)
+    next_open = None
+    for i in range(0, len(periods), 2):
+        start, end = periods[i], periods[i + 1]
+
+        for shifted in (current, current + MINUTES_PER_WEEK):
+            if start <= shifted < end:
+                closes_in = end - shifted
+                result.update(open_now=True, closes_in_minutes=closes_in)
+                if closes_in <= HINT_WINDOW_MINUTES:
+                    result['hint'] = f"Closes in {closes_in} min"
+                else:
+                    result['hint'] = f"Open until {_format_clock(end)}"
+                return result
+
+        opens_in = (start - current) % MINUTES_PER_WEEK
+        if next_open is None or opens_in < next_open[0]:
+            next_open = (opens_in, start)
+
+    result['open_now'] = False
+    if next_open is not None:
+        opens_in, start = next_open
+        result['opens_in_minutes'] = opens_in
+        if opens_in <= HINT_WINDOW_MINUTES:
+            result['hint'] = f"Opens in {opens_in} min"
+        else:
+            result['hint'] = _opens_hint(current, opens_in, start)
+    return result
+
+
+def _opens_hint(current, opens_in, start):
+    """'Opens at 9:00' today, 'Opens tomorrow at 9:00' or 'Opens Monday at 9:00' from the next opening"""
+    days_ahead = (current % MINUTES_PER_DAY + opens_in) // MINUTES_PER_DAY
+    if days_ahead == 0:
+        return f"Opens at {_format_clock(start)}"
+    if days_ahead == 1:
+        return f"Opens tomorrow at {_format_clock(start)}"
+    day = (start // MINUTES_PER_DAY) % 7
+    return f"Opens {DAY_NAMES[day]} at {_format_clock(start)}"
+
+
+def evaluate_place(place_details, now=None):
+    """evaluate_opening_hours for a Place Details result"""
+    return evaluate_opening_hours(place_details.get('opening_hours'), get_utc_offset(place_details), now)
@@ -0,0 +1,274 @@
+import time
+import threading
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from .cache import cell_id
+from .ratelimit import RateLimiter
+
+# ==================== FIRST-QUERY PREDICTION ====================
+#
+# The greeting is the first call of every session and the first search that
+# follows is very predictable: food, coffee, an ATM or a hotel. We keep the mix
+# of first queries per region and time of day (blended with the global mix and
+# fixed priors while a region has little history) and, while the greeting is
+# being generated, warm the Nearby Search and Place Details caches for the
+# most likely ones. A rate limit, a pending cap and a minimum probability bound
+# the speculative work; the hit rate shows how much of it pays off.
+
+DAYPARTS = ('morning', 'afternoon', 'evening', 'night')
+
+# Example first queries per daypart, turned into search parameters by the views
+DEFAULT_PRIOR_QUERIES = {
+    'morning': ['coffee', 'breakfast', 'atm'],
+    'afternoon': ['restaurant', 'coffee', 'atm'],
+    'evening': ['restaurant', 'hotel', 'atm'],
+    'night': ['hotel', 'restaurant', 'atm'],
+}
+
+MAX_REGIONS = 5000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def time_of_day(hour):
+    if hour < 12:
+        return "morning"
+    elif hour < 17:
+        return "afternoon"
+    elif hour < 21:
+        return "evening"
+    return "night"
+
+
+def local_hour(data, lng=None, now=None):
+    """
+    Hour of day where the user is: from the client's local_hour or utc_offset_minutes,
+    else estimated from the longitude (solar time). None when neither is known.
+    """
+    now = now or datetime.now(timezone.utc)
+    hour = data.get('local_hour')
+    if isinstance(hour, (int, float)) and not isinstance(hour, bool) and 0 <= hour < 24:
+        return int(hour)
+    offset = data.get('utc_offset_minutes')
+    if not (isinstance(offset, (int, float)) and not isinstance(offset, bool) and -14 * 60 <= offset <= 14 * 60):
+        try:
+            offset = round(float(lng) / 15) * 60
+        except (TypeError, ValueError, OverflowError):
+            return None
+    return (now.astimezone(timezone.utc) + timedelta(minutes=offset)).hour
+
+
+def search_key(search_params):
+    """What makes two searches hit the same Nearby Search cache entries"""
+    return (search_params.get('type', ''), search_params.get('query', ''), search_params.get('radius'))
+
+
+def region_id(lat, lng):
+    """Query mixes are kept per region (~11 km), coarser than cache cells, so they fill up faster"""
+    precision = _setting('PREDICT_REGION_PRECISION', 1)
+    return f"{round(float(lat), precision)},{round(float(lng), precision)}"
+
+
+_executor = ThreadPoolExecutor(max_workers=_setting('PREDICT_MAX_WORKERS', 2), thread_name_prefix='predict')
+_limiter = RateLimiter(_setting('PREDICT_MAX_SEARCHES_PER_SECOND', 2), burst=_setting('PREDICT_BURST', 10))
+_lock = threading.Lock()
+_pending = 0
+
+_priors = {}                # daypart -> [search params]
+_params = {}                # search key -> search params to replay it with
+_global_mix = {daypart: Counter() for daypart in DAYPARTS}
+_region_mix = OrderedDict()  # region -> {daypart: Counter}
+_speculations = OrderedDict()  # (cell, search key) -> {'created_at', 'used'}
+
+predict_stats = {
+    'greetings': 0,
+    'speculated': 0,
+    'already_cached': 0,
+    'used': 0,
+    'wasted': 0,
+    'first_queries': 0,
+    'first_query_hits': 0,
+    'first_query_predicted': 0,
+    'skipped_unlikely': 0,
+    'skipped_busy': 0,
+    'skipped_budget': 0,
+    'errors': 0,
+}
+
+
+def load_priors(priors):
+    """{daypart: [search params]} used while a region has little history"""
+    with _lock:
+        for daypart, params_list in priors.items():
+            _priors[daypart] = list(params_list)
+            for params in params_list:
+                _params.setdefault(search_key(params), params)
+
+
+def _hit_rate():
+    """Share of finished speculations (used or expired) that a real search used"""
+    finished = predict_stats['used'] + predict_stats['wasted']
+    if finished < _setting('PREDICT_MIN_SAMPLES', 20):
+        return None
+    return predict_stats['used'] / finished
+
+
+def _evict_locked(now):
+    ttl = _setting('PREDICT_TTL', 1800)
+    while _speculations:
+        key, entry = next(iter(_speculations.items()))
+        if len(_speculations) <= _setting('PREDICT_MAX_SPECULATIONS', 5000) and now - entry['created_at'] < ttl:
+            break
+        _speculations.popitem(last=False)
+        if not entry['used']:
+            predict_stats['wasted'] += 1
+
+
+def _daypart(hour=None):
+    """Daypart at the user's hour; the server's clock only when that is unknown"""
+    return time_of_day(datetime.now().hour if hour is None else hour)
+
+
+def predict_first_queries(lat, lng, hour=None):
+    """[(probability, search params)] for the first search in this region at this hour, likeliest first"""
+    daypart = _daypart(hour)
+    pseudo_count = _setting('PREDICT_PRIOR_WEIGHT', 5)
+    scores = Counter()
+    with _lock:
+        mixes = _region_mix.get(region_id(lat, lng))
+        scores.update(mixes[daypart] if mixes else {})
+        # Global mix and priors count as a few pseudo-observations each
+        for mix in (_global_mix[daypart], Counter(search_key(p) for p in _priors.get(daypart, []))):
+            total = sum(mix.values())
+            for key, count in mix.items():
+                scores[key] += pseudo_count * count / total
+        total = sum(scores.values())
+        if not total:
+            return []
+        return [(score / total, _params[key]) for key, score in scores.most_common() if key in _params]
+
+
+def schedule_first_query_prefetch(lat, lng, warm, hour=None):
+    """
+    Warm the caches for the likeliest first searches in the background: warm(lat, lng, params)
+    runs each one and returns True if it had to call Google. hour is the user's local hour
+    (see local_hour). Never blocks the caller.
+    """
+    global _pending
+    if not _setting('PREDICT_ENABLED', True) or lat is None or lng is None:
+        return 0
+    top_n = _setting('PREDICT_TOP_N', 2)
+    hit_rate = _hit_rate()
+    if hit_rate is not None and hit_rate < _setting('PREDICT_MIN_HIT_RATE', 0.2):
+        top_n = 1  # most speculation is going to waste
+
+    cell = cell_id(lat, lng)
+    predictions = predict_first_queries(lat, lng, hour)[:top_n]
+    scheduled = 0
+    with _lock:
+        predict_stats['greetings'] += 1
+        now = time.time()
+        _evict_locked(now)
+        for probability, params in predictions:
+            key = (cell, search_key(params))
+            if probability < _setting('PREDICT_MIN_PROBABILITY', 0.15):
+                predict_stats['skipped_unlikely'] += 1
+                continue
+            if key in _speculations:
+                continue  # someone in this cell warmed it recently
+            if _pending >= _setting('PREDICT_MAX_PENDING', 4):
+                predict_stats['skipped_busy'] += 1
+                continue
+            if not _limiter.acquire(timeout=0):
+                predict_stats['skipped_budget'] += 1
+                continue
+            _speculations[key] = {'created_at': now, 'used': False}
+            _pending += 1
+            scheduled += 1
+            _executor.submit(_run, lat, lng, params, warm)
+    return scheduled
+
+
+def _run(lat, lng, params, warm):
+    global _pending
+    try:
+        fetched = warm(lat, lng, dict(params))
+        with _lock:
+            predict_stats['speculated' if fetched else 'already_cached'] += 1
+    except Exception as e:
+        with _lock:
+            predict_stats['errors'] += 1
+        print(f"DEBUG: First-query prefetch failed: {e}")
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+def record_searches(lat, lng, params_list, first_query=False, hour=None):
+    """Count speculations that real searches used; a session's first search also feeds the query mix"""
+    if lat is None or lng is None:
+        return
+    cell = cell_id(lat, lng)
+    daypart = _daypart(hour)
+    predicted = set()
+    if first_query:
+        top_n = _setting('PREDICT_TOP_N', 2)
+        predicted = {search_key(params) for _, params in predict_first_queries(lat, lng, hour)[:top_n]}
+
+    with _lock:
+        keys = [search_key(params) for params in params_list]
+        hit = False
+        for key in keys:
+            entry = _speculations.get((cell, key))
+            if entry is not None:
+                hit = True
+                if not entry['used']:
+                    entry['used'] = True
+                    predict_stats['used'] += 1
+        if not first_query:
+            return
+
+        predict_stats['first_queries'] += 1
+        predict_stats['first_query_hits'] += hit
+        predict_stats['first_query_predicted'] += any(key in predicted for key in keys)
+
+        region = region_id(lat, lng)
+        mixes = _region_mix.get(region)
+        if mixes is None:
+            mixes = _region_mix[region] = {part: Counter() for part in DAYPARTS}
+            while len(_region_mix) > MAX_REGIONS:
+                _region_mix.popitem(last=False)
+        _region_mix.move_to_end(region)
+        for key, params in zip(keys, params_list):
+            _params.setdefault(key, {name: params.get(name) for name in ('query', 'type', 'place_type', 'category', 'radius')})
+            mixes[daypart][key] += 1
+            _global_mix[daypart][key] += 1
+        for mix in (mixes[daypart], _global_mix[daypart]):
+            if sum(mix.values()) > _setting('PREDICT_MAX_COUNTS', 1000):
+                _halve(mix)
+
+
+def _halve(mix):
+    """Halve old counts so the mix follows changing habits"""
+    for key in list(mix):
+        mix[key] //= 2
+        if not mix[key]:
+            del mix[key]
+
+
+def get_predict_stats():
+    with _lock:
+        first = predict_stats['first_queries']
+        return dict(
+            predict_stats,
+            pending=_pending,
+            live_speculations=len(_speculations),
+            regions=len(_region_mix),
+            hit_rate=_hit_rate(),
+            first_query_hit_rate=round(predict_stats['first_query_hits'] / first, 3) if first else None,
+            first_query_accuracy=round(predict_stats['first_query_predicted'] / first, 3) if first else None,
+        )
@@ -0,0 +1,200 @@
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .cache import cache_get, cache_set, cell_id
+from .prompts import build_batch_description_prompt
+
+# ==================== SPECULATIVE DESCRIPTION PREFETCH ====================
+#
+# After a search the next message is usually "tell me more about <top place>".
+# We generate descriptions for the top places in the background with a single
+# batched Gemini call, so the detail-query branch in chat_with_ai can answer
+# straight from the cache. Descriptions and "used" markers live in the shared
+# cache per place and origin cell, so the follow-up can land on any worker but
+# never gets a description written for somewhere else; each worker keeps a
+# ledger of what it generated and settles it as used or wasted when it expires.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_executor = ThreadPoolExecutor(max_workers=_setting('PREFETCH_MAX_WORKERS', 2), thread_name_prefix='prefetch')
+_lock = threading.Lock()
+_pending = 0
+_paused_until = 0
+
+# (place_id, cell) -> created_at of the descriptions this worker generated
+_issued = OrderedDict()
+
+prefetch_stats = {
+    'batches': 0,
+    'prefetched': 0,
+    'already_cached': 0,
+    'served': 0,
+    'used': 0,
+    'wasted': 0,
+    'skipped_busy': 0,
+    'skipped_waste': 0,
+    'errors': 0,
+}
+
+
+def _hit_rate():
+    """Share of finished prefetches (used or evicted) that were actually used"""
+    finished = prefetch_stats['used'] + prefetch_stats['wasted']
+    if finished < _setting('PREFETCH_WASTE_MIN_SAMPLES', 20):
+        return None
+    return prefetch_stats['used'] / finished
+
+
+def _top_n():
+    """Prefetch fewer places when most prefetched descriptions go unused"""
+    top_n = _setting('PREFETCH_TOP_N', 3)
+    hit_rate = _hit_rate()
+    if hit_rate is not None and hit_rate < _setting('PREFETCH_MIN_HIT_RATE', 0.15):
+        return 1
+    return top_n
+
+
+def _expire_locked(now):
+    """Pop expired (or overflowing) ledger entries and return their (place_id, cell) keys"""
+    ttl = _setting('PREFETCH_TTL', 1800)
+    max_entries = _setting('PREFETCH_MAX_ENTRIES', 500)
+    expired = []
+    while _issued:
+        key, created_at = next(iter(_issued.items()))
+        if len(_issued) <= max_entries and now - created_at < ttl:
+            break
+        _issued.popitem(last=False)
+        expired.append(key)
+    return expired
+
+
+def _settle(keys):
+    """Count expired prefetches as used or wasted from the shared markers (cache reads, so outside the lock)"""
+    if not keys:
+        return
+    used = sum(1 for key in keys if cache_get('prefetch_used', *key))
+    with _lock:
+        prefetch_stats['used'] += used
+        prefetch_stats['wasted'] += len(keys) - used
+
+
+def get_prefetched_description(place_id, lat, lng):
+    """Return the description prefetched for this place from the asker's cell (and mark it used), or None"""
+    if not place_id or lat is None or lng is None:
+        return None
+    key = (place_id, cell_id(lat, lng))
+    entry = cache_get('prefetch', *key)
+    if not entry:
+        return None
+    # Whichever worker generated it settles the marker when its ledger entry expires
+    cache_set('prefetch_used', True, *key, ttl=_setting('PREFETCH_TTL', 1800))
+    with _lock:
+        prefetch_stats['served'] += 1
+    return entry['description']
+
+
+def schedule_description_prefetch(places, location_name, router, lat, lng):
+    """Queue a background batch description for the top places found from (lat, lng); never blocks the caller"""
+    global _pending, _paused_until
+    if not router or not places or lat is None or lng is None or not _setting('PREFETCH_ENABLED', True):
+        return False
+    cell = cell_id(lat, lng)
+
+    with _lock:
+        if _pending >= _setting('PREFETCH_MAX_PENDING', 4):
+            prefetch_stats['skipped_busy'] += 1
+            return False
+
+        now = time.time()
+        hit_rate = _hit_rate()
+        if hit_rate is not None and hit_rate < _setting('PREFETCH_PAUSE_HIT_RATE', 0.05):
+            # Nearly everything we prefetch is thrown away: pause, then start a fresh window
+            _paused_until = now + _setting('PREFETCH_PAUSE_SECONDS', 600)
+            prefetch_stats['used'] = prefetch_stats['wasted'] = 0
+            print("DEBUG: Description prefetch paused, hit rate too low")
+        if now < _paused_until:
+            prefetch_stats['skipped_waste'] += 1
+            return False
+
+        candidates = [p for p in places[:_top_n()] if p.get('place_id') and (p['place_id'], cell) not in _issued]
+        if not candidates:
+            return False
+        _pending += 1
+
+    _executor.submit(_run_prefetch, candidates, location_name, router, cell)
+    return True
+
+
+def _run_prefetch(places, location_name, router, cell):
+    global _pending
+    try:
+        with _lock:
+            expired = _expire_locked(time.time())
+        _settle(expired)
+
+        # Another worker may already have described some of them for this cell
+        fresh = [p for p in places if cache_get('prefetch', p['place_id'], cell) is None]
+        with _lock:
+            prefetch_stats['already_cached'] += len(places) - len(fresh)
+        if not fresh:
+            return
+        places = fresh
+
+        prompt = build_batch_description_prompt(places, location_name)
+        response = router.generate(prompt, 'background')
+        descriptions = parse_batch_descriptions(response.text)
+
+        now = time.time()
+        ttl = _setting('PREFETCH_TTL', 1800)
+        stored = []
+        for i, place in enumerate(places, 1):
+            description = descriptions.get(str(i))
+            if not description:
+                continue
+            cache_set('prefetch', {
+                'description': description.strip(),
+                'location_name': location_name,
+                'created_at': now,
+            }, place['place_id'], cell, ttl=ttl)
+            stored.append((place['place_id'], cell))
+        with _lock:
+            prefetch_stats['batches'] += 1
+            prefetch_stats['prefetched'] += len(stored)
+            for key in stored:
+                _issued[key] = now
+                _issued.move_to_end(key)
+        print(f"DEBUG: Prefetched {len(descriptions)} place descriptions for {location_name}")
+    except Exception as e:
+        with _lock:
+            prefetch_stats['errors'] += 1
+        print(f"DEBUG: Description prefetch failed: {e}")
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+def parse_batch_descriptions(text):
+    """Extract the {"1": "...", ...} object from a Gemini reply (tolerates code fences)"""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    return {str(k): v for k, v in data.items() if isinstance(v, str)}
+
+
+def get_prefetch_stats():
+    with _lock:
+        expired = _expire_locked(time.time())
+    _settle(expired)
+    with _lock:
+        return dict(prefetch_stats, issued=len(_issued), pending=_pending, hit_rate=_hit_rate())
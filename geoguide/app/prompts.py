@@ -0,0 +1,319 @@
+import re
+import threading
+import textwrap
+from django.conf import settings
+
+# ==================== PROMPT TEMPLATES ====================
+
+# Rough Gemini token estimate: ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGETS = {
+    'greeting': 250,
+    'place_description': 350,
+    'batch_description': 600,
+    'chat': 900,
+    'summary': 400,
+}
+
+_stats_lock = threading.Lock()
+prompt_stats = {}
+
+
+class PromptTemplate:
+    """A prompt compiled once: dedented, blank lines collapsed, trailing spaces removed"""
+
+    def __init__(self, name, text):
+        self.name = name
+        lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+        compiled = '\n'.join(lines)
+        self.text = re.sub(r'\n{3,}', '\n\n', compiled)
+
+    def render(self, **fields):
+        prompt = self.text.format(**fields)
+        # Empty optional sections would otherwise leave gaps behind
+        return re.sub(r'\n{3,}', '\n\n', prompt).strip()
+
+
+GREETING_TEMPLATE = PromptTemplate('greeting', """
+    You are a friendly travel assistant. Write a welcome message for {username} in {location_name} this {time_of_day}.
+    Requirements:
+    1. Time-appropriate greeting
+    2. Mention {location_name} positively, with one interesting fact if you know one
+    3. Express excitement about helping them explore
+    4. 1-2 natural emojis, enthusiastic but not formal, under 80 words
+    Example: "Good morning Sarah! 🌟 Welcome to Chennai - the cultural capital of South India! Did you know it's famous for its beaches and filter coffee? I'm excited to help you explore!"
+""")
+
+PLACE_DESCRIPTION_TEMPLATE = PromptTemplate('place_description', """
+    You are a knowledgeable local guide in {location_name}. A traveler wants to know more about {name}.
+    - Address: {address}
+    - Rating: {rating}/5 ({total_ratings} reviews)
+    - Price: {price}
+    - Distance: {distance} away
+    - Status: {status}
+    - Phone: {phone}
+    - Website: {website}
+    Write a friendly, conversational description (150-200 words, occasional emojis) covering: an introduction, key highlights (rating, price, distance), practical info (status, contact) and a visiting tip. End with an open-ended question. Recommend it like you would to a friend.
+""")
+
+BATCH_DESCRIPTION_TEMPLATE = PromptTemplate('batch_description', """
+    You are a knowledgeable local guide in {location_name}. For each numbered place below, write a friendly, conversational description (100-150 words, occasional emojis) with key highlights, practical info and a visiting tip, ending with an open-ended question.
+    Don't mention distances or whether a place is open right now; the descriptions are reused for other travelers nearby.
+    Return ONLY a JSON object mapping each place number to its description, like {{"1": "...", "2": "..."}}.
+
+    {places}
+""")
+
+SUMMARY_TEMPLATE = PromptTemplate('summary', """
+    Update the running summary of a travel chat between a traveler and GeoGuide.
+    Keep what matters for later turns: where they are, what they looked for, places they liked or rejected, preferences (budget, distance, diet). At most 60 words, plain text.
+
+    Current summary: {summary}
+
+    New messages:
+    {messages}
+
+    Updated summary:
+""")
+
+CHAT_TEMPLATE = PromptTemplate('chat', """
+    You are GeoGuide, a friendly AI travel assistant helping a traveler in {location_name}.
+
+    {history}
+
+    Traveler's request: "{user_message}"
+    Looking for: {query} | Category: {category} | Price preference: {price_preference} | Places found: {place_count}
+
+    {places}
+
+    Respond in 150-250 words like a local friend: acknowledge the request; if places were found, recommend 2-3 by name with reasons (distance, price, status); otherwise suggest alternatives or ask a clarifying question. Warm tone, occasional emojis, end with a follow-up question.
+""")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_token_budget(endpoint):
+    budgets = getattr(settings, 'PROMPT_TOKEN_BUDGETS', DEFAULT_TOKEN_BUDGETS)
+    return budgets.get(endpoint, DEFAULT_TOKEN_BUDGETS.get(endpoint, 1000))
+
+
+def report_prompt_size(endpoint, prompt, budget, trimmed=None):
+    """Log the prompt size for this call and update per-endpoint totals"""
+    tokens = estimate_tokens(prompt)
+    with _stats_lock:
+        stats = prompt_stats.setdefault(endpoint, {
+            'calls': 0, 'total_tokens': 0, 'max_tokens': 0, 'over_budget': 0, 'trimmed': 0
+        })
+        stats['calls'] += 1
+        stats['total_tokens'] += tokens
+        stats['max_tokens'] = max(stats['max_tokens'], tokens)
+        if tokens > budget:
+            stats['over_budget'] += 1
+        if trimmed:
+            stats['trimmed'] += 1
+
+    trimmed_text = f", trimmed: {', '.join(trimmed)}" if trimmed else ""
+    print(f"DEBUG: Prompt '{endpoint}': {len(prompt)} chars, ~{tokens}/{budget} tokens{trimmed_text}")
+    return tokens
+
+
+def get_prompt_stats():
+    """Per-endpoint prompt size summary"""
+    with _stats_lock:
+        summary = {}
+        for endpoint, stats in prompt_stats.items():
+            summary[endpoint] = dict(stats, avg_tokens=round(stats['total_tokens'] / stats['calls'], 1))
+        return summary
+
+
+def truncate_to_tokens(text, tokens):
+    max_chars = max(tokens, 1) * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + '...'
+
+
+# ==================== PROMPT BUILDERS ====================
+
+def build_greeting_prompt(username, location_name, time_of_day):
+    budget = get_token_budget('greeting')
+    prompt = GREETING_TEMPLATE.render(username=username, location_name=location_name, time_of_day=time_of_day)
+    report_prompt_size('greeting', prompt, budget)
+    return prompt
+
+
+def build_place_description_prompt(place, location_name):
+    budget = get_token_budget('place_description')
+    open_now = place.get('open_now')
+    fields = {
+        'location_name': location_name,
+        'name': place.get('name', 'Unknown Place'),
+        'address': place.get('address', 'Address not available'),
+        'rating': place.get('rating', 'Not rated'),
+        'total_ratings': place.get('total_ratings', 0),
+        'price': place.get('price_text', 'Price information not available'),
+        'distance': place.get('distance_text', 'Distance not available'),
+        'status': 'Open 🟢' if open_now else 'Closed 🔴' if open_now is not None else 'Hours not available',
+        'phone': place.get('phone', 'Not available'),
+        'website': place.get('website') or 'Not available',
+    }
+    if place.get('opening_hint'):
+        fields['status'] += f" ({place['opening_hint']})"
+    prompt = PLACE_DESCRIPTION_TEMPLATE.render(**fields)
+
+    trimmed = []
+    if estimate_tokens(prompt) > budget:
+        # Long addresses and URLs are the only unbounded fields
+        fields['address'] = truncate_to_tokens(str(fields['address']), 20)
+        fields['website'] = truncate_to_tokens(str(fields['website']), 15)
+        prompt = PLACE_DESCRIPTION_TEMPLATE.render(**fields)
+        trimmed.append('fields')
+
+    report_prompt_size('place_description', prompt, budget, trimmed)
+    return prompt
+
+
+def build_batch_description_prompt(places, location_name):
+    """
+    One prompt asking for descriptions of several places at once (numbered from 1).
+    Only facts about the places themselves: the descriptions are shared by everyone in the
+    cell, so the asker's distance and the open status at this moment are left out.
+    """
+    budget = get_token_budget('batch_description')
+    lines = []
+    for i, place in enumerate(places, 1):
+        lines.append(
+            f"{i}. {place.get('name', 'Unknown Place')} | {truncate_to_tokens(str(place.get('address', '')), 20)} | "
+            f"{place.get('rating', 'N/A')}/5 ({place.get('total_ratings', 0)} reviews) | "
+            f"{place.get('price_text', 'N/A')}"
+        )
+    prompt = BATCH_DESCRIPTION_TEMPLATE.render(location_name=location_name, places='\n'.join(lines))
+    report_prompt_size('batch_description', prompt, budget)
+    return prompt
+
+
+def build_summary_prompt(summary, messages):
+    """Fold new messages into the running conversation summary"""
+    budget = get_token_budget('summary')
+    lines = []
+    for msg in messages:
+        role = "Traveler" if msg.get('role') == 'user' else "GeoGuide"
+        lines.append(f"{role}: {truncate_to_tokens(msg.get('content', ''), 60)}")
+    prompt = SUMMARY_TEMPLATE.render(summary=summary or '(none yet)', messages='\n'.join(lines))
+    report_prompt_size('summary', prompt, budget)
+    return prompt
+
+
+def format_place_line(index, place, compact=False):
+    """One place entry for the chat prompt; compact form drops everything but the essentials"""
+    if compact:
+        return f"{index}. {place['name']} ({place.get('rating', 'N/A')}★, {place.get('distance_text', 'N/A')})"
+
+    parts = [f"{index}. {place['name']} - ⭐ {place.get('rating', 'N/A')}/5"]
+    if place.get('total_ratings'):
+        parts.append(f" ({place.get('total_ratings')} reviews)")
+    parts.append(f", 📍 {place.get('distance_text', 'N/A')}")
+    if place.get('price_text'):
+        parts.append(f", 💰 {place.get('price_text')}")
+    return ''.join(parts)
+
+
+def format_places_section(places, compact=False):
+    if not places:
+        return "No specific places found for this query."
+    intents = list(dict.fromkeys(place['intent'] for place in places if place.get('intent')))
+    if len(intents) < 2:
+        lines = ["Places found:"]
+        lines.extend(format_place_line(i, place, compact) for i, place in enumerate(places, 1))
+        return '\n'.join(lines)
+
+    # Compound request: one block per intent
+    lines = []
+    for intent in intents:
+        group = [place for place in places if place.get('intent') == intent]
+        lines.append(f"Places found for {intent}:")
+        lines.extend(format_place_line(i, place, compact) for i, place in enumerate(group, 1))
+    return '\n'.join(lines)
+
+
+def interleave_by_intent(places):
+    """Round-robin across intents so trimming from the end keeps every intent represented"""
+    groups = {}
+    for place in places:
+        groups.setdefault(place.get('intent'), []).append(place)
+    if len(groups) < 2:
+        return list(places)
+    interleaved = []
+    for row in range(max(len(group) for group in groups.values())):
+        interleaved.extend(group[row] for group in groups.values() if row < len(group))
+    return interleaved
+
+
+def format_history_section(history, summary=None):
+    lines = []
+    if summary:
+        lines.append(f"Earlier in this conversation: {summary}")
+    if not history:
+        return '\n'.join(lines)
+    lines.append("Recent conversation:")
+    for msg in history:
+        role = "Traveler" if msg.get('role') == 'user' else "You"
+        lines.append(f"{role}: {truncate_to_tokens(msg.get('content', ''), 25)}")
+    return '\n'.join(lines)
+
+
+def build_chat_prompt(user_message, location_name, places, search_params, conversation_history,
+                      max_places=5, max_history=4, conversation_summary=None):
+    """
+    Build the chat prompt within the 'chat' token budget.
+    conversation_summary is the rolling summary of turns older than conversation_history.
+    Trimming order: oldest history turns, then compact place lines, then fewer places,
+    then the summary, and finally the user message itself.
+    Compound requests show up to two places per intent, grouped by intent.
+    """
+    budget = get_token_budget('chat')
+    history = list((conversation_history or [])[-max_history:])
+    intents = search_params.get('intents') or []
+    if len(intents) > 1:
+        max_places = max(max_places, 2 * len(intents))
+    shown_places = interleave_by_intent(places or [])[:max_places]
+    compact = False
+    message = user_message
+    summary = truncate_to_tokens(conversation_summary, 100) if conversation_summary else None
+    trimmed = []
+
+    while True:
+        prompt = CHAT_TEMPLATE.render(
+            location_name=location_name,
+            history=format_history_section(history, summary),
+            user_message=message,
+            query=search_params.get('query', 'places'),
+            category=search_params.get('category', 'general'),
+            price_preference=search_params.get('price_preference') or 'any',
+            place_count=len(places or []),
+            places=format_places_section(shown_places, compact),
+        )
+        if estimate_tokens(prompt) <= budget:
+            break
+        if history:
+            history.pop(0)
+            trimmed.append('history')
+        elif shown_places and not compact:
+            compact = True
+            trimmed.append('compact_places')
+        elif len(shown_places) > 1:
+            shown_places.pop()
+            trimmed.append('places')
+        elif summary:
+            summary = None
+            trimmed.append('summary')
+        elif 'message' not in trimmed:
+            message = truncate_to_tokens(user_message, budget // 4)
+            trimmed.append('message')
+        else:
+            break
+
+    report_prompt_size('chat', prompt, budget, sorted(set(trimmed)))
+    return prompt
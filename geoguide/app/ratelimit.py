@@ -0,0 +1,43 @@
+import time
+import threading
+
+
+class RateLimiter:
+    """Thread-safe token bucket used to stay under upstream API quotas"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.min_rate = self.rate / 8
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        """Block until a token is available; returns False if timeout (seconds) runs out first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def slow_down(self, factor=0.5):
+        """Back off after the upstream reports OVER_QUERY_LIMIT"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self.tokens = 0
+        print(f"DEBUG: Rate limited upstream, slowing to {self.rate:.2f} req/s")
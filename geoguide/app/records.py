@@ -0,0 +1,156 @@
+import sys
+import math
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .opening_hours import compact_periods, get_utc_offset
+
+# ==================== COMPACT PLACE RECORDS ====================
+#
+# search_places_smart ranks PlaceRecords instead of ad-hoc dicts: one slotted
+# object per place holding only what Google told us (place types interned and
+# shared, opening periods packed into an array, missing values as None). Labels
+# like price_text / distance_text, navigation URLs and open/closed status depend
+# on the request (origin, time) and are derived when a record is serialized.
+# Records are kept in a bounded in-process registry so whole cities fit in memory.
+
+
+def _intern(value):
+    return sys.intern(value) if value else None
+
+
+class PlaceRecord:
+    __slots__ = (
+        'place_id', 'name', 'address', 'lat', 'lng', 'rating', 'total_ratings',
+        'price_level', 'types', 'photo_ref', 'phone', 'website', 'periods', 'utc_offset',
+    )
+
+    def __init__(self, place_id, name, address, lat, lng, rating=None, total_ratings=0, price_level=None,
+                 types=(), photo_ref=None, phone=None, website=None, periods=None, utc_offset=None):
+        self.place_id = place_id
+        self.name = name
+        self.address = address
+        self.lat = lat
+        self.lng = lng
+        self.rating = rating
+        self.total_ratings = total_ratings
+        self.price_level = price_level
+        self.types = tuple(_intern(t) for t in types)
+        self.photo_ref = photo_ref
+        self.phone = phone
+        self.website = website
+        self.periods = periods
+        self.utc_offset = utc_offset
+
+    def __repr__(self):
+        return f"PlaceRecord({self.place_id!r}, {self.name!r})"
+
+
+def record_from_search(place, details=None):
+    """PlaceRecord from a Nearby Search result, filled in from Place Details where the result is silent"""
+    details = details or {}
+    location = place['geometry']['location']
+
+    rating = place.get('rating')
+    if rating is None:
+        rating = details.get('rating', 0)
+    total_ratings = place.get('user_ratings_total', 0)
+    if total_ratings == 0:
+        total_ratings = details.get('user_ratings_total', 0)
+    price_level = place.get('price_level')
+    if price_level is None:
+        price_level = details.get('price_level')
+
+    photo_ref = None
+    if place.get('photos'):
+        photo_ref = place['photos'][0].get('photo_reference')
+
+    return PlaceRecord(
+        place_id=place.get('place_id'),
+        name=place.get('name', 'Unnamed Place'),
+        address=place.get('vicinity'),
+        lat=location['lat'],
+        lng=location['lng'],
+        rating=rating,
+        total_ratings=total_ratings or 0,
+        price_level=price_level,
+        types=place.get('types', ()),
+        photo_ref=photo_ref,
+        phone=details.get('formatted_phone_number'),
+        website=details.get('website'),
+        periods=compact_periods(details.get('opening_hours')),
+        utc_offset=get_utc_offset(details),
+    )
+
+
+INDEX_CELL_DEG = 0.1  # spatial index buckets (~11 km)
+MAX_INDEX_CELLS = 2000  # wider queries scan every record instead
+
+
+def _index_cell(lat, lng):
+    return int(math.floor(lat / INDEX_CELL_DEG)), int(math.floor(lng / INDEX_CELL_DEG))
+
+
+class PlaceRegistry:
+    """Bounded LRU of PlaceRecords by place_id with a coarse grid index, shared by every request in the process"""
+
+    def __init__(self, max_places):
+        self.max_places = max_places
+        self.records = OrderedDict()
+        self.cells = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def remember(self, records):
+        with self.lock:
+            for record in records:
+                if not record.place_id:
+                    continue
+                old = self.records.get(record.place_id)
+                if old is not None:
+                    self._unindex(old)
+                self.records[record.place_id] = record
+                self.records.move_to_end(record.place_id)
+                self.cells.setdefault(_index_cell(record.lat, record.lng), set()).add(record.place_id)
+            while len(self.records) > self.max_places:
+                _, evicted = self.records.popitem(last=False)
+                self._unindex(evicted)
+
+    def _unindex(self, record):
+        cell = _index_cell(record.lat, record.lng)
+        ids = self.cells.get(cell)
+        if ids is not None:
+            ids.discard(record.place_id)
+            if not ids:
+                del self.cells[cell]
+
+    def get(self, place_id):
+        with self.lock:
+            return self.records.get(place_id)
+
+    def in_bounds(self, south, west, north, east):
+        """Records inside the box; west > east means the box crosses the antimeridian"""
+        def inside(record):
+            if not south <= record.lat <= north:
+                return False
+            if west <= east:
+                return west <= record.lng <= east
+            return record.lng >= west or record.lng <= east
+
+        with self.lock:
+            (lat_lo, lng_lo), (lat_hi, lng_hi) = _index_cell(south, west), _index_cell(north, east)
+            if west > east or (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1) > MAX_INDEX_CELLS:
+                return [record for record in self.records.values() if inside(record)]
+            found = []
+            for i in range(lat_lo, lat_hi + 1):
+                for j in range(lng_lo, lng_hi + 1):
+                    for place_id in self.cells.get((i, j), ()):
+                        record = self.records[place_id]
+                        if inside(record):
+                            found.append(record)
+            return found
+
+
+place_registry = PlaceRegistry(getattr(settings, 'PLACE_REGISTRY_MAX_PLACES', 200000))
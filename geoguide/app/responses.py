@@ -0,0 +1,33 @@
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the stdlib encoder is used without it
+    orjson = None
+
+
+def dumps_stdlib(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(data):
+    """Serialize to compact UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=DjangoJSONEncoder().default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits; let the stdlib encoder handle the odd case
+            pass
+    return dumps_stdlib(data)
+
+
+class FastJsonResponse(HttpResponse):
+    """Drop-in replacement for JsonResponse for the API views, backed by dumps()"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
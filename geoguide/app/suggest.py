@@ -0,0 +1,104 @@
+import re
+import bisect
+import threading
+from collections import OrderedDict
+
+# ==================== TYPEAHEAD SUGGESTIONS ====================
+#
+# Sorted-array prefix indexes answered entirely from memory: one global index
+# for the intent vocabulary and one per geocell for place names we have seen
+# in (cached) Nearby Search results.
+
+MAX_NAMES_PER_CELL = 2000
+MAX_CELLS = 5000
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text.lower())).strip()
+
+
+class PrefixIndex:
+    """Sorted (key, display) pairs; every word start of a display string is a key"""
+
+    def __init__(self):
+        self.entries = []
+        self.displays = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.displays)
+
+    def add(self, display, kind, weight=1.0):
+        """Insert incrementally (no rebuild); duplicates are ignored"""
+        words = normalize(display).split()
+        if not words:
+            return False
+        with self.lock:
+            if display in self.displays:
+                return False
+            self.displays.add(display)
+            for i in range(len(words)):
+                key = ' '.join(words[i:])
+                bisect.insort(self.entries, (key, display, kind, weight))
+        return True
+
+    def search(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = {}
+        with self.lock:
+            start = bisect.bisect_left(self.entries, (prefix,))
+            for key, display, kind, weight in self.entries[start:]:
+                if not key.startswith(prefix):
+                    break
+                matches.setdefault(display, (kind, weight))
+                if len(matches) >= limit * 4:
+                    break
+        return [(display, kind, weight) for display, (kind, weight) in matches.items()]
+
+
+vocabulary_index = PrefixIndex()
+_cell_indexes = OrderedDict()
+_cells_lock = threading.Lock()
+
+
+def load_vocabulary(intent_keywords):
+    """Index the intent keywords and the queries they map to (e.g. 'petrol' and 'petrol pump')"""
+    for keyword, intent in intent_keywords.items():
+        vocabulary_index.add(keyword, 'category', weight=2.0)
+        if intent.get('query'):
+            vocabulary_index.add(intent['query'], 'category', weight=2.0)
+
+
+def _cell_index(cell, create=False):
+    with _cells_lock:
+        index = _cell_indexes.get(cell)
+        if index is not None:
+            _cell_indexes.move_to_end(cell)
+        elif create:
+            index = _cell_indexes[cell] = PrefixIndex()
+            while len(_cell_indexes) > MAX_CELLS:
+                _cell_indexes.popitem(last=False)
+        return index
+
+
+def add_place_names(cell, names):
+    """Called whenever Nearby Search results for a cell are fetched or read from cache"""
+    index = _cell_index(cell, create=True)
+    added = 0
+    for name in names:
+        if name and len(index) < MAX_NAMES_PER_CELL and index.add(name, 'place'):
+            added += 1
+    return added
+
+
+def suggest(query, cell=None, limit=8):
+    """Completions for a partial query, category terms first, then places known in this cell"""
+    results = vocabulary_index.search(query, limit)
+    index = _cell_index(cell) if cell else None
+    if index is not None:
+        results += index.search(query, limit)
+
+    results.sort(key=lambda r: (-r[2], len(r[0]), r[0]))
+    return [{'text': display, 'type': kind} for display, kind, _ in results[:limit]]
@@ -1,3 +1,248 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from unittest import mock
+from django.test import SimpleTestCase
+from . import canonical, corridor
+from .cache import cell_reach_m
+from .opening_hours import MINUTES_PER_WEEK, compact_periods, evaluate_periods, get_utc_offset
 
-# Create your tests here.
+# Monday 2024-01-01 10:00 UTC; Places periods count days from Sunday = 0
+MONDAY_10AM = datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def weekday_hours(open_time='0900', close_time='1700', days=range(1, 6)):
+    return {'periods': [{'open': {'day': d, 'time': open_time}, 'close': {'day': d, 'time': close_time}} for d in days]}
+
+
+class CompactPeriodsTests(SimpleTestCase):
+
+    def test_compact_periods(self):
+        cases = [
+            ('no opening hours', None, None),
+            ('no periods', {'periods': []}, None),
+            ('open 24/7', {'periods': [{'open': {'day': 0, 'time': '0000'}}]}, [0, MINUTES_PER_WEEK]),
+            ('every period lacks close', {'periods': [{'open': {'day': 1, 'time': '0900'}},
+                                                       {'open': {'day': 2, 'time': '0900'}}]}, None),
+            ('monday 9-17', weekday_hours(days=[1]), [1 * 1440 + 540, 1 * 1440 + 1020]),
+            ('saturday night into sunday', {'periods': [{'open': {'day': 6, 'time': '2200'},
+                                                         'close': {'day': 0, 'time': '0200'}}]},
+             [6 * 1440 + 1320, MINUTES_PER_WEEK + 120]),
+        ]
+        for name, opening_hours, expected in cases:
+            with self.subTest(name):
+                periods = compact_periods(opening_hours)
+                self.assertEqual(list(periods) if periods is not None else None, expected)
+
+
+class EvaluatePeriodsTests(SimpleTestCase):
+
+    def test_get_utc_offset(self):
+        cases = [
+            ('current field', {'utc_offset_minutes': 330}, 330),
+            ('legacy field in older cached details', {'utc_offset': -240}, -240),
+            ('current field wins', {'utc_offset_minutes': 60, 'utc_offset': 0}, 60),
+            ('missing', {}, None),
+        ]
+        for name, details, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(get_utc_offset(details), expected)
+
+    def test_evaluate_periods(self):
+        cases = [
+            # name, opening_hours, utc offset, open_now, hint
+            ('unknown periods', None, 0, None, None),
+            ('unknown offset', weekday_hours(), None, None, None),
+            ('only opens without closes', {'periods': [{'open': {'day': 1, 'time': '0900'}},
+                                                        {'open': {'day': 2, 'time': '0900'}}]}, 0, None, None),
+            ('open 24/7', {'periods': [{'open': {'day': 0, 'time': '0000'}}]}, 0, True, 'Open 24 hours'),
+            ('open', weekday_hours(), 0, True, 'Open until 17:00'),
+            ('closes soon', weekday_hours(close_time='1030'), 0, True, 'Closes in 30 min'),
+            ('opens soon', weekday_hours(open_time='1045'), 0, False, 'Opens in 45 min'),
+            ('opens later today', weekday_hours(open_time='1400', close_time='2200'), 0, False, 'Opens at 14:00'),
+            ('closed for the day', weekday_hours(close_time='0930'), 0, False, 'Opens tomorrow at 9:00'),
+            ('opens after midnight', weekday_hours(days=[2]), 0, False, 'Opens tomorrow at 9:00'),
+            ('weekends only', weekday_hours(days=[0, 6]), 0, False, 'Opens Saturday at 9:00'),
+            ('local time ahead of UTC', weekday_hours(), 480, False, 'Opens tomorrow at 9:00'),
+            ('sunday night period seen from monday', {'periods': [{'open': {'day': 6, 'time': '2200'},
+                                                                   'close': {'day': 1, 'time': '1100'}}]},
+             0, True, 'Closes in 60 min'),
+        ]
+        for name, opening_hours, offset, open_now, hint in cases:
+            with self.subTest(name):
+                result = evaluate_periods(compact_periods(opening_hours), offset, MONDAY_10AM)
+                self.assertEqual((result['open_now'], result['hint']), (open_now, hint))
+
+
+class CanonicalTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        canonical.load_vocabulary({
+            'atm': {'type': 'atm'},
+            'breakfast': {'type': 'restaurant'},
+            'coffee': {'type': 'cafe'},
+            'food': {'type': 'restaurant'},
+            'hotel': {'type': 'lodging'},
+            'pharmacy': {'type': 'pharmacy'},
+            'restaurant': {'type': 'restaurant'},
+            'best': {'type': ''},
+        })
+
+    def test_canonicalize(self):
+        cases = [
+            ('coffee near me', 'coffee'),
+            ('Coffee nearby please!', 'coffee'),
+            ('find coffee', 'coffee'),
+            ('coffee shop', 'coffee'),
+            ('petrol pump', 'gas'),
+            ('cheapest biriyani', 'biryani cheap'),
+            ('hotels far from here', 'hotel'),
+            ('ATMs within walking distance', 'atm'),
+            ('please help', ''),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(canonical.canonicalize(text), expected)
+
+    def test_keyword_query(self):
+        # Searches with no intent keyword use the message's words in its own order
+        cases = [
+            ('vegan gluten free bakery', 'vegan gluten free'),
+            ('Find me a vegan bakery please', 'vegan bakery'),
+            ('zoo', 'zoo'),
+            ('please help', ''),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(canonical.keyword_query(text), expected)
+        self.assertEqual(canonical.canonicalize('vegan gluten free bakery'), 'bakery free gluten vegan')
+
+    def test_proximity(self):
+        cases = [
+            ('coffee near me', 'nearby'),
+            ('hotel within walking distance', 'nearby'),
+            ('closest atm', 'nearby'),
+            ('restaurants worth a drive', 'far'),
+            ('coffee near the station', None),
+            ('pizza', None),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(canonical.proximity(text), expected)
+
+    def test_price_preference(self):
+        cases = [
+            ('coffee at a cheap price', 'budget'),
+            ('coffee near the station, cheapest please', 'budget'),
+            ('hotel for less than 2000', 'budget'),
+            ('high end dinner', 'expensive'),
+            ('I understand', None),
+            ('pizza', None),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(canonical.price_preference(text), expected)
+
+    def test_intent_clauses(self):
+        cases = [
+            ('coffee and an ATM near the bus station', ['coffee', 'an atm']),
+            ('petrol, food & a pharmacy', ['petrol', 'food', 'a pharmacy']),
+            ('sandwich at the mall', ['sandwich']),
+            ('atm near me', ['atm near me']),
+            ('restaurants around here plus a pharmacy', ['restaurants around here', 'a pharmacy']),
+            ('atm near the hotel', ['atm']),
+            ('coffee near mg road and an atm', ['coffee', 'an atm']),
+            ('coffee at a cheap price', ['coffee at a cheap price']),
+            ('pizza by the slice', ['pizza by the slice']),
+            ('bed and breakfast', ['bed and breakfast']),
+            ('bed and breakfast and an atm', ['bed and breakfast', 'an atm']),
+            ('salt and pepper', ['salt and pepper']),
+            ('coffee and', ['coffee']),
+            ('', []),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(canonical.intent_clauses(text), expected)
+
+
+# About 11 km due east along the equator
+EQUATOR_PATH = [(0.0, 0.0), (0.0, 0.1)]
+
+
+class CorridorTests(SimpleTestCase):
+
+    def test_decode_polyline(self):
+        cases = [
+            ('_p~iF~ps|U_ulLnnqC_mqNvxq`@', [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]),
+            ('??', [(0.0, 0.0)]),
+            ('', []),
+        ]
+        for encoded, expected in cases:
+            with self.subTest(encoded):
+                self.assertEqual(corridor.decode_polyline(encoded), expected)
+
+    def test_decode_invalid_polyline(self):
+        for encoded in ['_p~iF~ps|U_ulLnnqC_mqNvxq', '_p~iF', '_p~iF~ps|U ']:
+            with self.subTest(encoded):
+                with self.assertRaisesRegex(ValueError, 'Invalid polyline'):
+                    corridor.decode_polyline(encoded)
+
+    def test_sample_along(self):
+        cases = [
+            # name, path, spacing_km, max_samples, expected count, expected spacing_km
+            ('every 2 km', EQUATOR_PATH, 2.0, 20, 7, 2.0),
+            ('widened to fit max_samples', EQUATOR_PATH, 2.0, 3, 3, 5.566),
+            ('single point', [(1.0, 1.0), (1.0, 1.0)], 2.0, 5, 1, 2.0),
+        ]
+        for name, path, spacing_km, max_samples, count, expected_spacing in cases:
+            with self.subTest(name):
+                samples, spacing = corridor.sample_along(path, spacing_km, max_samples)
+                self.assertEqual(len(samples), count)
+                self.assertAlmostEqual(spacing, expected_spacing, places=2)
+                self.assertEqual(samples[0], path[0])
+                if count > 1:
+                    self.assertEqual(samples[-1], path[-1])
+
+    def test_distances_to_path(self):
+        cases = [
+            # point, km off the path, km along it
+            ((0.0, 0.05), 0.0, 5.566),
+            ((0.01, 0.05), 1.106, 5.566),
+            ((0.0, -0.01), 1.113, 0.0),
+            ((-0.01, 0.11), 1.573, 11.132),
+        ]
+        points = [point for point, _, _ in cases]
+        # The numpy path (when installed) and the pure-Python fallback must agree
+        for numpy in {corridor.np, None}:
+            with mock.patch.object(corridor, 'np', numpy):
+                results = corridor.distances_to_path(points, EQUATOR_PATH)
+            for (point, off_km, along_km), (distance, progress) in zip(cases, results):
+                with self.subTest(point=point, numpy=numpy is not None):
+                    self.assertAlmostEqual(distance, off_km, places=2)
+                    self.assertAlmostEqual(progress, along_km, places=2)
+
+
+class CellReachTests(SimpleTestCase):
+    """Nearby Search results are shared per cache cell but searched from the user's own position"""
+
+    def test_cell_reach(self):
+        cases = [
+            # name, point, metres to the farthest corner of its 0.01 degree cell
+            ('cell centre', (12.97, 77.59), 778),
+            ('near a corner', (12.9749, 77.5949), 1539),
+            ('opposite corner', (12.9651, 77.5851), 1539),
+            ('equator', (0.0, 0.0), 788),
+            ('high latitude cells are narrower', (60.0, 10.0), 623),
+        ]
+        for name, (lat, lng), expected in cases:
+            with self.subTest(name):
+                self.assertAlmostEqual(cell_reach_m(lat, lng), expected, delta=2)
+
+    def test_widened_search_covers_the_whole_cell(self):
+        # Searching from one point with radius + reach covers the radius around any other point in the cell
+        origin = (12.9749, 77.5949)
+        reach_km = cell_reach_m(*origin) / 1000
+        for other in [(12.9651, 77.5851), (12.9651, 77.5949), (12.97, 77.59), (12.9749, 77.5851)]:
+            with self.subTest(other=other):
+                off_km, _ = corridor.distances_to_path([other], [origin])[0]
+                self.assertLessEqual(off_km, reach_km)
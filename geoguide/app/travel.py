@@ -0,0 +1,94 @@
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from .cache import cache_get, cache_set, cell_id
+
+# ==================== DISTANCE MATRIX TRAVEL TIMES ====================
+#
+# One batched Distance Matrix request per travel mode covers every result place.
+# Durations are cached per (origin cell, place_id, mode); anything we can't get
+# before the deadline is left to the fixed-speed estimate.
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+MAX_DESTINATIONS = 25  # Distance Matrix limit per request
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='travel')
+
+
+def is_enabled():
+    return getattr(settings, 'TRAVEL_TIME_PROVIDER_ENABLED', False)
+
+
+def fetch_durations(lat, lng, place_ids, mode, api_key, timeout):
+    """{place_id: seconds} for one mode, from a single Distance Matrix request"""
+    params = {
+        'origins': f'{lat},{lng}',
+        'destinations': '|'.join(f'place_id:{place_id}' for place_id in place_ids),
+        'mode': mode,
+        'key': api_key,
+    }
+    if mode == 'driving':
+        params['departure_time'] = 'now'  # traffic-aware durations
+
+    response = requests.get(DISTANCE_MATRIX_URL, params=params, timeout=timeout)
+    data = response.json()
+    if data.get('status') != 'OK':
+        raise Exception(f"Distance Matrix status {data.get('status')}")
+
+    durations = {}
+    elements = data['rows'][0]['elements'] if data.get('rows') else []
+    for place_id, element in zip(place_ids, elements):
+        if element.get('status') == 'OK':
+            duration = element.get('duration_in_traffic') or element.get('duration')
+            durations[place_id] = duration['value']
+    return durations
+
+
+def get_travel_times(lat, lng, place_ids, api_key, modes=None, deadline=None):
+    """
+    Travel times in seconds as {mode: {place_id: seconds}}.
+    Cached values are used first; misses are fetched with one request per mode,
+    all modes in parallel, and abandoned when the deadline (seconds) passes.
+    """
+    modes = modes or getattr(settings, 'TRAVEL_TIME_MODES', ['driving', 'walking'])
+    deadline = deadline if deadline is not None else getattr(settings, 'TRAVEL_TIME_DEADLINE', 2.0)
+    origin_cell = cell_id(lat, lng)
+    place_ids = [place_id for place_id in place_ids if place_id][:MAX_DESTINATIONS]
+
+    times = {mode: {} for mode in modes}
+    missing = {}
+    for mode in modes:
+        for place_id in place_ids:
+            seconds = cache_get('travel', origin_cell, place_id, mode)
+            if seconds is not None:
+                times[mode][place_id] = seconds
+            else:
+                missing.setdefault(mode, []).append(place_id)
+
+    if not missing or deadline <= 0:
+        return times
+
+    started = time.monotonic()
+    futures = {
+        _executor.submit(fetch_durations, lat, lng, ids, mode, api_key, deadline): mode
+        for mode, ids in missing.items()
+    }
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        future.cancel()
+        print(f"DEBUG: Distance Matrix ({futures[future]}) missed the {deadline}s deadline")
+
+    for future in done:
+        mode = futures[future]
+        try:
+            durations = future.result()
+        except Exception as e:
+            print(f"DEBUG: Distance Matrix ({mode}) failed: {e}")
+            continue
+        for place_id, seconds in durations.items():
+            times[mode][place_id] = seconds
+            cache_set('travel', seconds, origin_cell, place_id, mode)
+
+    print(f"DEBUG: Travel times for {len(place_ids)} places in {(time.monotonic() - started) * 1000:.0f}ms")
+    return times
@@ -6,7 +6,16 @@ urlpatterns = [
     path('api/location-greeting/', views.get_user_location_greeting, name='location_greeting'),
     path('api/chat/', views.chat_with_ai, name='chat'),
     path('api/place-details/', views.get_place_details_with_navigation, name='place_details'),
+    path('api/places/<str:place_id>/', views.get_place, name='place'),
+    path('api/places/<str:place_id>/navigation/', views.get_place_navigation, name='place_navigation'),
     path('api/enhanced-search/', views.enhanced_search, name='enhanced_search'),
+    path('api/narration/<str:token>/', views.get_narration, name='narration'),
+    path('api/corridor-search/', views.corridor_search, name='corridor_search'),
+    path('api/viewport/', views.viewport_places, name='viewport'),
+    path('api/reverse-geocode/', views.bulk_reverse_geocode, name='reverse_geocode'),
+    path('api/suggest/', views.suggest_completions, name='suggest'),
     path('api/test/', views.test_api_status, name='test_api'),
+    path('health', views.health_check, name='health'),
+    path('ready', views.readiness_check, name='ready'),
     path('api/clear-chat/', views.clear_conversation, name='clear_chat'),
 ]
\ No newline at end of file
@@ -0,0 +1,73 @@
+import math
+from django.conf import settings
+
+# ==================== VIEWPORT CLUSTERING ====================
+#
+# The map asks for what is inside its current bounds at its zoom level. Known
+# places (the in-process PlaceRegistry) are bucketed on a global grid whose
+# cells are about VIEWPORT_CLUSTER_PX screen pixels wide at that zoom, so the
+# number of markers stays bounded by the screen size rather than the number of
+# places. Clusters are stable while panning because the grid is global.
+
+
+def parse_bounds(params):
+    """(south, west, north, east) from query params; raises ValueError when missing or out of range"""
+    south, west, north, east = (float(params[name]) for name in ('south', 'west', 'north', 'east'))
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("bounds out of range")
+    return south, west, north, east
+
+
+def cluster_cell_degrees(zoom, mid_lat):
+    """Grid cell size (lat_deg, lng_deg) covering about VIEWPORT_CLUSTER_PX pixels at this zoom"""
+    cluster_px = getattr(settings, 'VIEWPORT_CLUSTER_PX', 60)
+    lng_deg = 360.0 / (2 ** zoom) * cluster_px / 256
+    lat_deg = lng_deg * max(math.cos(math.radians(mid_lat)), 0.01)
+    return lat_deg, lng_deg
+
+
+def cluster_records(records, zoom, mid_lat):
+    """
+    Group records into grid clusters, largest first:
+    [{'count', 'lat', 'lng' (centroid), 'best' (highest rated member), 'bounds'}].
+    """
+    lat_deg, lng_deg = cluster_cell_degrees(zoom, mid_lat)
+    buckets = {}
+    for record in records:
+        key = (math.floor(record.lat / lat_deg), math.floor(record.lng / lng_deg))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {
+                'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0, 'best': record,
+                'south': record.lat, 'west': record.lng, 'north': record.lat, 'east': record.lng,
+            }
+        bucket['count'] += 1
+        bucket['lat_sum'] += record.lat
+        bucket['lng_sum'] += record.lng
+        bucket['south'] = min(bucket['south'], record.lat)
+        bucket['north'] = max(bucket['north'], record.lat)
+        bucket['west'] = min(bucket['west'], record.lng)
+        bucket['east'] = max(bucket['east'], record.lng)
+        if rating_key(record) > rating_key(bucket['best']):
+            bucket['best'] = record
+
+    clusters = []
+    for bucket in buckets.values():
+        count = bucket['count']
+        clusters.append({
+            'count': count,
+            'lat': bucket['lat_sum'] / count,
+            'lng': bucket['lng_sum'] / count,
+            'best': bucket['best'],
+            'bounds': {name: bucket[name] for name in ('south', 'west', 'north', 'east')},
+        })
+    clusters.sort(key=lambda cluster: cluster['count'], reverse=True)
+    return clusters
+
+
+def rating_key(record):
+    return (record.rating or 0, record.total_ratings or 0)
+
+
+def matches_type(record, place_type):
+    return not place_type or place_type in record.types
@@ -1,16 +1,40 @@
 import os
 import json
+import hashlib
 import requests
 import re
 import google.generativeai as genai
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
 from math import radians, sin, cos, sqrt, atan2
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
+from .prompts import build_greeting_prompt, build_place_description_prompt, build_chat_prompt, get_prompt_stats
+from .prefetch import schedule_description_prefetch, get_prefetched_description, get_prefetch_stats
+from .cache import cache_get, cache_set, snap_to_cell, cell_id, cell_reach_m, get_cache_stats, get_cache
+from .responses import FastJsonResponse, dumps
+from .ratelimit import RateLimiter
+from . import suggest
+from . import health
+from . import travel
+from . import memory
+from . import canonical
+from . import gemini_queue
+from . import deadline
+from . import narration
+from . import corridor
+from . import viewport
+from . import model_router
+from . import predict
+from .opening_hours import evaluate_place, evaluate_periods, get_utc_offset
+from .records import record_from_search, place_registry
 
 #create an environment variable file .env and add your API keys there
 load_dotenv()
@@ -23,52 +47,36 @@ genai.configure(api_key=GEMINI_API_KEY)
 
 
 
-# Configure Gemini AI with updated model name
+# Configure Gemini AI: every configured model the API offers goes into the router
 try:
-    # Try to list available models
     models = genai.list_models()
     model_names = [m.name for m in models]
     print(f"DEBUG: Available models: {model_names}")
-    
-    # Try common model names in order of preference
-    model_attempts = [
-        'models/gemini-1.5-flash-latest',  # Most likely available
-        'models/gemini-1.5-pro-latest',    # Pro version
-        'models/gemini-1.0-pro-latest',    # Older pro
-        'models/gemini-pro',               # Generic name
-    ]
-    
-    # Check which models are actually available
-    available_model = None
-    for model_name in model_attempts:
-        if any(model_name in name for name in model_names):
-            available_model = model_name
-            print(f"DEBUG: Found available model: {available_model}")
-            break
-    
-    if available_model:
-        # Store the model in gemini_model
-        gemini_model = genai.GenerativeModel(available_model)
-        print(f"DEBUG: Gemini AI configured with {available_model}")
-    else:
-        print("DEBUG: No suitable Gemini model found in available models")
-        # Fallback to trying a common model directly
-        try:
-            gemini_model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
-            print("DEBUG: Gemini AI configured with fallback model")
-        except Exception as e:
-            print(f"DEBUG: Fallback model configuration failed: {e}")
-            gemini_model = None
-
 except Exception as e:
-    print(f"DEBUG: Gemini AI configuration failed: {e}")
-    gemini_model = None
+    print(f"DEBUG: Listing Gemini models failed: {e}")
+    model_names = None
 
-    
+gemini_router = model_router.build_router(model_names, genai.GenerativeModel)
+if not gemini_router and model_names is not None:
+    print("DEBUG: No configured Gemini model found in available models, trying them unlisted")
+    gemini_router = model_router.build_router(None, genai.GenerativeModel)
+if not gemini_router:
+    print("DEBUG: Gemini AI configuration failed, using rule-based responses")
+    gemini_router = None
+
+
+# Shared pool for concurrent upstream calls made while serving a request
+search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='search')
+# Corridor searches and bulk geocoding fan out widely; keep them off the pool chat searches use
+corridor_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='corridor')
+geocode_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='geocode')
+# One Nearby Search per intent of a compound request; the rings inside each use search_executor
+intent_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='intent')
 
 
 def home(request):
     """Render the main page with API keys"""
+    health.ensure_started()
     return render(request, 'home.html', {
         'GOOGLE_MAPS_API_KEY': GOOGLE_MAPS_API_KEY
     })
@@ -85,19 +93,23 @@ def get_user_location_greeting(request):
         lat = data.get('latitude')
         lng = data.get('longitude')
         username = data.get('username', 'Traveler')
+        hour = predict.local_hour(data, lng)
+        
+        print(f"DEBUG: Location greeting request - lat: {lat}, lng: {lng}, username: {username}, hour: {hour}")
         
-        print(f"DEBUG: Location greeting request - lat: {lat}, lng: {lng}, username: {username}")
+        # The first search is predictable; warm its caches while the greeting is generated
+        predict.schedule_first_query_prefetch(lat, lng, warm_predicted_search, hour)
         
         # Get location name from coordinates
         location_name = get_location_name_google(lat, lng)
         print(f"DEBUG: Location name: {location_name}")
         
         # Generate greeting with AI
-        greeting = generate_ai_greeting(username, location_name)
+        greeting = generate_ai_greeting(username, location_name, hour)
         
         print(f"DEBUG: Generated greeting: {greeting[:50]}...")
         
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'greeting': greeting,
             'location': location_name,
@@ -107,7 +119,7 @@ def get_user_location_greeting(request):
         
     except Exception as e:
         print(f"ERROR in get_user_location_greeting: {str(e)}")
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': str(e)
         }, status=400)
@@ -121,17 +133,21 @@ def chat_with_ai(request):
     try:
         print(f"DEBUG: ====== CHAT REQUEST START ======")
         data = json.loads(request.body)
+        budget = deadline.budget_from_request(request)
+        ai_mode = narration.parse_ai_mode(data.get('ai', request.GET.get('ai')))
         user_message = data.get('message', '').strip()
         lat = data.get('latitude')
         lng = data.get('longitude')
         conversation_history = data.get('conversation_history', [])
+        conversation_id = memory.clean_conversation_id(data.get('conversation_id')) or memory.new_conversation_id()
+        conversation_length = memory.clean_conversation_length(data.get('conversation_length'), conversation_history)
         current_places = data.get('current_places', [])  # GET CURRENT PLACES FROM FRONTEND
         
         print(f"DEBUG: Chat request - message: '{user_message}', lat: {lat}, lng: {lng}")
         print(f"DEBUG: Current places from frontend: {len(current_places)}")
         
         # Get location context
-        location_name = get_location_name_google(lat, lng)
+        location_name = get_location_name_google(lat, lng, budget)
         print(f"DEBUG: Location for chat: {location_name}")
         
         # CHECK IF THIS IS A "TELL ME MORE" QUERY
@@ -183,16 +199,33 @@ def chat_with_ai(request):
                     break
             
             if matching_place:
-                # Generate AI-powered detailed response about this place
-                ai_response = generate_ai_place_description(matching_place, location_name)
+                # Use the description prefetched after the last search, if we have one
+                ai_response = get_prefetched_description(matching_place.get('place_id'), lat, lng)
+                prefetched = ai_response is not None
+                narration_token = None
+                if prefetched:
+                    print(f"DEBUG: Using prefetched description for {matching_place['name']}")
+                elif ai_mode == 'deferred':
+                    narration_token = narration.schedule_narration(
+                        generate_ai_place_description, matching_place, location_name
+                    )
+                elif ai_mode == 'off':
+                    ai_response = generate_place_description_fallback(matching_place)
+                else:
+                    # Generate AI-powered detailed response about this place
+                    ai_response = generate_ai_place_description(matching_place, location_name, budget)
                 
-                return JsonResponse({
+                return FastJsonResponse({
                     'success': True,
                     'message': ai_response,
+                    'narration_token': narration_token,
                     'places': current_places,  # Return same places
                     'search_params': {'is_detail_query': True, 'query': place_name},
                     'intent_analysis': {'intent_type': 'place_details'},
-                    'ai_used': True
+                    'prefetched': prefetched,
+                    'latency': budget.report(),
+                    'conversation_id': conversation_id,
+                    'ai_used': prefetched or ai_mode != 'off'
                 })
             else:
                 # Place not found in current list
@@ -202,12 +235,14 @@ def chat_with_ai(request):
                     ai_response += f"The places I showed you are: {', '.join(place_names)}. "
                 ai_response += "Would you like details about any of these?"
                 
-                return JsonResponse({
+                return FastJsonResponse({
                     'success': True,
                     'message': ai_response,
                     'places': current_places,
                     'search_params': {'is_detail_query': True, 'query': place_name},
                     'intent_analysis': {'intent_type': 'place_details'},
+                    'latency': budget.report(),
+                    'conversation_id': conversation_id,
                     'ai_used': True
                 })
         
@@ -216,44 +251,64 @@ def chat_with_ai(request):
         intent_analysis = analyze_user_intent_smart(user_message)
         print(f"DEBUG: Intent analysis: {intent_analysis}")
         
-        # Extract search parameters
-        search_params = extract_search_params_from_intent(intent_analysis)
-        
-        # Search for places based on intent
-        places = []
-        if search_params.get('should_search', True):
-            places = search_places_smart(
-                lat=lat,
-                lng=lng,
-                search_params=search_params
+        # Search for places based on intent (every intent of a compound request at once)
+        # The history already holds this message; nothing before it means it's the session's first search
+        first_query = len(conversation_history) <= 1
+        places, search_params = search_for_intents(lat, lng, intent_analysis, budget, first_query,
+                                                   predict.local_hour(data, lng))
+        print(f"DEBUG: Found {len(places)} places")
+        
+        narration_token = None
+        if ai_mode == 'inline':
+            # Generate AI-powered smart response
+            ai_response = generate_ai_response_with_context(
+                user_message=user_message,
+                location_name=location_name,
+                places=places,
+                search_params=search_params,
+                conversation_history=conversation_history,
+                conversation_id=conversation_id,
+                conversation_length=conversation_length,
+                budget=budget
             )
-            print(f"DEBUG: Found {len(places)} places")
-        
-        # Generate AI-powered smart response
-        ai_response = generate_ai_response_with_context(
-            user_message=user_message,
-            location_name=location_name,
-            places=places,
-            search_params=search_params,
-            conversation_history=conversation_history
-        )
+            print(f"DEBUG: AI Response: {ai_response[:100]}...")
+        elif ai_mode == 'deferred':
+            # Places go out now; the narration is fetched later with the token
+            ai_response = None
+            narration_token = narration.schedule_narration(
+                generate_ai_response_with_context,
+                user_message=user_message,
+                location_name=location_name,
+                places=places,
+                search_params=search_params,
+                conversation_history=conversation_history,
+                conversation_id=conversation_id,
+                conversation_length=conversation_length
+            )
+        else:
+            ai_response = generate_smart_response_fallback(user_message, location_name, places, search_params)
         
-        print(f"DEBUG: AI Response: {ai_response[:100]}...")
+        # Speculatively describe the top places in the background for "tell me more" follow-ups
+        if ai_mode != 'off':
+            schedule_description_prefetch(places, location_name, gemini_router, lat, lng)
         
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'message': ai_response,
+            'narration_token': narration_token,
             'places': places,
             'search_params': search_params,
             'intent_analysis': intent_analysis,
-            'ai_used': True
+            'latency': budget.report(),
+            'conversation_id': conversation_id,
+            'ai_used': ai_mode != 'off'
         })
         
     except Exception as e:
         print(f"ERROR in chat_with_ai: {str(e)}")
         import traceback
         traceback.print_exc()
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': str(e)
         }, status=400)
@@ -272,88 +327,132 @@ def get_place_details_with_navigation(request):
         lng = data.get('longitude')
         
         if not place_id:
-            return JsonResponse({'success': False, 'error': 'Missing place_id'}, status=400)
+            return FastJsonResponse({'success': False, 'error': 'Missing place_id'}, status=400)
         
         # Get detailed place information
         place_details = get_place_details(place_id)
         
         if place_details:
-            # Generate navigation URLs
-            place_lat = place_details.get('geometry', {}).get('location', {}).get('lat')
-            place_lng = place_details.get('geometry', {}).get('location', {}).get('lng')
+            place = format_place_details(place_details)
             
-            navigation_urls = generate_navigation_urls(lat, lng, place_lat, place_lng)
+            opening_status = evaluate_place(place_details)
+            place['open_now'] = opening_status['open_now']
+            place['opening_hint'] = opening_status['hint']
+            
+            # Generate navigation URLs
+            place['navigation'] = generate_navigation_urls(lat, lng, place['location']['lat'], place['location']['lng'])
             
             # Format the response
             response = {
                 'success': True,
-                'place': {
-                    'name': place_details.get('name', ''),
-                    'address': place_details.get('formatted_address', ''),
-                    'phone': place_details.get('formatted_phone_number', 'Not available'),
-                    'website': place_details.get('website', ''),
-                    'rating': place_details.get('rating', 0),
-                    'total_ratings': place_details.get('user_ratings_total', 0),
-                    'price_level': place_details.get('price_level'),
-                    'price_text': get_price_text(place_details.get('price_level')),
-                    'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', []),
-                    'photos': place_details.get('photos', []),
-                    'location': {
-                        'lat': place_lat,
-                        'lng': place_lng
-                    },
-                    'navigation': navigation_urls
-                }
+                'place': place
             }
         else:
             response = {'success': False, 'error': 'Place not found'}
         
-        return JsonResponse(response)
+        return FastJsonResponse(response)
         
     except Exception as e:
         print(f"ERROR in get_place_details_with_navigation: {str(e)}")
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return FastJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+def format_place_details(place_details):
+    """User-independent place data from a Place Details result"""
+    location = place_details.get('geometry', {}).get('location', {})
+    return {
+        'name': place_details.get('name', ''),
+        'address': place_details.get('formatted_address', ''),
+        'phone': place_details.get('formatted_phone_number', 'Not available'),
+        'website': place_details.get('website', ''),
+        'rating': place_details.get('rating', 0),
+        'total_ratings': place_details.get('user_ratings_total', 0),
+        'price_level': place_details.get('price_level'),
+        'price_text': get_price_text(place_details.get('price_level')),
+        'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', []),
+        # Enough for clients to work out open/closed themselves at any time
+        'opening_periods': place_details.get('opening_hours', {}).get('periods', []),
+        'utc_offset_minutes': get_utc_offset(place_details),
+        'photos': place_details.get('photos', []),
+        'location': {
+            'lat': location.get('lat'),
+            'lng': location.get('lng')
+        }
+    }
+
+@require_http_methods(["GET", "HEAD"])
+def get_place(request, place_id):
+    """
+    Cacheable place data (no user-relative fields) with a strong ETag.
+    Fetch the navigation block separately from get_place_navigation.
+    """
+    place_details = get_place_details(place_id)
+    if not place_details:
+        return FastJsonResponse({'success': False, 'error': 'Place not found'}, status=404)
+    
+    body = dumps({'success': True, 'place_id': place_id, 'place': format_place_details(place_details)})
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'PLACE_CACHE_MAX_AGE', 3600))
+    
+    # 304 Not Modified when the client's If-None-Match matches
+    return get_conditional_response(request, etag=etag, response=response)
+
+@require_http_methods(["GET"])
+def get_place_navigation(request, place_id):
+    """Navigation URLs and travel estimates from the user's position (?lat=&lng=) to a place"""
+    try:
+        lat = float(request.GET['lat'])
+        lng = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return FastJsonResponse({'success': False, 'error': 'Missing or invalid lat/lng'}, status=400)
+    
+    place_details = get_place_details(place_id)
+    location = place_details.get('geometry', {}).get('location', {})
+    if not location:
+        return FastJsonResponse({'success': False, 'error': 'Place not found'}, status=404)
+    
+    response = FastJsonResponse({
+        'success': True,
+        'place_id': place_id,
+        'navigation': generate_navigation_urls(lat, lng, location.get('lat'), location.get('lng'))
+    })
+    patch_cache_control(response, private=True, max_age=60)
+    return response
 
 # ==================== GEMINI AI FUNCTIONS ====================
 
-def generate_ai_greeting(username, location_name):
-    """Generate AI-powered greeting with local insights"""
+def generate_with_cache(prompt, cache_key=None, priority='chat', budget=None):
+    """
+    Gemini generation through the shared response cache and the priority scheduler.
+    Keyed by cache_key when given (e.g. built from the canonical query), else by the compiled prompt.
+    Raises gemini_queue.GeminiOverloaded when the call is shed or runs past the budget; callers fall back.
+    """
+    key = cache_key or prompt
+    cached = cache_get('gemini', key)
+    if cached is not None:
+        print("DEBUG: Gemini response cache hit")
+        return cached
+    
+    timeout = budget.timeout(gemini_queue.class_deadline(priority)) if budget is not None else None
+    response = gemini_router.generate(prompt, priority, timeout=timeout)
+    text = response.text.strip()
+    cache_set('gemini', text, key)
+    return text
+
+def generate_ai_greeting(username, location_name, hour=None):
+    """Generate AI-powered greeting with local insights; hour is the user's local hour when known"""
+    if hour is None:
+        hour = datetime.now().hour
     try:
-        if gemini_model:
+        if gemini_router:
             # Get current time for context
-            hour = datetime.now().hour
-            if hour < 12:
-                time_of_day = "morning"
-            elif hour < 17:
-                time_of_day = "afternoon"
-            elif hour < 21:
-                time_of_day = "evening"
-            else:
-                time_of_day = "night"
-            
-            prompt = f"""
-            You are a friendly travel assistant. Create a warm, engaging welcome message for:
-            
-            Traveler name: {username}
-            Location: {location_name}
-            Time of day: {time_of_day}
-            
-            Requirements:
-            1. Start with a time-appropriate greeting
-            2. Mention the location in a positive way
-            3. Include one interesting fact about {location_name} if you know any
-            4. Express excitement about helping them explore
-            5. Use 1-2 relevant emojis naturally
-            6. Keep it under 80 words
-            7. Sound enthusiastic but not overly formal
+            time_of_day = predict.time_of_day(hour)
             
-            Example style: "Good morning Sarah! 🌟 Welcome to Chennai - the cultural capital of South India! Did you know it's famous for its beautiful beaches and filter coffee? I'm excited to help you explore this amazing city!"
+            prompt = build_greeting_prompt(username, location_name, time_of_day)
             
-            Now create your greeting:
-            """
-            
-            response = gemini_model.generate_content(prompt)
-            greeting = response.text.strip()
+            greeting = generate_with_cache(prompt, priority='greeting')
             
             # Ensure username is included
             if username and username.lower() not in greeting.lower():
@@ -364,141 +463,77 @@ def generate_ai_greeting(username, location_name):
         print(f"DEBUG: AI greeting failed, using fallback: {e}")
     
     # Fallback to rule-based greeting
-    return generate_smart_greeting_fallback(username, location_name)
+    return generate_smart_greeting_fallback(username, location_name, hour)
 
-def generate_ai_place_description(place, location_name):
+def generate_ai_place_description(place, location_name, budget=None):
     """Generate AI description of a place"""
     try:
-        if gemini_model:
-            # Prepare place details
-            place_details = {
-                'name': place.get('name', 'Unknown Place'),
-                'address': place.get('address', 'Address not available'),
-                'rating': place.get('rating', 'Not rated'),
-                'total_ratings': place.get('total_ratings', 0),
-                'price': place.get('price_text', 'Price information not available'),
-                'distance': place.get('distance_text', 'Distance not available'),
-                'status': 'Open 🟢' if place.get('open_now') else 'Closed 🔴' if place.get('open_now') is not None else 'Hours not available',
-                'phone': place.get('phone', 'Not available'),
-                'website': place.get('website', 'Not available')
-            }
-            
-            prompt = f"""
-            You are a knowledgeable local guide in {location_name}. A traveler is asking for more information about:
-            
-            Place: {place_details['name']}
-            
-            Details:
-            - Address: {place_details['address']}
-            - Rating: {place_details['rating']}/5 stars ({place_details['total_ratings']} reviews)
-            - Price: {place_details['price']}
-            - Distance: {place_details['distance']} away
-            - Status: {place_details['status']}
-            - Phone: {place_details['phone']}
-            - Website: {place_details['website']}
+        if gemini_router and deadline.allows(budget, 'ai_narration'):
+            prompt = build_place_description_prompt(place, location_name)
             
-            Create a helpful, engaging description with:
-            1. A friendly introduction to the place
-            2. Key highlights (rating, price, distance)
-            3. Practical information (status, contact)
-            4. A recommendation or tip about visiting
-            5. End with an open-ended question to continue conversation
-            6. Use natural language with occasional emojis
-            7. Keep it conversational (150-200 words)
-            
-            Make it sound like you're personally recommending this place to a friend!
-            """
-            
-            response = gemini_model.generate_content(prompt)
-            return response.text.strip()
+            return generate_with_cache(prompt, priority='description', budget=budget)
+    except gemini_queue.GeminiOverloaded as e:
+        print(f"DEBUG: AI place description skipped: {e}")
+        if budget is not None:
+            budget.skip('ai_narration')
     except Exception as e:
         print(f"DEBUG: AI place description failed: {e}")
-        # Fallback to rule-based description
-        return generate_place_description_fallback(place)
+    
+    # Fallback to rule-based description
+    return generate_place_description_fallback(place)
 
-def generate_ai_response_with_context(user_message, location_name, places, search_params, conversation_history):
+def generate_ai_response_with_context(user_message, location_name, places, search_params, conversation_history,
+                                      conversation_id=None, conversation_length=None, budget=None):
     """Generate AI response using Gemini with full context"""
     try:
-        if gemini_model:
-            # Prepare places information
-            places_info = ""
-            if places:
-                places_info = "**Places I found for you:**\n\n"
-                for i, place in enumerate(places[:5], 1):
-                    places_info += f"{i}. **{place['name']}**\n"
-                    places_info += f"   ⭐ Rating: {place.get('rating', 'N/A')}/5"
-                    if place.get('total_ratings'):
-                        places_info += f" ({place.get('total_ratings')} reviews)"
-                    places_info += f"\n   📍 Distance: {place.get('distance_text', 'N/A')}"
-                    if place.get('price_text'):
-                        places_info += f"\n   💰 Price: {place.get('price_text')}"
-                    places_info += "\n\n"
-            
-            # Prepare conversation context
-            convo_context = ""
-            if conversation_history and len(conversation_history) > 0:
-                convo_context = "**Recent conversation history:**\n"
-                # Get last 2-3 exchanges
-                for msg in conversation_history[-4:]:
-                    role = "Traveler" if msg.get('role') == 'user' else "You"
-                    convo_context += f"{role}: {msg.get('content', '')[:100]}...\n"
-            
-            # Prepare search context
-            search_context = f"""
-            **Search Context:**
-            - User is in: {location_name}
-            - Looking for: {search_params.get('query', 'places')}
-            - Category: {search_params.get('category', 'general')}
-            - Price preference: {search_params.get('price_preference', 'any')}
-            - Number of places found: {len(places)}
-            """
-            
-            prompt = f"""
-            You are GeoGuide, a friendly and knowledgeable AI travel assistant. You're helping a traveler in {location_name}.
-            
-            {convo_context}
-            
-            **Traveler's current request:** "{user_message}"
-            
-            {search_context}
-            
-            {places_info if places else "**No specific places found for this query.**"}
-            
-            **Your response should:**
-            1. Acknowledge the traveler's request naturally
-            2. If places were found: highlight 2-3 top recommendations with brief reasons why they're good
-            3. If no places found: suggest alternatives or ask clarifying questions
-            4. Include practical tips (distance, price, current status if available)
-            5. Use a warm, enthusiastic tone with occasional emojis
-            6. Ask a follow-up question to keep the conversation going
-            7. Keep it concise but informative (150-250 words)
-            8. Sound like a local friend giving advice
-            
-            **Important:** Reference specific places by name if available. Don't just list facts - explain why they're good options!
-            
-            Your response:
-            """
+        if gemini_router and deadline.allows(budget, 'ai_narration'):
+            # Older turns come in as a rolling summary, only the latest ones verbatim
+            summary, recent_history = memory.get_conversation_memory(
+                conversation_id, conversation_history, conversation_length, gemini_router
+            )
+            prompt = build_chat_prompt(
+                user_message=user_message,
+                location_name=location_name,
+                places=places,
+                search_params=search_params,
+                conversation_history=recent_history,
+                conversation_summary=summary
+            )
             
-            response = gemini_model.generate_content(prompt)
-            ai_response = response.text.strip()
+            # Rephrasings of the same request in the same context share one cached reply
+            cache_key = '|'.join([
+                'chat',
+                canonical.canonicalize(user_message),
+                location_name or '',
+                ','.join(p.get('place_id') or p.get('name', '') for p in (places or [])[:5]),
+                canonical.conversation_key(recent_history),
+                summary or '',
+            ])
+            ai_response = generate_with_cache(prompt, cache_key, budget=budget)
             
             # Add a note about clicking for more info if we have places
             if places and len(places) > 0:
                 ai_response += "\n\n💡 *Click on any place in the sidebar or map for detailed information and directions!*"
             
             return ai_response
+    except gemini_queue.GeminiOverloaded as e:
+        print(f"DEBUG: AI response skipped: {e}")
+        if budget is not None:
+            budget.skip('ai_narration')
     except Exception as e:
         print(f"DEBUG: AI response generation failed: {e}")
-        # Fallback to rule-based response
-        return generate_smart_response_fallback(user_message, location_name, places, search_params)
+    
+    # Fallback to rule-based response
+    return generate_smart_response_fallback(user_message, location_name, places, search_params)
 
 # ==================== FALLBACK FUNCTIONS ====================
 
-def generate_smart_greeting_fallback(username, location_name):
+def generate_smart_greeting_fallback(username, location_name, hour=None):
     """Fallback greeting function when AI fails"""
     import random
     
-    hour = datetime.now().hour
+    if hour is None:
+        hour = datetime.now().hour
     if hour < 12:
         time_greeting = "Good morning"
     elif hour < 17:
@@ -578,7 +613,22 @@ def generate_smart_response_fallback(user_message, location_name, places, search
     }
     
     emoji = category_emojis.get(category, '📍')
-    
+
+    intents = search_params.get('intents') or []
+    if len(intents) > 1:
+        # Compound request: the best couple of places per intent
+        response = f"📍 Here's what I found in {location_name}:\n\n"
+        for intent in intents:
+            group = [p for p in places if p.get('intent') == intent['query']]
+            intent_emoji = category_emojis.get(intent['category'], '📍')
+            if not group:
+                response += f"{intent_emoji} **{intent['query'].title()}**: nothing found nearby\n"
+                continue
+            picks = ', '.join(f"**{p['name']}** ({p.get('rating', 0)}/5, {p.get('distance_text', 'N/A')})" for p in group[:2])
+            response += f"{intent_emoji} **{intent['query'].title()}**: {picks}\n"
+        response += "\nClick any place on the map or in the sidebar for directions!"
+        return response
+
     if not places:
         # No places found
         no_results_responses = {
@@ -714,6 +764,10 @@ def calculate_estimated_time(distance_km, mode='driving'):
         # Default to driving
         minutes = (distance_km / 40) * 60
     
+    return format_travel_minutes(minutes)
+
+def format_travel_minutes(minutes):
+    """Readable travel time"""
     if minutes < 1:
         return "Less than 1 min"
     elif minutes < 60:
@@ -726,114 +780,132 @@ def calculate_estimated_time(distance_km, mode='driving'):
         else:
             return f"{hours}h"
 
-def analyze_user_intent_smart(user_message):
-    """Smart intent analysis with better keyword matching"""
-    user_lower = user_message.lower()
+# Expanded intent detection vocabulary (keyword -> search intent)
+INTENT_KEYWORDS = {
+    # Food & Drink
+    'biryani': {'type': 'restaurant', 'query': 'biryani', 'category': 'food'},
+    'biriyani': {'type': 'restaurant', 'query': 'biriyani', 'category': 'food'},
+    'pizza': {'type': 'restaurant', 'query': 'pizza', 'category': 'food'},
+    'coffee': {'type': 'cafe', 'query': 'coffee', 'category': 'drink'},
+    'tea': {'type': 'cafe', 'query': 'tea', 'category': 'drink'},
+    'restaurant': {'type': 'restaurant', 'query': 'restaurant', 'category': 'food'},
+    'food': {'type': 'restaurant', 'query': 'food', 'category': 'food'},
+    'dinner': {'type': 'restaurant', 'query': 'dinner', 'category': 'food'},
+    'lunch': {'type': 'restaurant', 'query': 'lunch', 'category': 'food'},
+    'breakfast': {'type': 'restaurant', 'query': 'breakfast', 'category': 'food'},
     
-    # Expanded intent detection
-    intents = {
-        # Food & Drink
-        'biryani': {'type': 'restaurant', 'query': 'biryani', 'category': 'food'},
-        'biriyani': {'type': 'restaurant', 'query': 'biriyani', 'category': 'food'},
-        'pizza': {'type': 'restaurant', 'query': 'pizza', 'category': 'food'},
-        'coffee': {'type': 'cafe', 'query': 'coffee', 'category': 'drink'},
-        'tea': {'type': 'cafe', 'query': 'tea', 'category': 'drink'},
-        'restaurant': {'type': 'restaurant', 'query': 'restaurant', 'category': 'food'},
-        'food': {'type': 'restaurant', 'query': 'food', 'category': 'food'},
-        'dinner': {'type': 'restaurant', 'query': 'dinner', 'category': 'food'},
-        'lunch': {'type': 'restaurant', 'query': 'lunch', 'category': 'food'},
-        'breakfast': {'type': 'restaurant', 'query': 'breakfast', 'category': 'food'},
-        
-        # Accommodation
-        'hotel': {'type': 'lodging', 'query': 'hotel', 'category': 'accommodation'},
-        'stay': {'type': 'lodging', 'query': 'hotel', 'category': 'accommodation'},
-        'lodging': {'type': 'lodging', 'query': 'lodging', 'category': 'accommodation'},
-        
-        # Entertainment
-        'movie': {'type': 'movie_theater', 'query': 'cinema', 'category': 'entertainment'},
-        'theater': {'type': 'movie_theater', 'query': 'theater', 'category': 'entertainment'},
-        'cinema': {'type': 'movie_theater', 'query': 'cinema', 'category': 'entertainment'},
-        
-        # Recreation
-        'park': {'type': 'park', 'query': 'park', 'category': 'recreation'},
-        'garden': {'type': 'park', 'query': 'garden', 'category': 'recreation'},
-        
-        # Shopping
-        'mall': {'type': 'shopping_mall', 'query': 'shopping mall', 'category': 'shopping'},
-        'shopping': {'type': 'shopping_mall', 'query': 'shopping', 'category': 'shopping'},
-        'market': {'type': 'shopping_mall', 'query': 'market', 'category': 'shopping'},
-        
-        # Health
-        'pharmacy': {'type': 'pharmacy', 'query': 'pharmacy', 'category': 'health'},
-        'hospital': {'type': 'hospital', 'query': 'hospital', 'category': 'health'},
-        'doctor': {'type': 'hospital', 'query': 'hospital', 'category': 'health'},
-        
-        # Services
-        'atm': {'type': 'atm', 'query': 'atm', 'category': 'services'},
-        'bank': {'type': 'bank', 'query': 'bank', 'category': 'services'},
-        
-        # Transportation
-        'gas': {'type': 'gas_station', 'query': 'petrol pump', 'category': 'transport'},
-        'petrol': {'type': 'gas_station', 'query': 'petrol pump', 'category': 'transport'},
-        'bus': {'type': 'bus_station', 'query': 'bus station', 'category': 'transport'},
-        
-        # General
-        'best': {'type': '', 'query': 'popular places', 'category': 'recommendation'},
-        'top': {'type': '', 'query': 'best places', 'category': 'recommendation'},
-        'recommend': {'type': '', 'query': 'recommended places', 'category': 'recommendation'},
-        'popular': {'type': '', 'query': 'popular places', 'category': 'recommendation'},
-        'nearby': {'type': '', 'query': 'nearby places', 'category': 'general'},
-        'near': {'type': '', 'query': 'places', 'category': 'general'},
-        'around': {'type': '', 'query': 'places', 'category': 'general'},
-        'places': {'type': '', 'query': 'places', 'category': 'general'},
-    }
+    # Accommodation
+    'hotel': {'type': 'lodging', 'query': 'hotel', 'category': 'accommodation'},
+    'stay': {'type': 'lodging', 'query': 'hotel', 'category': 'accommodation'},
+    'lodging': {'type': 'lodging', 'query': 'lodging', 'category': 'accommodation'},
+    
+    # Entertainment
+    'movie': {'type': 'movie_theater', 'query': 'cinema', 'category': 'entertainment'},
+    'theater': {'type': 'movie_theater', 'query': 'theater', 'category': 'entertainment'},
+    'cinema': {'type': 'movie_theater', 'query': 'cinema', 'category': 'entertainment'},
+    
+    # Recreation
+    'park': {'type': 'park', 'query': 'park', 'category': 'recreation'},
+    'garden': {'type': 'park', 'query': 'garden', 'category': 'recreation'},
+    
+    # Shopping
+    'mall': {'type': 'shopping_mall', 'query': 'shopping mall', 'category': 'shopping'},
+    'shopping': {'type': 'shopping_mall', 'query': 'shopping', 'category': 'shopping'},
+    'market': {'type': 'shopping_mall', 'query': 'market', 'category': 'shopping'},
+    
+    # Health
+    'pharmacy': {'type': 'pharmacy', 'query': 'pharmacy', 'category': 'health'},
+    'hospital': {'type': 'hospital', 'query': 'hospital', 'category': 'health'},
+    'doctor': {'type': 'hospital', 'query': 'hospital', 'category': 'health'},
+    
+    # Services
+    'atm': {'type': 'atm', 'query': 'atm', 'category': 'services'},
+    'bank': {'type': 'bank', 'query': 'bank', 'category': 'services'},
+    
+    # Transportation
+    'gas': {'type': 'gas_station', 'query': 'petrol pump', 'category': 'transport'},
+    'petrol': {'type': 'gas_station', 'query': 'petrol pump', 'category': 'transport'},
+    'bus': {'type': 'bus_station', 'query': 'bus station', 'category': 'transport'},
+    
+    # General
+    'best': {'type': '', 'query': 'popular places', 'category': 'recommendation'},
+    'top': {'type': '', 'query': 'best places', 'category': 'recommendation'},
+    'recommend': {'type': '', 'query': 'recommended places', 'category': 'recommendation'},
+    'popular': {'type': '', 'query': 'popular places', 'category': 'recommendation'},
+    'nearby': {'type': '', 'query': 'nearby places', 'category': 'general'},
+    'near': {'type': '', 'query': 'places', 'category': 'general'},
+    'around': {'type': '', 'query': 'places', 'category': 'general'},
+    'places': {'type': '', 'query': 'places', 'category': 'general'},
+}
+
+suggest.load_vocabulary(INTENT_KEYWORDS)
+canonical.load_vocabulary(INTENT_KEYWORDS)
+
+def analyze_user_intent_smart(user_message):
+    """Smart intent analysis, memoized on the canonical form of the message"""
+    # Location anchors ("near the bus station") say where, not what; they don't pick the intent
+    clauses = canonical.intent_clauses(user_message)
+    canonical_query = canonical.canonicalize(' '.join(clauses)) or canonical.canonicalize(user_message)
+    intent = dict(analyze_canonical_intent(canonical_query))
+    intent['canonical_query'] = canonical_query
+    if intent['search_query'] is None:
+        # No intent keyword: search the message's own words, in its order
+        intent['search_query'] = canonical.keyword_query(' '.join(clauses) or user_message) or 'places'
+    intent['intents'] = extract_compound_intents(tuple(clauses))
+    # Price and proximity come from the whole message, whatever the clauses kept
+    intent['price_preference'] = canonical.price_preference(user_message)
+    intent['radius_preference'] = canonical.proximity(user_message)
+    return intent
+
+@lru_cache(maxsize=4096)
+def analyze_canonical_intent(canonical_query):
+    """Keyword intent matching on a canonicalized query (see app/canonical.py)"""
+    user_lower = canonical_query
     
     # Check for intent keywords
     detected_intent = None
-    for keyword, intent in intents.items():
+    for keyword, intent in INTENT_KEYWORDS.items():
         if keyword in user_lower:
             detected_intent = intent
             break
     
-    # If no specific intent, extract main words
+    # If no specific intent, the keyword comes from the message's own words. The canonical
+    # form is sorted, so analyze_user_intent_smart fills it in from the message order.
     if not detected_intent:
-        # Remove common words
-        common_words = ['find', 'search', 'look', 'for', 'me', 'i', 'want', 'to', 'go', 'the', 'a', 'an', 'and', 'or', 'please', 'can', 'you', 'help', 'show', 'tell']
-        words = user_lower.split()
-        filtered_words = [word for word in words if word not in common_words and len(word) > 2]
-        
-        if filtered_words:
-            query = ' '.join(filtered_words[:3])  # Take first 3 meaningful words
-        else:
-            query = 'places'  # Default query
-        
-        detected_intent = {'type': '', 'query': query, 'category': 'general'}
-    
-    # Check for price preferences
-    price_preference = None
-    if any(word in user_lower for word in ['cheap', 'budget', 'low price', 'affordable', 'under', 'less than']):
-        price_preference = 'budget'
-    elif any(word in user_lower for word in ['expensive', 'luxury', 'premium', 'high end']):
-        price_preference = 'expensive'
-    
-    # Check for distance preferences
-    radius_preference = None
-    if any(word in user_lower for word in ['nearby', 'close', 'walking', 'within walking']):
-        radius_preference = 'nearby'
-    elif any(word in user_lower for word in ['far', 'distant', 'drive']):
-        radius_preference = 'far'
+        detected_intent = {'type': '', 'query': None, 'category': 'general'}
     
     return {
         'intent_type': 'search_places',
         'place_type': detected_intent['type'],
         'search_query': detected_intent['query'],
         'category': detected_intent['category'],
-        'price_preference': price_preference,
-        'radius_preference': radius_preference,
+        'price_preference': None,  # set from the raw message by analyze_user_intent_smart
+        'radius_preference': None,  # set from the raw message by analyze_user_intent_smart
         'additional_context': f"looking for {detected_intent['category']} options",
+        'intents': (),  # set from the message's clauses by analyze_user_intent_smart
         'should_search': True
     }
 
+@lru_cache(maxsize=4096)
+def extract_compound_intents(clauses):
+    """
+    One intent per clause of a compound request ("coffee and an ATM"), distinct place types
+    only, up to MULTI_INTENT_MAX; () unless at least two clauses name a place type.
+    """
+    intents = []
+    seen_types = set()
+    for clause in clauses:
+        tokens = set(canonical.canonical_tokens(clause))
+        for keyword, intent in INTENT_KEYWORDS.items():
+            if keyword in tokens and intent['type']:
+                if intent['type'] not in seen_types:
+                    seen_types.add(intent['type'])
+                    intents.append({'place_type': intent['type'], 'search_query': intent['query'],
+                                    'category': intent['category']})
+                break
+    intents = intents[:getattr(settings, 'MULTI_INTENT_MAX', 3)]
+    return tuple(intents) if len(intents) > 1 else ()
+
 def extract_search_params_from_intent(intent_analysis):
     """Convert intent analysis to search parameters"""
     # Map place types to Google Places types
@@ -872,142 +944,406 @@ def extract_search_params_from_intent(intent_analysis):
         'price_preference': intent_analysis.get('price_preference'),
         'radius': radius,
         'additional_context': intent_analysis.get('additional_context', ''),
+        'canonical_query': intent_analysis.get('canonical_query', ''),
         'should_search': True
     }
 
-def search_places_smart(lat, lng, search_params):
-    """Smart place search with better filtering and results"""
+def extract_search_params_for_intents(intent_analysis):
+    """One set of search parameters per intent of a compound request (just one otherwise)"""
+    intents = intent_analysis.get('intents') or ()
+    if len(intents) < 2:
+        return [extract_search_params_from_intent(intent_analysis)]
+    return [extract_search_params_from_intent(dict(intent_analysis, **intent)) for intent in intents]
+
+def search_for_intents(lat, lng, intent_analysis, budget=None, first_query=False, hour=None):
+    """
+    (places, search_params) for an analyzed message. Compound requests search all intents
+    concurrently; their search_params describe each one under 'intents'.
+    first_query marks a session's first search, which feeds the first-query predictor
+    for the user's local hour.
+    """
+    intent_params = extract_search_params_for_intents(intent_analysis)
+    search_params = intent_params[0]
+    if not search_params.get('should_search', True):
+        return [], search_params
+    predict.record_searches(lat, lng, intent_params, first_query, hour)
+    if len(intent_params) == 1:
+        return search_places_smart(lat, lng, search_params, budget), search_params
+    
+    places = search_places_multi(lat, lng, intent_params, budget)
+    search_params = dict(
+        search_params,
+        query=' + '.join(params['query'] for params in intent_params),
+        category='multiple',
+        type='',
+        place_type='',
+        intents=[{
+            'query': params['query'],
+            'type': params['type'],
+            'category': params['category'],
+            'radii_searched': params.get('radii_searched', []),
+            'count': sum(1 for place in places if place.get('intent') == params['query']),
+        } for params in intent_params],
+    )
+    search_params.pop('radii_searched', None)
+    return places, search_params
+
+predict.load_priors({
+    daypart: [extract_search_params_from_intent(analyze_user_intent_smart(query)) for query in queries]
+    for daypart, queries in getattr(settings, 'PREDICT_PRIOR_QUERIES', predict.DEFAULT_PRIOR_QUERIES).items()
+})
+
+def warm_predicted_search(lat, lng, search_params):
+    """
+    Run a predicted first search so its Nearby Search rings and the details of its top
+    places are cached; returns True if the Nearby Search wasn't cached already.
+    """
+    fetched = cache_get('nearby', *nearby_cache_parts(lat, lng, search_params)) is None
+    results = collect_nearby_results(lat, lng, search_params)
+    for place in results[:getattr(settings, 'PREDICT_DETAILS_PER_QUERY', 8)]:
+        if place.get('place_id'):
+            get_place_details(place['place_id'])
+    print(f"DEBUG: Warmed predicted search '{search_params.get('query')}' ({len(results)} places)")
+    return fetched
+
+def search_places_smart(lat, lng, search_params, budget=None):
+    """Smart place search with better filtering and results (optional stages give way to the budget)"""
     try:
         query = search_params.get('query', '')
         place_type = search_params.get('type', '')
-        radius = search_params.get('radius', 50000)
         category = search_params.get('category', 'general')
         
         print(f"DEBUG: Smart search - lat: {lat}, lng: {lng}, query: '{query}', type: '{place_type}', category: '{category}'")
         
-        # Build Google Places API request
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        
-        params = {
-            'location': f'{lat},{lng}',
-            'radius': min(radius, 50000),  # Max 50km
-            'key': GOOGLE_MAPS_API_KEY,
-            'rankby': 'prominence'
-        }
-        
-        # Add type if specified
-        if place_type:
-            params['type'] = place_type
-        
-        # Add keyword if provided and not too generic
-        if query and query not in ['places', 'popular places', 'best places', 'recommended places', 'nearby places']:
-            params['keyword'] = query
+        results = collect_nearby_results(lat, lng, search_params, budget)
         
-        print(f"DEBUG: Places API params: {params}")
+        print(f"DEBUG: Initial results: {len(results)}")
         
-        response = requests.get(url, params=params, timeout=15)
-        data = response.json()
+        top = rank_places(lat, lng, results, search_params, budget)
         
-        print(f"DEBUG: Places API status: {data.get('status')}")
-        print(f"DEBUG: Initial results: {len(data.get('results', []))}")
+        # Real ETAs when the provider is enabled (fallback: fixed-speed estimates)
+        travel_times = get_place_travel_times(lat, lng, [record.place_id for _, record in top], budget)
+        filtered_places = [serialize_place(record, lat, lng, score, travel_times) for score, record in top]
         
-        places = []
+        print(f"DEBUG: Returning {len(filtered_places)} filtered places")
+        return filtered_places
         
-        for place in data.get('results', [])[:20]:  # Get more results for better filtering
-            place_id = place.get('place_id')
-            
-            # Get detailed place information
-            place_details = get_place_details(place_id) if place_id else {}
-            
-            # Get price level (handle None)
-            price_level = place.get('price_level')
-            if price_level is None:
-                price_level = place_details.get('price_level')
-            
-            # Calculate distance
-            place_lat = place['geometry']['location']['lat']
-            place_lng = place['geometry']['location']['lng']
-            distance = calculate_distance(lat, lng, place_lat, place_lng)
-            
-            # Filter by distance (max 30km for practicality)
-            if distance > 30:
-                continue
-            
-            # Get photo URL if available
-            photo_url = None
-            if place.get('photos'):
-                try:
-                    photo_reference = place['photos'][0]['photo_reference']
-                    photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_reference}&key={GOOGLE_MAPS_API_KEY}"
-                except:
-                    pass
-            
-            # Get rating (handle None)
-            rating = place.get('rating')
-            if rating is None:
-                rating = place_details.get('rating', 0)
-            
-            # Get total ratings
-            total_ratings = place.get('user_ratings_total', 0)
-            if total_ratings == 0:
-                total_ratings = place_details.get('user_ratings_total', 0)
-            
-            # Check if open
-            open_now = place_details.get('opening_hours', {}).get('open_now')
-            
-            # Get price text
-            price_text = get_price_text(price_level)
-            
-            # Apply price filter if specified in search params
-            price_preference = search_params.get('price_preference')
-            if price_preference == 'budget' and price_level is not None and price_level > 2:
-                continue  # Skip expensive places for budget search
-            
-            # Build place info
-            place_info = {
-                'name': place.get('name', 'Unnamed Place'),
-                'address': place.get('vicinity', 'Address not available'),
-                'rating': rating,
-                'total_ratings': total_ratings,
-                'price_level': price_level,
-                'price_text': price_text,
-                'location': place['geometry']['location'],
-                'place_id': place_id,
-                'types': place.get('types', []),
-                'photo_url': photo_url,
-                'open_now': open_now,
-                'phone': place_details.get('formatted_phone_number', 'Not available'),
-                'website': place_details.get('website', ''),
-                'distance_km': round(distance, 2),
-                'distance_text': get_distance_text(distance),
-                'popularity_score': calculate_popularity_score(rating, total_ratings, distance, category),
-                'navigation_url': generate_navigation_urls(lat, lng, place_lat, place_lng)
-            }
-            
-            places.append(place_info)
+    except Exception as e:
+        print(f"ERROR in search_places_smart: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+
+def rank_places(lat, lng, results, search_params, budget=None, details=None, limit=8):
+    """
+    Best `limit` (score, PlaceRecord) pairs from Nearby Search results, each place once.
+    `details` maps place_id -> Place Details already fetched; otherwise they are fetched here, concurrently.
+    """
+    category = search_params.get('category', 'general')
+    price_preference = search_params.get('price_preference')
+    ranked = []
+    candidates = results[:20]  # Get more results for better filtering
+    if details is None:
+        details = get_place_details_batch([p['place_id'] for p in candidates if p.get('place_id')], budget)
+    
+    for place in candidates:
+        place_id = place.get('place_id')
         
-        # Sort by popularity score (combination of rating, reviews, and distance)
-        places.sort(key=lambda x: x.get('popularity_score', 0), reverse=True)
+        # Get detailed place information
+        place_details = details.get(place_id) or {}
+        record = record_from_search(place, place_details)
         
-        # Return top results (with variety)
-        filtered_places = []
-        seen_names = set()
+        # Filter by distance (max 30km for practicality)
+        distance = calculate_distance(lat, lng, record.lat, record.lng)
+        if distance > 30:
+            continue
         
-        for place in places:
-            name = place['name'].lower()
-            if name not in seen_names and len(filtered_places) < 8:
-                seen_names.add(name)
-                filtered_places.append(place)
+        # Apply price filter if specified in search params
+        if price_preference == 'budget' and record.price_level is not None and record.price_level > 2:
+            continue  # Skip expensive places for budget search
         
-        print(f"DEBUG: Returning {len(filtered_places)} filtered places")
-        return filtered_places
+        score = calculate_popularity_score(record.rating, record.total_ratings, distance, category)
+        ranked.append((score, record))
+    
+    # Sort by popularity score (combination of rating, reviews, and distance)
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    
+    # Return top results (each place only once)
+    top = []
+    seen_ids = set()
+    
+    for score, record in ranked:
+        key = record.place_id or record.name.lower()
+        if key not in seen_ids and len(top) < limit:
+            seen_ids.add(key)
+            top.append((score, record))
+    
+    place_registry.remember(record for _, record in ranked)
+    return top
+
+def search_places_multi(lat, lng, intent_params, budget=None):
+    """
+    Compound requests: the Nearby Searches of all intents run at once, then one shared round
+    of details enrichment and one travel-time batch. Places come back grouped by intent,
+    each tagged with its intent's query and listed once (under the first intent that found it).
+    """
+    try:
+        per_intent = getattr(settings, 'MULTI_INTENT_PLACES_PER_INTENT', 5)
+        futures = [intent_executor.submit(collect_nearby_results, lat, lng, params, budget) for params in intent_params]
+        searches = []
+        for params, future in zip(intent_params, futures):
+            try:
+                searches.append(future.result(timeout=deadline.timeout_for(budget, 15)))
+            except Exception as e:
+                print(f"ERROR in intent search '{params.get('query')}': {e!r}")
+                searches.append([])
+        
+        # A place several intents found is enriched once
+        place_ids = list(dict.fromkeys(
+            place.get('place_id') for results in searches for place in results[:20] if place.get('place_id')
+        ))
+        details = get_place_details_batch(place_ids, budget)
+        groups = [
+            rank_places(lat, lng, results, params, budget, details=details, limit=per_intent)
+            for params, results in zip(intent_params, searches)
+        ]
+        
+        travel_times = get_place_travel_times(
+            lat, lng, list(dict.fromkeys(record.place_id for top in groups for _, record in top)), budget
+        )
+        places = []
+        seen_ids = set()
+        for params, top in zip(intent_params, groups):
+            for score, record in top:
+                key = record.place_id or record.name.lower()
+                if key in seen_ids:
+                    continue
+                seen_ids.add(key)
+                place = serialize_place(record, lat, lng, score, travel_times)
+                place['intent'] = params['query']
+                places.append(place)
+        
+        print(f"DEBUG: Multi-intent search {[p['query'] for p in intent_params]} -> {len(places)} places")
+        return places
         
     except Exception as e:
-        print(f"ERROR in search_places_smart: {e}")
+        print(f"ERROR in search_places_multi: {e}")
         import traceback
         traceback.print_exc()
         return []
 
+def get_place_details_batch(place_ids, budget=None):
+    """{place_id: details} fetched concurrently; places that failed or were skipped map to {}"""
+    futures = {place_id: search_executor.submit(get_place_details, place_id, budget) for place_id in place_ids}
+    details = {}
+    for place_id, future in futures.items():
+        try:
+            details[place_id] = future.result(timeout=deadline.timeout_for(budget, 10))
+        except Exception as e:
+            print(f"ERROR in details for {place_id}: {e!r}")
+            future.cancel()
+            details[place_id] = {}
+    return details
+
+def get_search_radii(search_params):
+    """The requested radius followed by the wider progressive rings"""
+    radius = min(search_params.get('radius', 10000), 50000)
+    rings = getattr(settings, 'PROGRESSIVE_SEARCH_RADII', [2000, 10000, 20000])
+    return [radius] + [ring for ring in rings if ring > radius]
+
+def collect_nearby_results(lat, lng, search_params, budget=None):
+    """
+    Progressive Nearby Search: merge rings of growing radius, deduped by place_id,
+    until at least PROGRESSIVE_SEARCH_MIN_RESULTS places are collected.
+    Mode 'expand' (default) only requests a wider ring when the narrower ones came back
+    short; 'concurrent' requests all rings at once, trading paid calls that are usually
+    unnecessary for latency; 'off' searches the requested radius only.
+    Wider rings are dropped when the budget runs low.
+    """
+    mode = search_params.get('progressive', getattr(settings, 'PROGRESSIVE_SEARCH_MODE', 'expand'))
+    min_results = getattr(settings, 'PROGRESSIVE_SEARCH_MIN_RESULTS', 8)
+    radii = get_search_radii(search_params)
+    if mode == 'off':
+        radii = radii[:1]
+    if not deadline.allows(budget, 'nearby'):
+        search_params['radii_searched'] = []
+        return []
+    
+    def ring_params(radius):
+        return dict(search_params, radius=radius)
+    
+    results = []
+    seen_ids = set()
+    searched = []
+    
+    def merge(data, radius):
+        searched.append(radius)
+        for place in data.get('results', []):
+            place_id = place.get('place_id')
+            if place_id and place_id in seen_ids:
+                continue
+            seen_ids.add(place_id)
+            results.append(place)
+    
+    if budget is not None and len(radii) > 1 and not budget.allows('wider_rings'):
+        radii = radii[:1]
+    
+    if mode == 'concurrent' and len(radii) > 1:
+        futures = [search_executor.submit(fetch_nearby_places, lat, lng, ring_params(r), budget) for r in radii]
+        # Merge in ring order so nearer results keep priority
+        for i, (radius, future) in enumerate(zip(radii, futures)):
+            try:
+                merge(future.result(timeout=deadline.timeout_for(budget, 15)), radius)
+            except Exception as e:
+                print(f"ERROR in nearby ring {radius}m: {e!r}")
+            out_of_budget = budget is not None and i + 1 < len(radii) and not budget.allows('wider_rings')
+            if len(results) >= min_results or out_of_budget:
+                for pending in futures:
+                    pending.cancel()
+                break
+    else:
+        for i, radius in enumerate(radii):
+            if i > 0 and not deadline.allows(budget, 'wider_rings'):
+                break
+            merge(fetch_nearby_places(lat, lng, ring_params(radius), budget), radius)
+            if len(results) >= min_results:
+                break
+    
+    search_params['radii_searched'] = searched
+    print(f"DEBUG: Progressive search ({mode}) rings {searched} -> {len(results)} unique places")
+    return results
+
+GENERIC_QUERIES = ['places', 'popular places', 'best places', 'recommended places', 'nearby places']
+
+def nearby_cache_parts(lat, lng, search_params):
+    """(cell_lat, cell_lng, type, keyword, radius) a Nearby Search is cached under"""
+    query = search_params.get('query', '')
+    place_type = search_params.get('type', '')
+    radius = min(search_params.get('radius', 50000), 50000)  # Max 50km
+    keyword = query if query and query not in GENERIC_QUERIES else ''
+    
+    # Everyone in the cell shares one cache entry
+    cell_lat, cell_lng = snap_to_cell(lat, lng)
+    return cell_lat, cell_lng, place_type, keyword, radius
+
+def results_within(data, lat, lng, radius):
+    """The Nearby Search response with only the results within radius metres of (lat, lng)"""
+    results = []
+    for place in data.get('results', []):
+        location = place.get('geometry', {}).get('location', {})
+        if 'lat' in location and 'lng' in location and \
+                calculate_distance(lat, lng, location['lat'], location['lng']) * 1000 > radius:
+            continue
+        results.append(place)
+    return dict(data, results=results)
+
+def fetch_nearby_places(lat, lng, search_params, budget=None):
+    """
+    Google Places Nearby Search around the user, cached per cell/type/keyword/radius.
+    The search is sent from the user's own position, widened by the distance to the far
+    corner of the cell so the cached entry also covers everyone else in the cell; every
+    caller gets only the results within the requested radius of where they are.
+    """
+    cell_lat, cell_lng, place_type, keyword, radius = nearby_cache_parts(lat, lng, search_params)
+    cached = cache_get('nearby', cell_lat, cell_lng, place_type, keyword, radius)
+    if cached is not None:
+        print(f"DEBUG: Nearby search cache hit for cell {cell_lat},{cell_lng}")
+        data = results_within(cached, float(lat), float(lng), radius)
+        suggest.add_place_names(cell_id(lat, lng), [p.get('name') for p in data.get('results', [])])
+        return data
+    
+    # Build Google Places API request
+    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    
+    params = {
+        'location': f'{lat},{lng}',
+        'radius': min(radius + cell_reach_m(lat, lng), 50000),
+        'key': GOOGLE_MAPS_API_KEY,
+        'rankby': 'prominence'
+    }
+    
+    # Add type if specified
+    if place_type:
+        params['type'] = place_type
+    
+    # Add keyword if provided and not too generic
+    if keyword:
+        params['keyword'] = keyword
+    
+    print(f"DEBUG: Places API params: {params}")
+    
+    response = requests.get(url, params=params, timeout=deadline.timeout_for(budget, 15))
+    data = response.json()
+    
+    print(f"DEBUG: Places API status: {data.get('status')}")
+    
+    if data.get('status') in ('OK', 'ZERO_RESULTS'):
+        cache_set('nearby', data, cell_lat, cell_lng, place_type, keyword, radius)
+        data = results_within(data, float(lat), float(lng), radius)
+        suggest.add_place_names(cell_id(lat, lng), [p.get('name') for p in data.get('results', [])])
+    
+    return data
+
+def get_place_travel_times(lat, lng, place_ids, budget=None):
+    """{mode: {place_id: seconds}} from one batched Distance Matrix call per mode ({} when disabled)"""
+    place_ids = [place_id for place_id in place_ids if place_id]
+    if not place_ids or not travel.is_enabled() or not deadline.allows(budget, 'travel_times'):
+        return {}
+    
+    travel_deadline = getattr(settings, 'TRAVEL_TIME_DEADLINE', 2.0)
+    return travel.get_travel_times(
+        lat, lng, place_ids, GOOGLE_MAPS_API_KEY,
+        deadline=deadline.timeout_for(budget, travel_deadline, reserve=deadline.stage_min_seconds('ai_narration'))
+    )
+
+def apply_travel_times(navigation, place_id, times):
+    """Replace the fixed-speed ETAs in a navigation block with Distance Matrix durations"""
+    if not navigation or not times:
+        return
+    estimated = navigation['estimated_time']
+    for mode, durations in times.items():
+        seconds = durations.get(place_id)
+        if seconds is not None:
+            estimated[mode] = format_travel_minutes(seconds / 60)
+            navigation.setdefault('travel_time_source', {})[mode] = 'distance_matrix'
+    navigation['directions_text'] = f"{navigation['distance_km']} km away • {estimated['driving']} by car • {estimated['walking']} walking"
+
+def serialize_place(record, lat, lng, popularity_score=None, travel_times=None):
+    """API dict for a PlaceRecord; labels, open status and navigation are derived here, per request"""
+    distance = calculate_distance(lat, lng, record.lat, record.lng)
+    opening_status = evaluate_periods(record.periods, record.utc_offset)
+    
+    photo_url = None
+    if record.photo_ref:
+        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={record.photo_ref}&key={GOOGLE_MAPS_API_KEY}"
+    
+    if popularity_score is None:
+        popularity_score = calculate_popularity_score(record.rating, record.total_ratings, distance)
+    
+    navigation = generate_navigation_urls(lat, lng, record.lat, record.lng)
+    apply_travel_times(navigation, record.place_id, travel_times)
+    
+    return {
+        'name': record.name,
+        'address': record.address or 'Address not available',
+        'rating': record.rating,
+        'total_ratings': record.total_ratings,
+        'price_level': record.price_level,
+        'price_text': get_price_text(record.price_level),
+        'location': {'lat': record.lat, 'lng': record.lng},
+        'place_id': record.place_id,
+        'types': list(record.types),
+        'photo_url': photo_url,
+        'open_now': opening_status['open_now'],
+        'opening_hint': opening_status['hint'],
+        'phone': record.phone or 'Not available',
+        'website': record.website or '',
+        'distance_km': round(distance, 2),
+        'distance_text': get_distance_text(distance),
+        'popularity_score': popularity_score,
+        'navigation_url': navigation
+    }
+
 def calculate_popularity_score(rating, total_ratings, distance_km, category='general'):
     """Calculate a popularity score for sorting"""
     # Handle None values safely
@@ -1046,36 +1382,21 @@ def calculate_popularity_score(rating, total_ratings, distance_km, category='gen
     
     return rating_score + review_score + distance_score + category_bonus
 
-def get_location_name_google(lat, lng):
+def get_location_name_google(lat, lng, budget=None):
     """Get location name from coordinates"""
     try:
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
-        params = {
-            'latlng': f'{lat},{lng}',
-            'key': GOOGLE_MAPS_API_KEY,
-            'language': 'en'
-        }
+        cell = cell_id(lat, lng)
+        cached = cache_get('geocode', cell)
+        if cached is not None:
+            return cached
         
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        if not deadline.allows(budget, 'geocode'):
+            return "your location"
         
-        if data.get('status') == 'OK' and data.get('results'):
-            result = data['results'][0]
-            
-            # Try to get locality first
-            for component in result['address_components']:
-                if 'locality' in component['types']:
-                    return component['long_name']
-                if 'administrative_area_level_2' in component['types']:
-                    return component['long_name']
-                if 'administrative_area_level_1' in component['types']:
-                    return component['long_name']
-            
-            # Fallback to formatted address
-            formatted_address = result.get('formatted_address', '')
-            if formatted_address:
-                # Take first part of address
-                return formatted_address.split(',')[0].strip()
+        location_name = fetch_location_name(lat, lng, timeout=deadline.timeout_for(budget, 10))
+        if location_name:
+            cache_set('geocode', location_name, cell)
+            return location_name
         
         return "your location"
         
@@ -1083,21 +1404,136 @@ def get_location_name_google(lat, lng):
         print(f"ERROR in get_location_name_google: {e}")
         return "your location"
 
-def get_place_details(place_id):
-    """Get detailed information for a specific place"""
+def fetch_location_name(lat, lng, timeout=10):
+    """
+    Reverse-geocode one point with the Geocoding API (uncached).
+    Returns None when Google has no usable name; raises on quota and request errors.
+    """
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    params = {
+        'latlng': f'{lat},{lng}',
+        'key': GOOGLE_MAPS_API_KEY,
+        'language': 'en'
+    }
+    
+    response = requests.get(url, params=params, timeout=timeout)
+    data = response.json()
+    
+    status = data.get('status')
+    if status == 'OK' and data.get('results'):
+        return extract_location_name(data['results'][0])
+    if status not in ('OK', 'ZERO_RESULTS'):
+        raise Exception(f"Geocoding status {status}")
+    return None
+
+def reverse_geocode_bulk(points, limiter=None):
+    """
+    Locality names for many (lat, lng) points, yielded as they become available:
+    {'index', 'lat', 'lng', 'cell', 'name', 'cached'} (or 'error') per input point.
+    Points are quantized to cache cells and each cell is looked up once; cached cells
+    come first, misses are geocoded concurrently under the rate limiter.
+    """
+    cells = {}
+    for index, (lat, lng) in enumerate(points):
+        cells.setdefault(cell_id(lat, lng), []).append(index)
+    
+    def results(cell, indexes, name, cached, error=None):
+        for index in indexes:
+            lat, lng = points[index]
+            result = {'index': index, 'lat': lat, 'lng': lng, 'cell': cell, 'name': name, 'cached': cached}
+            if error:
+                result['error'] = error
+            yield result
+    
+    misses = []
+    for cell, indexes in cells.items():
+        name = cache_get('geocode', cell)
+        if name is not None:
+            yield from results(cell, indexes, name, True)
+        else:
+            misses.append((cell, indexes))
+    
+    if not misses:
+        return
+    limiter = limiter or RateLimiter(getattr(settings, 'BULK_GEOCODE_QPS', 20))
+    futures = {
+        geocode_executor.submit(geocode_cell, cell, points[indexes[0]], limiter): (cell, indexes)
+        for cell, indexes in misses
+    }
     try:
+        for future in as_completed(futures):
+            cell, indexes = futures[future]
+            try:
+                yield from results(cell, indexes, future.result(), False)
+            except Exception as e:
+                yield from results(cell, indexes, None, False, str(e))
+    finally:
+        # The client may go away mid-stream; don't keep geocoding for nobody
+        for future in futures:
+            future.cancel()
+
+def geocode_cell(cell, point, limiter):
+    """Geocode one cell through the rate limiter, backing off on OVER_QUERY_LIMIT"""
+    for attempt in range(4):
+        limiter.acquire()
+        try:
+            name = fetch_location_name(*point)
+        except Exception as e:
+            if 'OVER_QUERY_LIMIT' not in str(e) or attempt == 3:
+                raise
+            limiter.slow_down()
+            time.sleep(2 ** attempt)
+            continue
+        if name:
+            cache_set('geocode', name, cell)
+        return name
+
+def extract_location_name(result):
+    """Pick the most useful name from a geocoding result (locality -> district -> state)"""
+    # Try to get locality first
+    for component in result.get('address_components', []):
+        if 'locality' in component['types']:
+            return component['long_name']
+        if 'administrative_area_level_2' in component['types']:
+            return component['long_name']
+        if 'administrative_area_level_1' in component['types']:
+            return component['long_name']
+    
+    # Fallback to formatted address
+    formatted_address = result.get('formatted_address', '')
+    if formatted_address:
+        # Take first part of address
+        return formatted_address.split(',')[0].strip()
+    
+    return None
+
+def get_place_details(place_id, budget=None):
+    """Get detailed information for a specific place ({} when the budget can't afford the call)"""
+    try:
+        cached = cache_get('details', place_id)
+        if cached is not None:
+            return cached
+        
+        if not deadline.allows(budget, 'details'):
+            return {}
+        
         url = "https://maps.googleapis.com/maps/api/place/details/json"
         params = {
             'place_id': place_id,
             'key': GOOGLE_MAPS_API_KEY,
-            'fields': 'name,formatted_address,formatted_phone_number,website,price_level,rating,user_ratings_total,opening_hours,geometry,photos,types'
+            'fields': 'name,formatted_address,formatted_phone_number,website,price_level,rating,user_ratings_total,opening_hours,utc_offset_minutes,geometry,photos,types'
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = requests.get(url, params=params, timeout=deadline.timeout_for(
+            budget, 10, reserve=deadline.stage_min_seconds('ai_narration')))
         data = response.json()
         
         if data.get('status') == 'OK':
-            return data.get('result', {})
+            result = data.get('result', {})
+            # open_now goes stale within the hour; it is recomputed from periods + utc_offset_minutes
+            result.get('opening_hours', {}).pop('open_now', None)
+            cache_set('details', result, place_id)
+            return result
         
         return {}
         
@@ -1179,13 +1615,13 @@ def test_api_status(request):
     
     # Test Gemini AI
     try:
-        if gemini_model:
+        if gemini_router:
             test_prompt = "Say 'Gemini AI is working!' in a friendly way."
-            response = gemini_model.generate_content(test_prompt)
+            response = gemini_router.generate(test_prompt, 'diagnostic')
             results['gemini_ai'] = {
                 'status': 'Working',
                 'response': response.text[:100],
-                'model': 'gemini-pro'
+                'model': gemini_router.pick('diagnostic')
             }
         else:
             results['gemini_ai'] = {
@@ -1209,18 +1645,101 @@ def test_api_status(request):
     except Exception as e:
         results['sample_search'] = {'error': str(e)}
     
-    return JsonResponse(results)
+    # Hit rates per cache tier and L1 memory use
+    results['cache'] = get_cache_stats()
+    results['memory'] = memory.get_memory_stats()
+    results['gemini_queue'] = gemini_queue.get_queue_stats()
+    results['prompts'] = get_prompt_stats()
+    results['gemini_models'] = gemini_router.get_stats() if gemini_router else None
+    results['first_query_prefetch'] = predict.get_predict_stats()
+    results['description_prefetch'] = get_prefetch_stats()
+    results['place_registry'] = {'places': len(place_registry), 'max_places': place_registry.max_places}
+    
+    return FastJsonResponse(results)
+
+# ==================== HEALTH ENDPOINTS ====================
+
+def probe_google_maps():
+    """Geocode a fixed address; raises unless the API answers OK"""
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    params = {
+        'address': 'Punjaipuliampatti',
+        'key': GOOGLE_MAPS_API_KEY
+    }
+    response = requests.get(url, params=params, timeout=5)
+    status = response.json().get('status')
+    if status != 'OK':
+        raise Exception(f"Geocoding status {status}")
+    return {'status': status}
+
+def probe_gemini():
+    """Fetch model metadata (no generation, so no generation quota is used)"""
+    if not gemini_router:
+        raise Exception('Gemini model not initialized')
+    model = genai.get_model(gemini_router.pick('chat'))
+    return {'model': model.name}
+
+def probe_cache():
+    """Read from the shared L2 cache store"""
+    l2 = get_cache().l2
+    if l2 is None:
+        return {'backend': None}
+    l2.get('geoguide:health')
+    return {'backend': type(l2).__name__}
+
+health.register_probe('google_maps', probe_google_maps)
+health.register_probe('gemini', probe_gemini, critical=False)  # rule-based fallbacks cover outages
+health.register_probe('cache', probe_cache, interval=15, critical=False)
+
+@require_http_methods(["GET", "HEAD"])
+def health_check(request):
+    """Liveness: the process is up and serving requests"""
+    health.ensure_started()
+    return FastJsonResponse({
+        'status': 'ok',
+        'uptime_seconds': round(time.time() - health.started_at, 1)
+    })
+
+@require_http_methods(["GET", "HEAD"])
+def readiness_check(request):
+    """Readiness from the latest background probe results (never calls upstream)"""
+    health.ensure_started()
+    status = health.get_status()
+    return FastJsonResponse(status, status=200 if status['ready'] else 503)
 
 # Clear conversation endpoint
 @csrf_exempt
 def clear_conversation(request):
     """Clear conversation history (placeholder)"""
-    return JsonResponse({
+    return FastJsonResponse({
         'success': True,
         'message': 'Conversation cleared',
         'timestamp': time.time()
     })
 
+# Typeahead suggestions endpoint
+@require_http_methods(["GET"])
+def suggest_completions(request):
+    """Completions for the chat box from in-memory prefix indexes (no upstream calls)"""
+    started = time.perf_counter()
+    query = request.GET.get('q', '')
+    lat = request.GET.get('lat')
+    lng = request.GET.get('lng')
+    try:
+        limit = min(int(request.GET.get('limit', 8)), 20)
+        cell = cell_id(lat, lng) if lat and lng else None
+    except ValueError:
+        return FastJsonResponse({'success': False, 'error': 'Invalid parameters'}, status=400)
+    
+    suggestions = suggest.suggest(query, cell=cell, limit=limit)
+    
+    return FastJsonResponse({
+        'success': True,
+        'query': query,
+        'suggestions': suggestions,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
 # Enhanced search endpoint
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -1233,63 +1752,328 @@ def enhanced_search(request):
         lng = data.get('longitude')
         
         if not query or not lat or not lng:
-            return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
+            return FastJsonResponse({'success': False, 'error': 'Missing data'}, status=400)
         
-        location_name = get_location_name_google(lat, lng)
+        budget = deadline.budget_from_request(request)
+        ai_mode = narration.parse_ai_mode(data.get('ai', request.GET.get('ai')))
+        location_name = get_location_name_google(lat, lng, budget)
         
-        # Use the smart intent analysis
+        # Use the smart intent analysis, then search every intent it found
         intent_analysis = analyze_user_intent_smart(query)
-        search_params = extract_search_params_from_intent(intent_analysis)
-        
-        # Perform the search
-        places = search_places_smart(lat, lng, search_params)
-        
-        # Generate AI response
-        response_text = generate_ai_response_with_context(
-            user_message=query,
-            location_name=location_name,
-            places=places,
-            search_params=search_params,
-            conversation_history=[]
-        )
+        places, search_params = search_for_intents(lat, lng, intent_analysis, budget)
+        
+        # Generate AI response (or hand out a token for it, or skip it)
+        response_text = None
+        narration_token = None
+        if ai_mode == 'inline':
+            response_text = generate_ai_response_with_context(
+                user_message=query,
+                location_name=location_name,
+                places=places,
+                search_params=search_params,
+                conversation_history=[],
+                budget=budget
+            )
+        elif ai_mode == 'deferred':
+            narration_token = narration.schedule_narration(
+                generate_ai_response_with_context,
+                user_message=query,
+                location_name=location_name,
+                places=places,
+                search_params=search_params,
+                conversation_history=[]
+            )
+        else:
+            response_text = generate_smart_response_fallback(query, location_name, places, search_params)
         
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'message': response_text,
+            'narration_token': narration_token,
             'places': places,
             'location': location_name,
             'count': len(places),
-            'query': query
+            'query': query,
+            'latency': budget.report()
         })
         
     except Exception as e:
         print(f"ERROR in enhanced_search: {str(e)}")
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return FastJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def corridor_search(request):
+    """
+    Places along a route, ranked by the detour they add.
+    Body: {"query", "origin": {lat, lng}, "destination": {lat, lng}} or {"query", "polyline"} / {"query", "path"}.
+    """
+    try:
+        data = json.loads(request.body)
+        budget = deadline.budget_from_request(request, getattr(settings, 'CORRIDOR_LATENCY_BUDGET', 6.0))
+        query = data.get('query', '').strip()
+        if not query:
+            return FastJsonResponse({'success': False, 'error': 'Missing query'}, status=400)
+        
+        path = get_corridor_path(data, budget)
+        if not path:
+            return FastJsonResponse({'success': False, 'error': 'Give origin and destination, a polyline or a path'}, status=400)
+        path = corridor.simplify_path(path)
+        origin_lat, origin_lng = path[0]
+        
+        options = corridor.corridor_settings()
+        intent_analysis = analyze_user_intent_smart(query)
+        search_params = extract_search_params_from_intent(intent_analysis)
+        
+        # Samples roughly one search diameter apart; long routes get fewer, wider searches
+        radius = int(data.get('radius') or options['radius'])
+        samples, spacing_km = corridor.sample_along(path, 2 * radius / 1000 * 0.9, options['max_samples'])
+        radius = min(max(radius, int(spacing_km * 1000 * 0.55)), 50000)
+        search_params = dict(search_params, radius=radius)
+        
+        futures = [
+            corridor_executor.submit(fetch_nearby_places, lat, lng, search_params, budget)
+            for lat, lng in samples
+        ]
+        done, not_done = wait(futures, timeout=budget.timeout(budget.seconds, reserve=0.3))
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            budget.skip('corridor_samples')
+        
+        # Merge in route order, each place once
+        records = []
+        seen_ids = set()
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                data_nearby = future.result()
+            except Exception as e:
+                print(f"ERROR in corridor sample: {e}")
+                continue
+            for place in data_nearby.get('results', []):
+                place_id = place.get('place_id')
+                if not place_id or place_id in seen_ids:
+                    continue
+                seen_ids.add(place_id)
+                records.append(record_from_search(place))
+        place_registry.remember(records)
+        
+        # Detour = out to the place and back to the route
+        max_detour_km = float(data.get('max_detour_km') or options['max_detour_km'])
+        distances = corridor.distances_to_path([(r.lat, r.lng) for r in records], path)
+        ranked = []
+        for record, (off_route_km, progress_km) in zip(records, distances):
+            detour_km = 2 * off_route_km
+            if detour_km <= max_detour_km:
+                ranked.append((detour_km, progress_km, record))
+        ranked.sort(key=lambda item: (round(item[0], 1), -(item[2].rating or 0)))
+        
+        max_results = min(int(data.get('max_results') or 10), 50)
+        places = []
+        for detour_km, progress_km, record in ranked[:max_results]:
+            place = serialize_place(record, origin_lat, origin_lng)
+            place['detour_km'] = round(detour_km, 2)
+            place['route_progress_km'] = round(progress_km, 1)
+            places.append(place)
+        
+        print(f"DEBUG: Corridor search '{query}': {len(done)}/{len(samples)} samples, "
+              f"{len(records)} unique places, {len(places)} returned")
+        
+        return FastJsonResponse({
+            'success': True,
+            'query': query,
+            'places': places,
+            'count': len(places),
+            'route': {
+                'points': len(path),
+                'samples': len(samples),
+                'samples_searched': len(done),
+                'sample_spacing_km': round(spacing_km, 2),
+                'search_radius': radius,
+            },
+            'search_params': search_params,
+            'latency': budget.report()
+        })
+        
+    except (ValueError, TypeError, KeyError) as e:
+        return FastJsonResponse({'success': False, 'error': f'Invalid route: {e}'}, status=400)
+    except Exception as e:
+        print(f"ERROR in corridor_search: {str(e)}")
+        return FastJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+def parse_point(value):
+    """(lat, lng) from {lat, lng}, {latitude, longitude} or [lat, lng]"""
+    if isinstance(value, dict):
+        return float(value.get('lat', value.get('latitude'))), float(value.get('lng', value.get('longitude')))
+    return float(value[0]), float(value[1])
+
+def get_corridor_path(data, budget=None):
+    """Route as [(lat, lng), ...] from a path, an encoded polyline, or origin + destination"""
+    if data.get('path'):
+        return [parse_point(point) for point in data['path']]
+    if data.get('polyline'):
+        return corridor.decode_polyline(data['polyline'])
+    if not data.get('origin') or not data.get('destination'):
+        return None
+    
+    origin = parse_point(data['origin'])
+    destination = parse_point(data['destination'])
+    try:
+        return corridor.fetch_route(origin, destination, GOOGLE_MAPS_API_KEY, timeout=deadline.timeout_for(budget, 10))
+    except Exception as e:
+        # A straight line still finds places near both ends and the direct line between them
+        print(f"DEBUG: Directions unavailable ({e}), using a straight line")
+        if budget is not None:
+            budget.skip('directions')
+        return [origin, destination]
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_reverse_geocode(request):
+    """
+    Locality names for many points without greetings: {"points": [[lat, lng], {"lat", "lng"}, ...]}.
+    Streams NDJSON, one line per point as soon as it is known (not in input order), then a summary line.
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return FastJsonResponse({'success': False, 'error': 'Body must be a JSON object'}, status=400)
+        raw_points = data.get('points') or []
+        max_points = getattr(settings, 'BULK_GEOCODE_MAX_POINTS', 5000)
+        if not isinstance(raw_points, list) or not raw_points:
+            return FastJsonResponse({'success': False, 'error': 'Give a non-empty list of points'}, status=400)
+        if len(raw_points) > max_points:
+            return FastJsonResponse({'success': False, 'error': f'At most {max_points} points per request'}, status=400)
+    except (ValueError, TypeError, AttributeError) as e:
+        return FastJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    points = []
+    invalid = []
+    for index, value in enumerate(raw_points):
+        try:
+            lat, lng = parse_point(value)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+            points.append((lat, lng))
+        except (ValueError, TypeError, KeyError, IndexError):
+            invalid.append(index)
+            points.append(None)
+    
+    def stream():
+        started = time.time()
+        valid = [(index, point) for index, point in enumerate(points) if point is not None]
+        counts = {'cached': 0, 'fetched': 0, 'failed': 0}
+        for index in invalid:
+            counts['failed'] += 1
+            yield dumps({'index': index, 'error': 'invalid coordinates'}) + b'\n'
+        for result in reverse_geocode_bulk([point for _, point in valid]):
+            result['index'] = valid[result['index']][0]  # back to the caller's numbering
+            if result.get('error'):
+                counts['failed'] += 1
+            else:
+                counts['cached' if result['cached'] else 'fetched'] += 1
+            yield dumps(result) + b'\n'
+        summary = dict(counts, points=len(points), cells=len({cell_id(*p) for _, p in valid}),
+                       seconds=round(time.time() - started, 2))
+        yield dumps({'summary': summary}) + b'\n'
+    
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+@require_http_methods(["GET"])
+def viewport_places(request):
+    """
+    Known places inside the map bounds: ?south=&west=&north=&east=&zoom=[&type=]
+    Grid clusters (count, centroid, best-rated member) below VIEWPORT_DETAIL_ZOOM,
+    individual places at or above it.
+    """
+    try:
+        south, west, north, east = viewport.parse_bounds(request.GET)
+        zoom = min(max(int(request.GET.get('zoom', 13)), 0), 22)
+    except (KeyError, ValueError) as e:
+        return FastJsonResponse({'success': False, 'error': f'Invalid viewport: {e}'}, status=400)
+    
+    place_type = request.GET.get('type', '').strip()
+    records = [
+        record for record in place_registry.in_bounds(south, west, north, east)
+        if viewport.matches_type(record, place_type)
+    ]
+    max_markers = getattr(settings, 'VIEWPORT_MAX_MARKERS', 200)
+    
+    if zoom >= getattr(settings, 'VIEWPORT_DETAIL_ZOOM', 16) and len(records) <= max_markers:
+        clusters = []
+        singles = sorted(records, key=viewport.rating_key, reverse=True)
+    else:
+        groups = viewport.cluster_records(records, zoom, (south + north) / 2)[:max_markers]
+        clusters = [
+            {
+                'count': group['count'],
+                'location': {'lat': group['lat'], 'lng': group['lng']},
+                'bounds': group['bounds'],
+                'best': serialize_marker(group['best']),
+            }
+            for group in groups if group['count'] > 1
+        ]
+        singles = [group['best'] for group in groups if group['count'] == 1]
+    
+    return FastJsonResponse({
+        'success': True,
+        'zoom': zoom,
+        'total': len(records),
+        'clusters': clusters,
+        'places': [serialize_marker(record) for record in singles],
+    })
+
+def serialize_marker(record):
+    """Just what a map marker and its info window need"""
+    opening_status = evaluate_periods(record.periods, record.utc_offset)
+    return {
+        'place_id': record.place_id,
+        'name': record.name,
+        'location': {'lat': record.lat, 'lng': record.lng},
+        'rating': record.rating,
+        'total_ratings': record.total_ratings,
+        'price_level': record.price_level,
+        'types': list(record.types[:2]),
+        'open_now': opening_status['open_now'],
+        'opening_hint': opening_status['hint'],
+    }
+
+@require_http_methods(["GET"])
+def get_narration(request, token):
+    """Deferred AI narration for a narration_token (202 while it is still being generated)"""
+    result = narration.get_narration(token)
+    if result is None:
+        return FastJsonResponse({'success': False, 'error': 'Unknown or expired narration token'}, status=404)
+    
+    status = 202 if result['status'] == 'pending' else 200
+    return FastJsonResponse(dict(result, success=result['status'] != 'failed', token=token), status=status)
 
 # Test Gemini endpoint
 @csrf_exempt
 def test_gemini(request):
     """Test Gemini AI directly"""
     try:
-        if not gemini_model:
-            return JsonResponse({
+        if not gemini_router:
+            return FastJsonResponse({
                 'success': False,
                 'error': 'Gemini AI not configured'
             })
         
         prompt = "Hello! I'm testing the Gemini AI integration. Can you respond with a friendly greeting and tell me you're ready to help travelers explore new places?"
         
-        response = gemini_model.generate_content(prompt)
+        response = gemini_router.generate(prompt, 'diagnostic')
         
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'response': response.text,
-            'model': 'gemini-pro',
+            'model': gemini_router.pick('diagnostic'),
             'timestamp': time.time()
         })
         
     except Exception as e:
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': str(e)
         })
\ No newline at end of file
@@ -42,12 +42,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.ProfilingMiddleware',
 ]
 
 import os
@@ -58,8 +60,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per process instead of on every render
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -118,8 +126,215 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies (home.<hash>.css) plus .gz/.br variants.
+# Without a front-end server, app.assets.serve_static serves them with immutable caching.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'app.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+SERVE_STATIC_FROM_DJANGO = os.getenv('SERVE_STATIC_FROM_DJANGO', 'True') == 'True'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# On-demand request profiling (app/middleware.py)
+# A single request can be profiled by sending X-GeoGuide-Profile with a value from
+# app.middleware.make_profile_token('inline' or 'save'). PROFILING_ENABLED turns on
+# continuous sampling of PROFILING_SAMPLE_RATE of live traffic.
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_OUTPUT_DIR = BASE_DIR / 'profiles'
+PROFILING_TOKEN_MAX_AGE = 3600  # seconds a signed profiling header stays valid
+PROFILING_TRACE_MODULES = ['app.views']
+PROFILING_TOP_N = 30
+
+# Per-endpoint Gemini prompt budgets in (estimated) tokens (app/prompts.py)
+PROMPT_TOKEN_BUDGETS = {
+    'greeting': 250,
+    'place_description': 350,
+    'chat': 900,
+    'summary': 400,
+}
+
+# Speculative place-description prefetch after searches (app/prefetch.py)
+PREFETCH_ENABLED = True
+PREFETCH_TOP_N = 3              # places described per batched Gemini call
+PREFETCH_MAX_WORKERS = 2        # background threads
+PREFETCH_MAX_PENDING = 4        # queued batches before new prefetches are skipped
+PREFETCH_TTL = 1800             # seconds a prefetched description stays usable
+PREFETCH_MAX_ENTRIES = 500      # per-worker ledger of generated descriptions awaiting used/wasted accounting
+PREFETCH_MIN_HIT_RATE = 0.15    # below this only the top place is prefetched
+PREFETCH_PAUSE_HIT_RATE = 0.05  # below this prefetching pauses for PREFETCH_PAUSE_SECONDS
+PREFETCH_PAUSE_SECONDS = 600
+PREFETCH_WASTE_MIN_SAMPLES = 20
+
+# First-query prediction on greeting (app/predict.py): warm the caches for the likeliest first searches
+PREDICT_ENABLED = True
+PREDICT_TOP_N = 2                     # predicted searches warmed per greeting
+PREDICT_MIN_PROBABILITY = 0.15        # less likely predictions are not run
+PREDICT_MAX_SEARCHES_PER_SECOND = 2   # speculative searches across all greetings
+PREDICT_BURST = 10
+PREDICT_MAX_PENDING = 4
+PREDICT_DETAILS_PER_QUERY = 8         # top places whose Place Details are warmed too
+PREDICT_TTL = 1800                    # seconds a warmed search counts as live for hit-rate reporting
+PREDICT_MIN_HIT_RATE = 0.2            # below this only the top prediction is warmed
+PREDICT_PRIOR_WEIGHT = 5              # pseudo-observations given to the global mix and the priors
+PREDICT_PRIOR_QUERIES = {
+    'morning': ['coffee', 'breakfast', 'atm'],
+    'afternoon': ['restaurant', 'coffee', 'atm'],
+    'evening': ['restaurant', 'hotel', 'atm'],
+    'night': ['hotel', 'restaurant', 'atm'],
+}
+
+# Gemini scheduler (app/gemini_queue.py): one bounded pool, chat > descriptions > greetings > background
+GEMINI_MAX_CONCURRENCY = 4
+GEMINI_QUEUE_LIMITS = {           # queued calls at which a class is shed to its fallback
+    'chat': 32,
+    'diagnostic': 8,
+    'description': 12,
+    'greeting': 4,
+    'background': 1,
+}
+GEMINI_DEADLINES = {              # seconds a caller waits (queue + generation)
+    'chat': 20,
+    'diagnostic': 20,
+    'description': 15,
+    'greeting': 8,
+    'background': 60,
+}
+
+# Gemini model routing (app/model_router.py): fastest healthy model at or above each class's tier
+GEMINI_MODELS = [                 # tier = quality, cost = relative price, latency = prior seconds
+    {'name': 'models/gemini-1.5-flash-latest', 'tier': 1, 'cost': 1, 'latency': 1.5},
+    {'name': 'models/gemini-1.5-pro-latest', 'tier': 2, 'cost': 4, 'latency': 4.0},
+    {'name': 'models/gemini-1.0-pro-latest', 'tier': 1, 'cost': 2, 'latency': 3.0},
+    {'name': 'models/gemini-pro', 'tier': 1, 'cost': 2, 'latency': 3.0},
+]
+GEMINI_TASK_TIERS = {             # minimum tier per scheduler class
+    'chat': 2,
+    'diagnostic': 1,
+    'description': 1,
+    'greeting': 1,
+    'background': 1,
+}
+GEMINI_MODEL_FAILOVER_ATTEMPTS = 2
+GEMINI_MODEL_MAX_ERROR_RATE = 0.5  # over the last GEMINI_MODEL_WINDOW calls; then cooled down
+GEMINI_MODEL_WINDOW = 20
+GEMINI_MODEL_COOLDOWN = 30         # seconds a degraded model is left out
+GEMINI_MODEL_STATS_TTL = 300       # latency estimates older than this revert to the prior
+
+# Along-the-route corridor search (app/corridor.py)
+CORRIDOR_LATENCY_BUDGET = 6.0    # seconds for the whole request, however long the route
+CORRIDOR_SEARCH_RADIUS = 1500    # metres per sample point (grows when samples are spread out)
+CORRIDOR_MAX_SAMPLES = 25        # Nearby Searches per corridor request
+CORRIDOR_MAX_DETOUR_KM = 5.0     # there-and-back detour limit for results
+
+# Compact PlaceRecords kept in memory across requests (app/records.py, ~1 KB each; see bench_places)
+PLACE_REGISTRY_MAX_PLACES = 200000
+
+# Bulk reverse geocoding (/api/reverse-geocode/)
+BULK_GEOCODE_MAX_POINTS = 5000
+BULK_GEOCODE_QPS = 20            # Geocoding API requests per second per bulk request
+
+# Viewport clustering of known places (app/viewport.py)
+VIEWPORT_CLUSTER_PX = 60         # approximate on-screen width of one cluster cell
+VIEWPORT_DETAIL_ZOOM = 16        # from this zoom individual places are returned
+VIEWPORT_MAX_MARKERS = 200       # clusters + places per response
+
+# Chat latency budget (app/deadline.py); clients may ask for less or more via X-GeoGuide-Budget-Ms
+CHAT_LATENCY_BUDGET = 8.0        # seconds per chat / search request
+CHAT_LATENCY_BUDGET_MAX = 30.0
+CHAT_STAGE_MIN_SECONDS = {       # budget that must remain to start an optional stage
+    'geocode': 0.5,
+    'nearby': 0.3,
+    'wider_rings': 1.0,
+    'details': 2.5,
+    'travel_times': 2.0,
+    'ai_narration': 1.0,
+}
+
+# Rolling chat memory (app/memory.py): the last turns verbatim, older ones as a cached summary
+MEMORY_RECENT_TURNS = 4          # messages kept verbatim in the chat prompt
+MEMORY_SUMMARY_ENABLED = True    # fold older turns into the summary with Gemini in the background
+MEMORY_SUMMARY_MAX_CHARS = 400
+MEMORY_SUMMARY_WORKERS = 2
+MEMORY_SUMMARY_MAX_PENDING = 8   # conversations being summarized at once
+
+# Caches
+# Geocoding / Nearby Search / Place Details / Gemini responses use the two-tier
+# cache in app/cache.py: an in-process LRU (L1) in front of a store shared by all
+# workers and the warm_cache command (L2: SQLite in WAL mode, or Redis).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+GEOGUIDE_CACHE = {
+    'L1_MAX_BYTES': 32 * 1024 * 1024,
+    'L2_BACKEND': os.getenv('CACHE_L2_BACKEND', 'sqlite'),  # 'sqlite', 'redis' or 'none'
+    'L2_PATH': BASE_DIR / '.cache' / 'geoguide-cache.sqlite3',
+    'REDIS_URL': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    'INVALIDATION_POLL_SECONDS': 2,
+}
+
+CACHE_TTLS = {
+    'geocode': 7 * 24 * 3600,
+    'nearby': 6 * 3600,
+    'details': 3 * 24 * 3600,  # open/closed is computed locally, so details stay valid for days
+    'gemini': 15 * 60,
+    'travel': 30 * 60,
+    'summary': 24 * 3600,
+    'narration': 10 * 60,
+    'route': 24 * 3600,
+}
+CACHE_CELL_PRECISION = 2  # decimal places of lat/lng per cache cell (~1.1 km)
+
+# Approximate Google Maps Platform prices (USD per 1000 calls) for cost reports
+UPSTREAM_COST_PER_1000 = {
+    'geocode': 5.0,
+    'nearby': 32.0,
+    'details': 17.0,
+}
+
+# Response compression (app.middleware.CompressionMiddleware)
+# Brotli is used when the optional 'brotli' package is installed, gzip otherwise.
+COMPRESSION_MIN_SIZE = 1024  # bytes; smaller responses are sent as-is
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Progressive Nearby Search (app/views.py collect_nearby_results)
+# 'expand' widens only when the rings so far are short; 'concurrent' requests every ring at once
+# (lower latency, but pays for the wider rings even when the first one is enough); 'off' disables
+PROGRESSIVE_SEARCH_MODE = 'expand'
+PROGRESSIVE_SEARCH_RADII = [2000, 10000, 20000]  # metres
+PROGRESSIVE_SEARCH_MIN_RESULTS = 8
+
+# Compound requests ("coffee and an ATM"): one concurrent search per place type
+MULTI_INTENT_MAX = 3
+MULTI_INTENT_PLACES_PER_INTENT = 5
+
+# Background dependency probes behind /health and /ready (app/health.py)
+HEALTH_PROBES_ENABLED = True  # when False, /ready reports ready without dependency checks
+HEALTH_PROBE_INTERVAL = 60  # seconds between upstream checks
+
+# Browser/CDN max-age for GET /api/places/<place_id>/ (revalidated with ETags afterwards)
+PLACE_CACHE_MAX_AGE = 3600
+
+# Real travel times from one batched Distance Matrix request per mode (app/travel.py).
+# When disabled, or when the deadline passes, fixed-speed estimates are used.
+TRAVEL_TIME_PROVIDER_ENABLED = os.getenv('TRAVEL_TIME_PROVIDER_ENABLED', 'False') == 'True'
+TRAVEL_TIME_MODES = ['driving', 'walking']
+TRAVEL_TIME_DEADLINE = 2.0  # seconds